@@ -0,0 +1,74 @@
+"""
+Бенчмарк разбора CSV: строк в секунду при угадывании типа по каждой ячейке,
+при конвертации по схеме колонок, определенной один раз на файл,
+при разборе кусков файла в пуле процессов и при разборе через mmap.
+
+Запуск (из корня репозитория):
+    PYTHONPATH=src python scripts/bench_csv_reader.py --rows 200000
+"""
+
+import argparse
+import asyncio
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from csv_reader.reader import AsyncCSVReader
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SOURCE_CSV = Path(__file__).resolve().parents[1] / "src" / "parser" / "test_data.csv"
+
+
+def make_dataset(rows: int, target: Path) -> None:
+    """Собирает файл нужного размера, повторяя строки тестового CSV"""
+    lines = SOURCE_CSV.read_text(encoding="utf-8").splitlines()
+    header, body = lines[0], lines[1:]
+
+    with target.open("w", encoding="utf-8") as f:
+        f.write(header + "\n")
+        for i in range(rows):
+            f.write(body[i % len(body)] + "\n")
+
+
+async def measure(reader: AsyncCSVReader) -> tuple[int, float]:
+    started = time.perf_counter()
+    count = 0
+    async for _ in reader.iter_companies():
+        count += 1
+    return count, time.perf_counter() - started
+
+
+async def run(rows: int, repeats: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.csv"
+        make_dataset(rows, path)
+        logger.info(f"Dataset: {rows} rows, {path.stat().st_size / 1024 / 1024:.1f} MB")
+
+        modes = {
+            "per-cell (infer_types=False)": dict(infer_types=False),
+            "schema (infer_types=True)": dict(infer_types=True),
+            "schema + process pool": dict(infer_types=True, parallel_threshold_bytes=0),
+            "schema + mmap": dict(infer_types=True, engine="mmap"),
+        }
+        for name, options in modes.items():
+            best = None
+            for _ in range(repeats):
+                count, elapsed = await measure(AsyncCSVReader(str(path), **options))
+                best = elapsed if best is None else min(best, elapsed)
+            logger.info(f"{name:<30} {count / best:>12,.0f} rows/sec ({best:.2f} s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=200_000, help="Количество строк в тестовом файле")
+    parser.add_argument("--repeats", type=int, default=3, help="Количество повторов, берется лучший")
+    args = parser.parse_args()
+
+    asyncio.run(run(args.rows, args.repeats))
+
+
+if __name__ == "__main__":
+    main()
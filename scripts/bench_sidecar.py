@@ -0,0 +1,94 @@
+"""
+Бенчмарк повторного чтения CSV: разбор текста (load_companies_frame) против
+загрузки из колоночной копии в формате Arrow (csv_reader.sidecar) - всех
+колонок и только колонок для статистики. Нужен pyarrow.
+
+Запуск (из корня репозитория):
+    PYTHONPATH=src python scripts/bench_sidecar.py --rows 1000000
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from csv_reader import sidecar
+from csv_reader.columnar import load_companies_frame
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+SOURCE_CSV = Path(__file__).resolve().parents[1] / "src" / "parser" / "test_data.csv"
+
+STATISTICS_COLUMNS = [
+    "Основная отрасль",
+    "Выручка предприятия, тыс. руб",
+    "Данные об оказанных мерах поддержки",
+    "Наличие особого статуса",
+    "Округ",
+    "Вид организации",
+    "Год",
+]
+
+
+def make_dataset(rows: int, target: Path) -> None:
+    """Собирает файл нужного размера, повторяя строки тестового CSV"""
+    lines = SOURCE_CSV.read_text(encoding="utf-8").splitlines()
+    header, body = lines[0], lines[1:]
+
+    with target.open("w", encoding="utf-8") as f:
+        f.write(header + "\n")
+        for i in range(rows):
+            f.write(body[i % len(body)] + "\n")
+
+
+def best_of(repeats: int, load) -> tuple[float, object]:
+    best = None
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = load()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run(rows: int, repeats: int) -> None:
+    if not sidecar.is_available():
+        raise SystemExit("pyarrow is not installed")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "bench.csv"
+        directory = Path(tmp) / "optimized"
+        directory.mkdir()
+        make_dataset(rows, path)
+        logger.info(f"Dataset: {rows} rows, {path.stat().st_size / 1024 / 1024:.1f} MB")
+
+        elapsed, frame = best_of(repeats, lambda: load_companies_frame(str(path)))
+        logger.info(f"{'CSV -> DataFrame':<32} {elapsed:>8.2f} s ({len(frame.columns)} columns)")
+
+        started = time.perf_counter()
+        target = sidecar.write_sidecar(str(path), frame, directory)
+        logger.info(f"{'write sidecar':<32} {time.perf_counter() - started:>8.2f} s "
+                    f"({target.stat().st_size / 1024 / 1024:.1f} MB)")
+        del frame
+
+        elapsed, _ = best_of(repeats, lambda: sidecar.read_sidecar(str(path), directory))
+        logger.info(f"{'sidecar, all columns':<32} {elapsed:>8.2f} s")
+
+        elapsed, _ = best_of(repeats, lambda: sidecar.read_sidecar(str(path), directory, STATISTICS_COLUMNS))
+        logger.info(f"{'sidecar, statistics columns':<32} {elapsed:>8.2f} s ({len(STATISTICS_COLUMNS)} columns)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Количество строк в тестовом файле")
+    parser.add_argument("--repeats", type=int, default=3, help="Количество повторов, берется лучший")
+    args = parser.parse_args()
+
+    run(args.rows, args.repeats)
+
+
+if __name__ == "__main__":
+    main()
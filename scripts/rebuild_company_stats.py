@@ -0,0 +1,46 @@
+"""
+Пересчет статистики компаний пользователей (таблица user_company_stats) с нуля
+по привязкам и компаниям. Выводит расхождения сохраненных счетчиков с
+пересчитанными и исправляет их.
+
+Запуск (из корня репозитория, база - из POSTGRESQL_URI):
+    PYTHONPATH=src python scripts/rebuild_company_stats.py
+    PYTHONPATH=src python scripts/rebuild_company_stats.py --user-id 42 --check
+"""
+
+import argparse
+import logging
+import sys
+
+from database.database import db
+from repositories.company_stats_repository import CompanyStatsRepository
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--user-id", type=int, default=None, help="Только для этого пользователя")
+    parser.add_argument("--check", action="store_true",
+                        help="Только найти расхождения, ничего не меняя (код выхода 1, если они есть)")
+    args = parser.parse_args()
+
+    db.createAllTables()
+    with db.getSession() as session:
+        drift = CompanyStatsRepository(session).rebuild(user_id=args.user_id, dry_run=args.check)
+        for (user_id, dimension, value), (stored, actual) in drift.items():
+            logger.warning(f"user {user_id} {dimension}={value}: stored {stored}, actual {actual}")
+        if not args.check:
+            session.commit()
+
+    if drift:
+        logger.info(f"{len(drift)} counters " + ("differ" if args.check else "fixed"))
+    else:
+        logger.info("No drift")
+    if args.check and drift:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
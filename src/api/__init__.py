@@ -2,4 +2,5 @@
 from .files import router as files_router
 from .graphs import router as graphs_router
 from .parse import router as parser_router
-from .companies import router as companies_router
\ No newline at end of file
+from .companies import router as companies_router
+from .jobs import router as jobs_router
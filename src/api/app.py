@@ -8,8 +8,12 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from .companies import router as companies_router
 from .companies import router as companies_router
-from api import auth_router, files_router, graphs_router, parser_router, companies_router
+from api import auth_router, files_router, graphs_router, parser_router, companies_router, jobs_router
+from csv_reader.cache import parse_cache
+from jobs import ingest_jobs
+from repositories.count_cache import company_count_cache
 from logging_config import LOGGING_CONFIG, ColoredFormatter
+from settings import settings
 
 # Setup logging
 dictConfig(LOGGING_CONFIG)
@@ -20,7 +24,28 @@ for handler in root_logger.handlers:
     if type(handler) is logging.StreamHandler:
         handler.setFormatter(ColoredFormatter('%(levelname)s:     %(asctime)s %(name)s - %(message)s'))
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Воркеры фоновых задач загрузки, незавершенные задачи подхватываются из базы
+    await ingest_jobs.start()
+    yield
+    await ingest_jobs.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Ограничения общего кэша разобранных файлов
+parse_cache.configure(
+    max_bytes=settings.parse_cache_max_bytes,
+    max_entries=settings.parse_cache_max_entries,
+)
+
+# Время жизни количеств компаний в списках
+company_count_cache.configure(
+    ttl_seconds=settings.company_count_cache_ttl_seconds,
+    max_entries=settings.company_count_cache_max_entries,
+)
 
 # Set up API routers
 api_v1 = APIRouter(prefix="/v1", tags=["v1"])
@@ -29,6 +54,7 @@ api_v1.include_router(files_router)
 api_v1.include_router(companies_router)
 api_v1.include_router(graphs_router)
 api_v1.include_router(parser_router)
+api_v1.include_router(jobs_router)
 
 app.include_router(api_v1, prefix="/api")
 
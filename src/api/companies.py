@@ -3,7 +3,7 @@
 import logging
 from datetime import datetime, timezone
 from logging.config import dictConfig
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, Field
@@ -12,10 +12,16 @@ from sqlmodel import Session, select
 from api.auth import get_current_user
 from database.database import db
 from logging_config import LOGGING_CONFIG, ColoredFormatter
-from models import Company, User, UserCompanyLink, ConfirmationStatus, CompanyUpdate, CompanyRead
-from repositories.company_repository import CompanyRepository
+from models import (Company, User, UserCompanyLink, ConfirmationStatus, ConflictPolicy, CompanyUpdate, CompanyRead,
+                    CompanyOrder, CompanyStatsRead, CompanySummary)
+from repositories.company_bulk_loader import CompanyBulkLoader, company_row
+from repositories.company_repository import (CompanyCursor, CompanyPage, CompanyRepository, _company_to_company_read,
+                                             decode_company_cursor, encode_company_cursor, json_number)
+from repositories.company_stats_repository import CompanyStatsRepository
+from csv_reader.metrics import company_metrics
 from csv_reader.reader import AsyncCSVReader
 from parser.parser import ParserEmulator
+from settings import settings
 
 # Setup logging
 dictConfig(LOGGING_CONFIG)
@@ -27,6 +33,8 @@ for handler in root_logger.handlers:
 
 router = APIRouter(prefix="/companies", tags=["companies"])
 
+DEFAULT_CONFLICT_POLICY = ConflictPolicy(settings.ingest_conflict_policy)
+
 # =========================
 # Модели
 # =========================
@@ -98,10 +106,11 @@ class CompanyJsonCreate(BaseModel):
 
 class CompanyListResponse(BaseModel):
     """Модель ответа со списком компаний"""
-    companies: List[CompanyRead]
+    companies: List[Union[CompanyRead, CompanySummary]]
     total: int
     limit: int
     offset: int
+    next_cursor: Optional[str] = Field(None, description="Курсор следующей страницы (null - страниц больше нет)")
 
 # =========================
 # Утилиты
@@ -130,60 +139,133 @@ def check_company_ownership(company_id: int, user_id: int, session: Session) ->
         )
     return company
 
+def _decode_cursor(cursor: Optional[str], order_by: CompanyOrder, offset: int) -> Optional[CompanyCursor]:
+    """Ключ сортировки и количество из курсора страницы (400, если курсор некорректен или передан вместе с offset)"""
+    if cursor is None:
+        return None
+    if offset:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="cursor and offset cannot be used together"
+        )
+    try:
+        return decode_company_cursor(cursor, order_by)
+    except ValueError as e:
+        logger.warning(f"Invalid companies cursor: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+def _selected_fields(fields: Optional[str], include_json: bool) -> Optional[List[str]]:
+    """Поля компаний для списка (None - все, включая json_data). 400 для неизвестных полей"""
+    if fields is None:
+        if include_json:
+            return None
+        return [field for field in CompanySummary.model_fields if field != "json_data"]
+
+    selected = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in selected if field not in CompanySummary.model_fields]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown fields: {', '.join(unknown)}"
+        )
+    if not include_json:
+        selected = [field for field in selected if field != "json_data"]
+    return selected
+
+def _metric_ranges(**ranges: tuple[Optional[float], Optional[float]]) -> Dict[str, tuple[Optional[float], Optional[float]]]:
+    """Диапазоны фильтров по метрикам (400, если минимум больше максимума)"""
+    for name, (low, high) in ranges.items():
+        if low is not None and high is not None and low > high:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{name}_min is greater than {name}_max"
+            )
+    return ranges
+
+def _json_condition(parameter: str, condition: str) -> tuple[str, str]:
+    """Условие вида "ключ=значение" (400, если нет ключа или знака =)"""
+    key, separator, value = condition.partition("=")
+    if not separator or not key:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid {parameter}: expected key=value, got {condition!r}"
+        )
+    return key, value
+
+def _json_filters(
+    data: Optional[List[str]],
+    data_min: Optional[List[str]],
+    data_max: Optional[List[str]],
+) -> tuple[List[tuple[str, str]], Dict[str, tuple[Optional[float], Optional[float]]]]:
+    """Фильтры по ключам json_data: равенства и диапазоны (400 для нечисловых границ и минимума больше максимума)"""
+    equals = [_json_condition("data", condition) for condition in data or []]
+    ranges: Dict[str, List[Optional[float]]] = {}
+    for parameter, conditions, side in (("data_min", data_min, 0), ("data_max", data_max, 1)):
+        for condition in conditions or []:
+            key, value = _json_condition(parameter, condition)
+            number = json_number(value)
+            if number is None:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid {parameter}: {value!r} is not a number"
+                )
+            ranges.setdefault(key, [None, None])[side] = number
+    for key, (low, high) in ranges.items():
+        if low is not None and high is not None and low > high:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"data_min is greater than data_max for {key}"
+            )
+    return equals, {key: (low, high) for key, (low, high) in ranges.items()}
+
+def _company_page(page: CompanyPage, limit: int, offset: int, order_by: CompanyOrder) -> CompanyListResponse:
+    """Страница из limit + 1 выбранных компаний: лишняя означает, что есть следующая страница"""
+    has_more = len(page.companies) > limit
+    companies = page.companies[:limit]
+    return CompanyListResponse(
+        companies=companies,
+        total=page.total,
+        limit=limit,
+        offset=offset,
+        next_cursor=encode_company_cursor(companies[-1], page.total, order_by) if has_more and companies else None
+    )
+
 # =========================
 # Эндпоинты
 # =========================
 
-@router.get("/", response_model=CompanyListResponse)
+@router.get("/", response_model=CompanyListResponse, response_model_exclude_unset=True)
 async def get_user_companies(
     current_user: User = Depends(get_current_user),
     limit: int = Query(default=50, description="Количество записей"),
     offset: int = Query(default=0, description="Смещение"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    order_by: CompanyOrder = Query(CompanyOrder.id, description="Сортировка: по id, по году или по метрике, затем id"),
+    fields: Optional[str] = Query(None, description="Поля компаний через запятую (id возвращается всегда)"),
+    include_json: bool = Query(True, description="Возвращать json_data"),
 ):
     """Получить список компаний пользователя"""
     logger.info(f"Getting companies for user: {current_user.username}")
 
+    after = _decode_cursor(cursor, order_by, offset)
+    selected = _selected_fields(fields, include_json)
+
     session = get_session()
     try:
-        statement = (
-            select(Company)
-            .join(UserCompanyLink)
-            .where(UserCompanyLink.user_id == current_user.id)
-            .limit(limit)
-            .offset(offset)
+        # Лишняя запись показывает, есть ли следующая страница
+        result = CompanyRepository(session).filter_by_metrics(
+            user_id=current_user.id,
+            skip=offset,
+            limit=limit + 1,
+            order_by=order_by,
+            after=after,
+            fields=selected,
         )
 
-        companies = session.exec(statement).all()
-
-        company_responses = [
-            CompanyRead(
-                id=company.id,
-                inn=company.inn,
-                name=company.name,
-                full_name=company.full_name,
-                year=company.year,
-                spark_status=company.spark_status,
-                main_industry=company.main_industry,
-                company_size_final=company.company_size_final,
-                organization_type=company.organization_type,
-                support_measures=company.support_measures,
-                special_status=company.special_status,
-                confirmation_status=company.confirmation_status,
-                confirmed_at=company.confirmed_at,
-                confirmer_identifier=company.confirmer_identifier,
-                json_data=company.json_data,
-                created_at=company.created_at,
-                updated_at=company.updated_at
-            )
-            for company in companies
-        ]
-
-        return CompanyListResponse(
-            companies=company_responses,
-            total=len(company_responses),
-            limit=limit,
-            offset=offset
-        )
+        return _company_page(result, limit, offset, order_by)
 
     except Exception as e:
         logger.error(f"Error getting companies: {e}", exc_info=True)
@@ -194,7 +276,7 @@ async def get_user_companies(
     finally:
         session.close()
 
-@router.get("/filter", response_model=CompanyListResponse)
+@router.get("/filter", response_model=CompanyListResponse, response_model_exclude_unset=True)
 async def filter_companies(
     current_user: User = Depends(get_current_user),
     spark_status: Optional[str] = Query(None, description="Статус СПАРК"),
@@ -204,17 +286,52 @@ async def filter_companies(
     support_measures: Optional[bool] = Query(None, description="Получены ли меры поддержки"),
     special_status: Optional[str] = Query(None, description="Особый статус"),
     years: Optional[List[int]] = Query(None, description="Список годов для фильтрации"),
+    district: Optional[str] = Query(None, description="Округ"),
+    revenue_min: Optional[float] = Query(None, description="Выручка от, тыс. руб"),
+    revenue_max: Optional[float] = Query(None, description="Выручка до, тыс. руб"),
+    headcount_min: Optional[float] = Query(None, description="Численность персонала от, чел"),
+    headcount_max: Optional[float] = Query(None, description="Численность персонала до, чел"),
+    payroll_fund_min: Optional[float] = Query(None, description="Фонд оплаты труда от, тыс. руб"),
+    payroll_fund_max: Optional[float] = Query(None, description="Фонд оплаты труда до, тыс. руб"),
+    moscow_taxes_min: Optional[float] = Query(None, description="Налоги в бюджет Москвы от, тыс. руб"),
+    moscow_taxes_max: Optional[float] = Query(None, description="Налоги в бюджет Москвы до, тыс. руб"),
+    moscow_investments_min: Optional[float] = Query(None, description="Инвестиции в Москве от, тыс. руб"),
+    moscow_investments_max: Optional[float] = Query(None, description="Инвестиции в Москве до, тыс. руб"),
+    export_volume_min: Optional[float] = Query(None, description="Объем экспорта от, тыс. руб"),
+    export_volume_max: Optional[float] = Query(None, description="Объем экспорта до, тыс. руб"),
+    capacity_utilization_min: Optional[float] = Query(None, description="Загрузка мощностей от, %"),
+    capacity_utilization_max: Optional[float] = Query(None, description="Загрузка мощностей до, %"),
+    data: Optional[List[str]] = Query(None, description="Значение ключа json_data: ключ=значение, например Район=Хамовники"),
+    data_min: Optional[List[str]] = Query(None, description="Числовое значение ключа json_data от: ключ=число"),
+    data_max: Optional[List[str]] = Query(None, description="Числовое значение ключа json_data до: ключ=число"),
     limit: int = Query(default=50, ge=1, le=100, description="Количество записей"),
     offset: int = Query(default=0, ge=0, description="Смещение"),
+    cursor: Optional[str] = Query(None, description="Курсор следующей страницы (next_cursor из предыдущего ответа)"),
+    order_by: CompanyOrder = Query(CompanyOrder.id, description="Сортировка: по id, по году или по метрике, затем id"),
+    fields: Optional[str] = Query(None, description="Поля компаний через запятую (id возвращается всегда)"),
+    include_json: bool = Query(True, description="Возвращать json_data"),
 ):
     """Фильтровать компании пользователя по метрикам"""
     logger.info(f"Filtering companies for user: {current_user.username}")
 
+    after = _decode_cursor(cursor, order_by, offset)
+    selected = _selected_fields(fields, include_json)
+    ranges = _metric_ranges(
+        revenue=(revenue_min, revenue_max),
+        headcount=(headcount_min, headcount_max),
+        payroll_fund=(payroll_fund_min, payroll_fund_max),
+        moscow_taxes=(moscow_taxes_min, moscow_taxes_max),
+        moscow_investments=(moscow_investments_min, moscow_investments_max),
+        export_volume=(export_volume_min, export_volume_max),
+        capacity_utilization=(capacity_utilization_min, capacity_utilization_max),
+    )
+    json_equals, json_ranges = _json_filters(data, data_min, data_max)
+
     session = get_session()
     try:
         # Используем репозиторий для фильтрации с автоматической фильтрацией по пользователю
         company_repo = CompanyRepository(session)
-        companies = company_repo.filter_by_metrics(
+        result = company_repo.filter_by_metrics(
             user_id=current_user.id,
             spark_status=spark_status,
             main_industry=main_industry,
@@ -223,18 +340,21 @@ async def filter_companies(
             support_measures=support_measures,
             special_status=special_status,
             years=years,
+            district=district,
+            ranges=ranges,
+            json_equals=json_equals,
+            json_ranges=json_ranges,
             skip=offset,
-            limit=limit
+            limit=limit + 1,
+            order_by=order_by,
+            after=after,
+            fields=selected,
         )
+        page = _company_page(result, limit, offset, order_by)
 
-        logger.info(f"Found {len(companies)} companies matching filters for user {current_user.username}")
+        logger.info(f"Found {page.total} companies matching filters for user {current_user.username}")
 
-        return CompanyListResponse(
-            companies=companies,
-            total=len(companies),
-            limit=limit,
-            offset=offset
-        )
+        return page
 
     except Exception as e:
         logger.error(f"Error filtering companies: {e}", exc_info=True)
@@ -245,6 +365,30 @@ async def filter_companies(
     finally:
         session.close()
 
+@router.get("/stats", response_model=CompanyStatsRead)
+async def get_company_stats(
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Статистика компаний пользователя по отрасли, размеру, округу, году и мерам
+    поддержки. Читается из счетчиков, которые обновляются при изменении компаний,
+    поэтому время ответа не зависит от количества компаний.
+    """
+    logger.info(f"Getting company stats for user: {current_user.username}")
+
+    session = get_session()
+    try:
+        return CompanyStatsRepository(session).get_for_user(current_user.id)
+
+    except Exception as e:
+        logger.error(f"Error getting company stats: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Failed to get company stats"
+        )
+    finally:
+        session.close()
+
 @router.get("/{company_id}", response_model=CompanyRead)
 async def get_company(
     company_id: int,
@@ -302,6 +446,8 @@ async def update_company(
     session = get_session()
     try:
         company = check_company_ownership(company_id, current_user.id, session)
+        stats = CompanyStatsRepository(session)
+        before = stats.snapshot([company.id])
 
         # Обновляем только переданные поля
         update_dict = update_data.model_dump(exclude_unset=True)
@@ -313,6 +459,8 @@ async def update_company(
         company.updated_at = datetime.now(timezone.utc)
 
         session.add(company)
+        # Счетчики статистики всех владельцев компании - в той же транзакции
+        stats.changed(before)
         session.commit()
         session.refresh(company)
 
@@ -362,6 +510,8 @@ async def update_company_key_metrics(
     session = get_session()
     try:
         company = check_company_ownership(company_id, current_user.id, session)
+        stats = CompanyStatsRepository(session)
+        before = stats.snapshot([company.id])
 
         # Обновляем только переданные метрики
         update_dict = metrics_data.model_dump(exclude_unset=True)
@@ -373,6 +523,8 @@ async def update_company_key_metrics(
         company.updated_at = datetime.now(timezone.utc)
 
         session.add(company)
+        # Счетчики статистики всех владельцев компании - в той же транзакции
+        stats.changed(before)
         session.commit()
         session.refresh(company)
 
@@ -422,12 +574,18 @@ async def update_company_json_data(
     session = get_session()
     try:
         company = check_company_ownership(company_id, current_user.id, session)
+        stats = CompanyStatsRepository(session)
+        before = stats.snapshot([company.id])
 
-        # Обновляем JSON данные
+        # Обновляем JSON данные и метрики из них
         company.json_data = json_data.json_data
+        for field, value in company_metrics(json_data.json_data).items():
+            setattr(company, field, value)
         company.updated_at = datetime.now(timezone.utc)
 
         session.add(company)
+        # Счетчики статистики всех владельцев компании - в той же транзакции
+        stats.changed(before)
         session.commit()
         session.refresh(company)
 
@@ -482,6 +640,7 @@ async def get_company_json_data(
 @router.post("/create-from-json", response_model=CompanyRead)
 async def create_company_from_json(
     json_data: CompanyJsonCreate,
+    conflict_policy: ConflictPolicy = Query(DEFAULT_CONFLICT_POLICY, description="Что делать, если компания с таким ИНН и годом уже существует"),
     current_user: User = Depends(get_current_user),
 ):
     """Создать компанию из JSON данных"""
@@ -495,113 +654,26 @@ async def create_company_from_json(
         # Используем статический метод из AsyncCSVReader для создания компании
         company_data = AsyncCSVReader.create_company_from_json(json_dict)
 
-        # Проверяем, не существует ли уже компания с таким ИНН и годом
-        existing_company = session.exec(
-            select(Company).where(
-                Company.inn == company_data["inn"],
-                Company.year == company_data["year"]
-            )
-        ).first()
-
-        if existing_company:
-            # Проверяем, не принадлежит ли уже эта компания пользователю
-            existing_link = session.exec(
-                select(UserCompanyLink).where(
-                    UserCompanyLink.user_id == current_user.id,
-                    UserCompanyLink.company_id == existing_company.id
-                )
-            ).first()
+        company_data["confirmation_status"] = ConfirmationStatus[company_data["confirmation_status"]]
 
-            if existing_link:
-                raise HTTPException(
-                    status_code=status.HTTP_409_CONFLICT,
-                    detail="Компания с таким ИНН и годом уже существует у пользователя"
-                )
-            else:
-                # Компания существует, но не принадлежит пользователю - добавляем связь
-                user_company_link = UserCompanyLink(
-                    user_id=current_user.id,
-                    company_id=existing_company.id
-                )
-                session.add(user_company_link)
-                session.commit()
-
-                logger.info(f"Added existing company {existing_company.id} to user {current_user.id}")
-
-                # Преобразуем существующую компанию в CompanyRead
-                return CompanyRead(
-                    id=existing_company.id,
-                    name=existing_company.name,
-                    full_name=existing_company.full_name,
-                    inn=existing_company.inn,
-                    year=existing_company.year,
-                    spark_status=existing_company.spark_status,
-                    main_industry=existing_company.main_industry,
-                    company_size_final=existing_company.company_size_final,
-                    organization_type=existing_company.organization_type,
-                    support_measures=existing_company.support_measures,
-                    special_status=existing_company.special_status,
-                    confirmation_status=existing_company.confirmation_status,
-                    confirmed_at=existing_company.confirmed_at,
-                    confirmer_identifier=existing_company.confirmer_identifier,
-                    json_data=existing_company.json_data,
-                    created_at=existing_company.created_at,
-                    updated_at=existing_company.updated_at
-                )
+        # Вставляем компанию или находим существующую по ИНН и году одним запросом
+        loader = CompanyBulkLoader(session, current_user.id, conflict_policy=conflict_policy)
+        result = loader.load([company_row(**company_data)])
+        company_id = result.company_ids[0]
 
-        # Создаем новую компанию
-        company = Company(
-            inn=company_data["inn"],
-            name=company_data["name"],
-            full_name=company_data["full_name"],
-            year=company_data["year"],
-            spark_status=company_data["spark_status"],
-            main_industry=company_data["main_industry"],
-            company_size_final=company_data["company_size_final"],
-            organization_type=company_data["organization_type"],
-            support_measures=company_data["support_measures"],
-            special_status=company_data["special_status"],
-            confirmation_status=company_data["confirmation_status"],
-            confirmed_at=company_data["confirmed_at"],
-            confirmer_identifier=company_data["confirmer_identifier"],
-            json_data=company_data["json_data"]
-        )
-
-        session.add(company)
-        session.flush()  # Получаем ID
-
-        # Создаем связь пользователя с компанией
-        user_company_link = UserCompanyLink(
-            user_id=current_user.id,
-            company_id=company.id
-        )
-        session.add(user_company_link)
+        if company_id not in result.linked_ids:
+            session.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Компания с таким ИНН и годом уже существует у пользователя"
+            )
 
         session.commit()
-        session.refresh(company)
+        company = session.get(Company, company_id)
 
-        logger.info(f"Created new company {company.id} for user {current_user.id}")
+        logger.info(f"Linked company {company.id} to user {current_user.id}")
 
-        # Преобразуем в CompanyRead
-        return CompanyRead(
-            id=company.id,
-            name=company.name,
-            full_name=company.full_name,
-            inn=company.inn,
-            year=company.year,
-            spark_status=company.spark_status,
-            main_industry=company.main_industry,
-            company_size_final=company.company_size_final,
-            organization_type=company.organization_type,
-            support_measures=company.support_measures,
-            special_status=company.special_status,
-            confirmation_status=company.confirmation_status,
-            confirmed_at=company.confirmed_at,
-            confirmer_identifier=company.confirmer_identifier,
-            json_data=company.json_data,
-            created_at=company.created_at,
-            updated_at=company.updated_at
-        )
+        return _company_to_company_read(company)
 
     except HTTPException:
         raise
@@ -627,6 +699,9 @@ async def delete_company(
     try:
         company = check_company_ownership(company_id, current_user.id, session)
 
+        # Компания удаляется у всех владельцев: их статистика уменьшается в той же транзакции
+        CompanyStatsRepository(session).deleting([company_id])
+
         # Удаляем связь пользователя с компанией
         user_company_link_statement = select(UserCompanyLink).where(
             UserCompanyLink.user_id == current_user.id,
@@ -1,21 +1,35 @@
 ﻿# Setup logger
+import asyncio
+import datetime
+import fcntl
+import hashlib
 import logging
 import re
 import uuid
 from logging.config import dictConfig
 from pathlib import Path
 
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import aiofiles
-from fastapi import (APIRouter, Depends, File, HTTPException, Query,
-                     UploadFile)
+from fastapi import (APIRouter, Depends, Header, HTTPException, Query,
+                     Request, Response, status)
+from sqlmodel import Session
 
 from api.auth import get_current_user
+from api.upload_stream import MultipartFileStream
+from csv_reader.compression import (DecompressedSizeError, DecompressionError, compressed_suffix, compression_for,
+                                    is_supported)
+from csv_reader.metrics import COMPANY_METRIC_FIELDS
 from csv_reader.reader import AsyncCSVReader
 from database.database import db
+from jobs import JobProgress, ingest_jobs
 from logging_config import LOGGING_CONFIG, ColoredFormatter
-from models import Company, UserCompanyLink, User, UserCreate
+from models import (Company, ConflictPolicy, IngestJob, JobKind, Upload, UploadSession, UploadSessionCreate,
+                    UploadSessionRead, UploadSessionStatus, UserCompanyLink, User, UserCreate)
+from repositories.company_bulk_loader import CompanyBulkLoader, company_row
+from repositories.job_repository import _job_to_job_read
+from repositories.upload_repository import UploadRepository, UploadSessionRepository, _upload_session_to_read
 from settings import settings
 
 
@@ -38,7 +52,17 @@ UPLOAD_DIR = Path(settings.upload_dir)
 OPTIMIZED_DIR = Path(settings.optimized_dir)
 
 MAX_FILE_SIZE_BYTES = settings.max_file_size_bytes
+MAX_RESUMABLE_UPLOAD_BYTES = settings.max_resumable_upload_bytes
+MAX_UPLOAD_CHUNK_BYTES = settings.max_upload_chunk_bytes
+UPLOAD_SESSION_TTL = datetime.timedelta(hours=settings.upload_session_ttl_hours)
 CSV_CONTENT_TYPES = settings.csv_content_types  # browsers often use the latter
+INGEST_BATCH_SIZE = settings.ingest_batch_size
+INGEST_CONFLICT_POLICY = ConflictPolicy(settings.ingest_conflict_policy)
+CSV_READER_ENGINE = settings.csv_reader_engine
+COLUMNAR_SIDECARS = settings.columnar_sidecars
+CSV_PARALLEL_THRESHOLD_BYTES = settings.csv_parallel_threshold_bytes
+CSV_PARALLEL_WORKERS = settings.csv_parallel_workers or None
+UPLOAD_READ_CHUNK_BYTES = 1024 * 1024  # 1MB
 
 # ------------------------------------------------------------------------------
 # Helpers
@@ -90,88 +114,58 @@ def _make_outfile(stem: str) -> Path:
     outfile.parent.mkdir(parents=True, exist_ok=True)
     return outfile
 
-def _sanitize_filename(name: str) -> str:
+def _sanitize_filename(name: str, compression: Optional[str] = None) -> str:
     """
     Keep only safe chars and collapse spaces. Keep extension if present.
+    Compressed files keep .csv.gz / .csv.zst: the reader detects compression by name.
     """
 
     logger.debug(f"Sanitizing filename: {name}")
+    suffix = ".csv" + compressed_suffix(compression)
     name = name.strip().replace(" ", "_")
     name = re.sub(r"[^A-Za-z0-9._-]", "", name)
     # disallow hidden files or empty names
     if not name or name.startswith("."):
-        name = f"file.csv"
-    # force .csv extension
-    if not name.lower().endswith(".csv"):
-        name += ".csv"
+        name = f"file{suffix}"
+    # drop a compression extension that does not match the content
+    if compression_for(name) is not None and not name.lower().endswith(suffix):
+        name = name.rsplit(".", 1)[0]
+    # force .csv (.csv.gz, .csv.zst) extension
+    if not name.lower().endswith(suffix):
+        if name.lower().endswith(".csv"):
+            name = name[:-len(".csv")]
+        name += suffix
 
     logger.debug(f"Sanitized filename: {name}")
     return name
 
 
-@router.post("/upload")
-async def upload_csv_file(
-    file: UploadFile = File(..., description="CSV file to upload"),
-    as_name: Optional[str] = Query(default=None, description="Name to save the file as"),
-    current_user: User = Depends(get_current_user),
-):
-    logger.info(f"Uploading file: {file.filename}, user: {current_user.username}")
-
-    # 1) Validate file
-    if file.content_type not in CSV_CONTENT_TYPES and not file.filename.lower().endswith(".csv"):
-        logger.warning(f"Unsupported file type: {file.content_type}")
-        raise HTTPException(status_code=415, detail="Only CSV files are allowed")
-
-    original_name = file.filename or "upload.csv"
-    safe_original = _sanitize_filename(original_name)
-    target_display_name = _sanitize_filename(as_name) if as_name else safe_original
+class _CompanyIngest:
+    """
+    Сохранение разобранных пачек CSV пользователю через CompanyBulkLoader
+    со счетчиками обработанных, пропущенных и ошибочных строк.
 
-    # 2) Unique stored name + path
-    stored_name = f"{uuid.uuid4().hex}_{target_display_name}"
-    stored_path = UPLOAD_DIR / stored_name
+    Без progress все пачки сохраняются одной транзакцией. В фоновой задаче
+    (передан progress) каждая пачка коммитится отдельно и обновляет счетчики
+    задачи: повторный запуск после сбоя безопасен благодаря ON CONFLICT.
+    """
 
-    # 3) Stream upload with size cap
-    total = 0
-    try:
-        async with aiofiles.open(stored_path, "wb") as out:
-            while True:
-                chunk = await file.read(1024 * 1024)  # 1MB
-                if not chunk:
-                    logger.debug("File upload complete")
-                    break
-                total += len(chunk)
-                if total > MAX_FILE_SIZE_BYTES:
-                    logger.warning("File too large")
-                    raise HTTPException(status_code=413, detail="File too large (limit 50 MB)")
-                await out.write(chunk)
-    except HTTPException:
-        if stored_path.exists():
+    def __init__(self, session, user_id: int, conflict_policy: ConflictPolicy, progress: Optional[JobProgress] = None):
+        self.session = session
+        self.progress = progress
+        self.loader = CompanyBulkLoader(session, user_id, batch_size=INGEST_BATCH_SIZE, conflict_policy=conflict_policy)
+        self.companies_processed = 0
+        self.companies_skipped = 0
+        self.companies_failed = 0
+        self.saved_companies = []
+        self.company_ids: set[int] = set()
+
+    def save_batch(self, companies_data: List[Dict[str, Any]], key_fields: List[Dict[str, Any]]) -> None:
+        # Company rows with key fields, full data is stored in json_data
+        rows = []
+        for company_data, key_field in zip(companies_data, key_fields):
             try:
-                stored_path.unlink()
-            except Exception:
-                logger.error("Failed to delete oversized file", exc_info=True)
-                pass
-        raise
-    finally:
-        logger.debug("Closing uploaded file")
-        await file.close()
-
-    # 4) Process CSV with AsyncCSVReader
-    logger.debug(f"Processing CSV with AsyncCSVReader: {stored_path}")
-    try:
-        reader = AsyncCSVReader(str(stored_path))
-        companies_data, key_fields = await reader.read_companies_with_key_fields()
-
-        logger.info(f"Read {len(companies_data)} companies from CSV")
-
-        # 5) Save to database
-        session = db.getSession()
-        try:
-            saved_companies = []
-
-            for i, (company_data, key_field) in enumerate(zip(companies_data, key_fields)):
-                # Create Company record with key fields
-                company = Company(
+                rows.append(company_row(
                     inn=int(key_field["inn"]) if key_field["inn"] else 0,
                     name=key_field["name"] or "",
                     year=key_field["year"] or 0,
@@ -180,40 +174,369 @@ async def upload_csv_file(
                     main_industry=key_field["main_industry"] or "",
                     company_size_final=key_field["company_size_final"] or "",
                     organization_type=key_field["organization_type"],
-                    support_measures=key_field["support_measures"] == "Получены",
+                    support_measures=bool(key_field["support_measures"]),
                     special_status=key_field["special_status"],
+                    **{field: key_field.get(field) for field in COMPANY_METRIC_FIELDS},
                     json_data=company_data  # Store full data as JSONB
-                )
+                ))
+            except Exception as e:
+                logger.warning(f"Invalid company row {company_data.get('number')}: {e}")
+                self.companies_failed += 1
+
+        # Upsert the batch on (inn, year) and link it to the user in bulk
+        result = self.loader.load(rows)
+
+        for row, company_id in zip(rows, result.company_ids):
+            if len(self.saved_companies) >= 5:  # Show first 5 companies
+                break
+            self.saved_companies.append({
+                "id": company_id,
+                "name": row["name"],
+                "inn": row["inn"]
+            })
+        self.companies_processed += len(result.company_ids)
+        self.company_ids.update(result.company_ids)
+        # Rows already linked to the user (or repeated in the batch) are skipped
+        self.companies_skipped += len(rows) - len(result.linked_ids)
+
+        if self.progress is not None:
+            self.session.commit()
+            self.progress.update(
+                processed=self.companies_processed + self.companies_failed,
+                skipped=self.companies_skipped,
+                failed=self.companies_failed,
+            )
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "companies_processed": self.companies_processed,
+            "companies_skipped": self.companies_skipped,
+            "companies_failed": self.companies_failed,
+            "companies_saved": self.saved_companies,
+        }
+
+
+def _make_reader(path: Path, max_decompressed_bytes: int = MAX_FILE_SIZE_BYTES) -> AsyncCSVReader:
+    return AsyncCSVReader(
+        str(path),
+        engine=CSV_READER_ENGINE,
+        parallel_threshold_bytes=CSV_PARALLEL_THRESHOLD_BYTES,
+        max_workers=CSV_PARALLEL_WORKERS,
+        max_decompressed_bytes=max_decompressed_bytes,
+        sidecar_dir=OPTIMIZED_DIR if COLUMNAR_SIDECARS else None,
+    )
+
 
-                session.add(company)
-                session.flush()  # Get the ID
+def _upload_compression(file_name: str) -> Optional[str]:
+    """Формат сжатия загружаемого файла по имени (415, если его нельзя распаковать)"""
+    compression = compression_for(file_name)
+    if not is_supported(compression):
+        logger.warning(f"Unsupported compression: {compression}")
+        raise HTTPException(status_code=415, detail=f"{compression} compressed files are not supported")
+    return compression
 
-                # Create UserBase relationship
-                user_base = UserCompanyLink(
-                    user_id=current_user.id,
-                    company_id=company.id
-                )
-                session.add(user_base)
 
-                saved_companies.append({
-                    "id": company.id,
-                    "name": company.name,
-                    "inn": company.inn
-                })
+async def ingest_csv_file(
+    path: Path,
+    user_id: int,
+    conflict_policy: ConflictPolicy = INGEST_CONFLICT_POLICY,
+    progress: Optional[JobProgress] = None,
+    max_decompressed_bytes: int = MAX_FILE_SIZE_BYTES,
+) -> _CompanyIngest:
+    """
+    Разбирает сохраненный CSV файл (в том числе .csv.gz, .csv.zst) пачками
+    через AsyncCSVReader и сохраняет компании пользователю (см. _CompanyIngest).
 
+    Returns:
+        _CompanyIngest со счетчиками и ID сохраненных компаний
+    """
+    logger.debug(f"Processing CSV with AsyncCSVReader: {path}")
+    reader = _make_reader(path, max_decompressed_bytes)
+    session = db.getSession()
+    ingest = _CompanyIngest(session, user_id, conflict_policy, progress)
+    try:
+        async for companies_data, key_fields in reader.iter_companies_with_key_fields(batch_size=INGEST_BATCH_SIZE):
+            # INSERT, коммит и счетчики задачи - в потоке, цикл событий обслуживает другие запросы
+            await asyncio.to_thread(ingest.save_batch, companies_data, key_fields)
+
+        session.commit()
+        logger.info(f"Saved {ingest.companies_processed} companies to database")
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+    return ingest
+
+
+async def ingest_csv_stream(
+    chunks: AsyncIterator[bytes],
+    path: Path,
+    session: Session,
+    user_id: int,
+    conflict_policy: ConflictPolicy = INGEST_CONFLICT_POLICY,
+) -> _CompanyIngest:
+    """
+    Разбирает CSV по мере получения байтов и сохраняет компании, пока
+    остаток файла еще передается.
+
+    Пачка вставляется в базу в потоке, а в это время цикл событий принимает
+    и разбирает следующие куски. Транзакцией управляет вызывающий код:
+    при ошибке (в том числе превышении размера файла) ее нужно откатить.
+
+    Args:
+        chunks: Байты CSV файла (сжатые, если path - .csv.gz или .csv.zst)
+        path: Куда сохраняется файл (для AsyncCSVReader)
+        session: Сессия, в которой сохраняются компании
+    """
+    reader = _make_reader(path)
+    ingest = _CompanyIngest(session, user_id, conflict_policy)
+    inserting: Optional[asyncio.Task] = None
+    try:
+        async for companies_data, key_fields in reader.iter_stream_with_key_fields(chunks, batch_size=INGEST_BATCH_SIZE):
+            # Сессия не потокобезопасна: следующая пачка ждет окончания предыдущей
+            if inserting is not None:
+                await inserting
+            inserting = asyncio.create_task(asyncio.to_thread(ingest.save_batch, companies_data, key_fields))
+        if inserting is not None:
+            await inserting
+            inserting = None
+    except BaseException:
+        if inserting is not None:
+            # Сессию можно откатывать только после того, как поток закончит с ней работу
+            await asyncio.gather(inserting, return_exceptions=True)
+        raise
+
+    logger.info(f"Saved {ingest.companies_processed} companies to database while uploading")
+    return ingest
+
+
+def _record_upload(session: Session, sha256: str, params: Dict[str, Any], user_id: int, ingest: _CompanyIngest) -> None:
+    UploadRepository(session).record(
+        sha256,
+        stored_name=params["stored_name"],
+        file_name=params["file_name"],
+        size_bytes=params["size_bytes"],
+        user_id=user_id,
+        company_ids=ingest.company_ids,
+    )
+
+
+@ingest_jobs.register(JobKind.upload)
+async def run_upload_job(job: IngestJob, progress: JobProgress) -> Dict[str, Any]:
+    """Фоновая обработка загруженного файла"""
+    params = job.params
+    ingest = await ingest_csv_file(
+        Path(params["stored_path"]),
+        job.user_id,
+        ConflictPolicy(params["conflict_policy"]),
+        progress,
+        params.get("max_decompressed_bytes", MAX_FILE_SIZE_BYTES),
+    )
+    if params.get("sha256"):
+        with db.getSession() as session:
+            _record_upload(session, params["sha256"], params, job.user_id, ingest)
             session.commit()
-            logger.info(f"Saved {len(saved_companies)} companies to database")
+    return ingest.summary()
+
+
+async def _read_upload(path: Path) -> AsyncIterator[bytes]:
+    """Читает сохраненный файл кусками для ingest_csv_stream"""
+    async with aiofiles.open(path, "rb") as f:
+        while chunk := await f.read(UPLOAD_READ_CHUNK_BYTES):
+            yield chunk
+
+
+def _remove_upload(path: Path) -> None:
+    if path.exists():
+        try:
+            path.unlink()
+        except Exception:
+            logger.error("Failed to delete uploaded file", exc_info=True)
+
+
+class _UploadWriter:
+    """Сохраняет куски файла на диск (если передан out) с ограничением размера и считает SHA-256"""
+
+    def __init__(self, out=None):
+        self.out = out
+        self.total = 0
+        self.sha256 = hashlib.sha256()
+
+    async def persist(self, chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        async for chunk in chunks:
+            self.total += len(chunk)
+            if self.total > MAX_FILE_SIZE_BYTES:
+                logger.warning("File too large")
+                raise HTTPException(status_code=413, detail="File too large (limit 50 MB)")
+            self.sha256.update(chunk)
+            if self.out is not None:
+                await self.out.write(chunk)
+            yield chunk
+
+    async def drain(self, chunks: AsyncIterator[bytes]) -> None:
+        async for _ in self.persist(chunks):
+            pass
+
+
+def _deduplicated_upload(session: Session, upload: Upload, user_id: int, file_name: str) -> Dict[str, Any]:
+    """Привязывает пользователю компании из уже обработанного файла вместо повторного разбора"""
+    uploads = UploadRepository(session)
+    companies_processed, companies_linked = uploads.link_to_user(upload.id, user_id)
+    session.commit()
+    logger.info(f"Upload is a duplicate of {upload.stored_name}, linked {companies_linked} companies")
+    return {
+        "file_name": file_name,
+        "stored_name": upload.stored_name,
+        "size_bytes": upload.size_bytes,
+        "deduplicated": True,
+        "companies_processed": companies_processed,
+        "companies_skipped": companies_processed - companies_linked,
+        "companies_failed": 0,
+        "companies_saved": uploads.preview_companies(upload.id),
+    }
 
-        except Exception as e:
-            session.rollback()
-            logger.error(f"Database error: {e}", exc_info=True)
-            raise HTTPException(status_code=500, detail=f"Database error: {e}")
-        finally:
-            session.close()
 
+def _queue_upload_job(user_id: int, params: Dict[str, Any]) -> tuple[IngestJob, Dict[str, Any]]:
+    """Ставит обработку сохраненного файла в очередь фоновых задач и возвращает задачу и ответ"""
+    job = ingest_jobs.submit(user_id, JobKind.upload, params)
+    logger.info(f"File uploaded, processing queued as job {job.id}: {params['stored_name']} ({params['size_bytes']} bytes)")
+    return job, {
+        "file_name": params["file_name"],
+        "stored_name": params["stored_name"],
+        "size_bytes": params["size_bytes"],
+        "deduplicated": False,
+        "job": _job_to_job_read(job),
+    }
+
+
+# Тело запроса разбирается вручную (MultipartFileStream), поэтому форма описывается для OpenAPI явно
+UPLOAD_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["file"],
+                    "properties": {
+                        "file": {"type": "string", "format": "binary", "description": "CSV file to upload"},
+                    },
+                },
+            },
+        },
+    },
+}
+
+
+@router.post("/upload", openapi_extra=UPLOAD_REQUEST_BODY)
+async def upload_csv_file(
+    request: Request,
+    response: Response,
+    as_name: Optional[str] = Query(default=None, description="Name to save the file as"),
+    conflict_policy: ConflictPolicy = Query(default=INGEST_CONFLICT_POLICY, description="How to handle companies that already exist (inn, year)"),
+    background: bool = Query(default=False, description="Process the file in a background job and return its ID"),
+    content_sha256: Optional[str] = Header(default=None, alias="X-Content-SHA256", description="SHA-256 of the file (hex): a known file is not parsed again"),
+    current_user: User = Depends(get_current_user),
+):
+    # 1) Read the multipart body up to the file headers and validate the file
+    file = await MultipartFileStream(request, "file").open()
+    logger.info(f"Uploading file: {file.filename}, user: {current_user.username}")
+
+    compression = _upload_compression(file.filename or "")
+    if compression is None and file.content_type not in CSV_CONTENT_TYPES and not file.filename.lower().endswith(".csv"):
+        logger.warning(f"Unsupported file type: {file.content_type}")
+        raise HTTPException(status_code=415, detail="Only CSV files are allowed")
+
+    original_name = file.filename or "upload.csv"
+    safe_original = _sanitize_filename(original_name, compression)
+    target_display_name = _sanitize_filename(as_name, compression) if as_name else safe_original
+
+    # Re-ingesting the same content with "keep" changes nothing, so a known file is only linked.
+    # "overwrite" and "merge" re-apply the file: companies may have changed since it was processed
+    deduplicate = conflict_policy == ConflictPolicy.keep
+
+    session = db.getSession()
+    try:
+        # 2) Client sent the hash of an already processed file: only verify the body
+        if deduplicate and content_sha256:
+            known = UploadRepository(session).get_by_sha256(content_sha256.strip().lower())
+            if known is not None:
+                writer = _UploadWriter()
+                await writer.drain(file.iter_chunks())
+                if writer.sha256.hexdigest() != known.sha256:
+                    raise HTTPException(status_code=400, detail="File content does not match X-Content-SHA256")
+                return _deduplicated_upload(session, known, current_user.id, safe_original)
+
+        # 3) Unique stored name + path
+        stored_name = f"{uuid.uuid4().hex}_{target_display_name}"
+        stored_path = UPLOAD_DIR / stored_name
+
+        # 4) Stream upload to disk with size cap and SHA-256. With "overwrite" and "merge" the CSV
+        #    is parsed and saved to database batch by batch while the rest of the body is arriving.
+        #    With "keep" the hash is checked first, so a known file is never parsed
+        ingest = None
+        try:
+            async with aiofiles.open(stored_path, "wb") as out:
+                writer = _UploadWriter(out)
+                if background or deduplicate:
+                    await writer.drain(file.iter_chunks())
+                else:
+                    chunks = writer.persist(file.iter_chunks())
+                    ingest = await ingest_csv_stream(chunks, stored_path, session, current_user.id, conflict_policy)
+            logger.debug("File upload complete")
+        except BaseException:
+            session.rollback()
+            _remove_upload(stored_path)
+            raise
+        total = writer.total
+        sha256 = writer.sha256.hexdigest()
+
+        # 5) The same content was processed before: drop this copy and link its companies
+        known = UploadRepository(session).get_by_sha256(sha256) if deduplicate else None
+        if known is not None:
+            _remove_upload(stored_path)
+            return _deduplicated_upload(session, known, current_user.id, safe_original)
+
+        params = {
+            "stored_path": str(stored_path),
+            "stored_name": stored_name,
+            "file_name": safe_original,
+            "size_bytes": total,
+            "sha256": sha256,
+            "conflict_policy": conflict_policy.value,
+        }
+
+        # 6) Process CSV in a background job: parsing and saving happen outside the request
+        if background:
+            response.status_code = status.HTTP_202_ACCEPTED
+            return _queue_upload_job(current_user.id, params)[1]
+
+        if ingest is None:
+            # New content with "keep": parse the saved file. If the same file is being
+            # processed by a parallel request, record() adds companies to its entry
+            try:
+                ingest = await ingest_csv_stream(_read_upload(stored_path), stored_path, session, current_user.id, conflict_policy)
+            except BaseException:
+                session.rollback()
+                _remove_upload(stored_path)
+                raise
+        _record_upload(session, sha256, params, current_user.id, ingest)
+        session.commit()
+    except HTTPException:
+        raise
+    except DecompressedSizeError as e:
+        raise HTTPException(status_code=413, detail=f"Decompressed file too large (limit {e.limit} bytes)")
+    except DecompressionError as e:
+        logger.warning(f"Invalid compressed upload: {e}")
+        raise HTTPException(status_code=400, detail="Invalid compressed file")
     except Exception as e:
+        session.rollback()
         logger.error(f"Error processing CSV: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"CSV processing error: {e}")
+    finally:
+        session.close()
 
     logger.info(f"File uploaded and processed successfully: {stored_name} ({total} bytes)")
 
@@ -221,6 +544,215 @@ async def upload_csv_file(
         "file_name": safe_original,
         "stored_name": stored_name,
         "size_bytes": total,
-        "companies_processed": len(saved_companies),
-        "companies_saved": saved_companies[:5],  # Show first 5 companies
+        "deduplicated": False,
+        **ingest.summary(),
     }
+
+
+# ------------------------------------------------------------------------------
+# Resumable uploads: the file is assembled from chunks sent by separate requests
+# ------------------------------------------------------------------------------
+CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+|\*)$")
+
+
+def _parse_content_range(value: str) -> tuple[int, int, Optional[int]]:
+    """Разбирает заголовок вида "bytes 0-1048575/10485760" (размер может быть "*")"""
+    match = CONTENT_RANGE_RE.match(value.strip())
+    if not match:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range, expected 'bytes <start>-<end>/<size>'")
+    start, end = int(match.group(1)), int(match.group(2))
+    if end < start:
+        raise HTTPException(status_code=400, detail="Invalid Content-Range: end is before start")
+    total = None if match.group(3) == "*" else int(match.group(3))
+    return start, end, total
+
+
+def _file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _offset_conflict(upload_session: UploadSession, detail: str) -> HTTPException:
+    """409 с текущим смещением: клиент продолжает загрузку с него"""
+    return HTTPException(
+        status_code=409,
+        detail=detail,
+        headers={"Upload-Offset": str(upload_session.received_bytes)},
+    )
+
+
+def _get_upload_session(session: Session, upload_id: str, user_id: int, receiving: bool = True) -> UploadSession:
+    upload_session = UploadSessionRepository(session).get_for_user(upload_id, user_id)
+    if upload_session is None:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if receiving and upload_session.status != UploadSessionStatus.receiving:
+        raise HTTPException(status_code=409, detail="Upload session is already completed")
+    return upload_session
+
+
+@router.post("/uploads", response_model=UploadSessionRead, status_code=201)
+async def create_upload_session(
+    request: UploadSessionCreate,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Создает сессию возобновляемой загрузки. Куски файла отправляются через
+    PUT /files/uploads/{upload_id} с заголовком Content-Range.
+    """
+    if request.size_bytes is not None and request.size_bytes > MAX_RESUMABLE_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"File too large (limit {MAX_RESUMABLE_UPLOAD_BYTES} bytes)")
+
+    safe_name = _sanitize_filename(request.file_name, _upload_compression(request.file_name))
+    stored_name = f"{uuid.uuid4().hex}_{safe_name}"
+
+    with db.getSession() as session:
+        sessions = UploadSessionRepository(session)
+        for expired_name in sessions.delete_expired():
+            _remove_upload(UPLOAD_DIR / expired_name)
+
+        # Куски дописываются в этот файл по мере получения
+        (UPLOAD_DIR / stored_name).touch()
+        upload_session = sessions.create(
+            current_user.id,
+            safe_name,
+            stored_name,
+            request.size_bytes,
+            request.conflict_policy,
+            UPLOAD_SESSION_TTL,
+        )
+        logger.info(f"Created upload session {upload_session.id} for {safe_name}, user: {current_user.username}")
+        return _upload_session_to_read(upload_session)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionRead)
+async def get_upload_session(
+    upload_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    """Состояние загрузки: received_bytes - смещение, с которого нужно продолжить"""
+    with db.getSession() as session:
+        upload_session = _get_upload_session(session, upload_id, current_user.id, receiving=False)
+        response.headers["Upload-Offset"] = str(upload_session.received_bytes)
+        return _upload_session_to_read(upload_session)
+
+
+@router.put("/uploads/{upload_id}", response_model=UploadSessionRead)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    response: Response,
+    content_range: str = Header(..., alias="Content-Range", description="bytes <start>-<end>/<size or *>"),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Принимает кусок файла. Кусок должен начинаться с текущего смещения
+    (received_bytes), тело запроса дописывается в файл по мере получения.
+    Если соединение оборвалось, кусок отправляется заново с того же смещения.
+    """
+    start, end, total = _parse_content_range(content_range)
+    length = end - start + 1
+    if length > MAX_UPLOAD_CHUNK_BYTES:
+        raise HTTPException(status_code=413, detail=f"Chunk too large (limit {MAX_UPLOAD_CHUNK_BYTES} bytes)")
+
+    with db.getSession() as session:
+        upload_session = _get_upload_session(session, upload_id, current_user.id)
+        if total is not None and upload_session.size_bytes is not None and total != upload_session.size_bytes:
+            raise HTTPException(status_code=400, detail="Content-Range size does not match the upload size")
+        if end + 1 > (upload_session.size_bytes or MAX_RESUMABLE_UPLOAD_BYTES):
+            raise HTTPException(status_code=413, detail="Chunk goes beyond the upload size")
+
+        path = UPLOAD_DIR / upload_session.stored_name
+        async with aiofiles.open(path, "r+b") as out:
+            # Блокировка файла: один кусок пишется одним запросом, в том числе из разных процессов
+            try:
+                fcntl.flock(out.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                raise _offset_conflict(upload_session, "Another chunk of this upload is being written")
+
+            session.refresh(upload_session)
+            if start != upload_session.received_bytes:
+                raise _offset_conflict(upload_session, f"Chunk must start at offset {upload_session.received_bytes}")
+
+            # Остаток оборванного куска отрезается, новый пишется сразу за полученными данными
+            await out.truncate(start)
+            await out.seek(start)
+            written = 0
+            try:
+                async for chunk in request.stream():
+                    written += len(chunk)
+                    if written > length:
+                        raise HTTPException(status_code=400, detail="Chunk is longer than Content-Range")
+                    await out.write(chunk)
+                if written != length:
+                    raise HTTPException(status_code=400, detail="Chunk is shorter than Content-Range")
+                await out.flush()
+            except BaseException:
+                await out.truncate(start)
+                raise
+
+            UploadSessionRepository(session).advance(upload_session.id, start, start + written)
+
+        session.refresh(upload_session)
+        logger.debug(f"Upload session {upload_session.id}: received {upload_session.received_bytes} bytes")
+        response.headers["Upload-Offset"] = str(upload_session.received_bytes)
+        return _upload_session_to_read(upload_session)
+
+
+@router.post("/uploads/{upload_id}/complete")
+async def complete_upload_session(
+    upload_id: str,
+    response: Response,
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Завершает загрузку: собранный файл обрабатывается фоновой задачей, как
+    /files/upload?background=true. Уже обработанный файл (тот же SHA-256,
+    политика keep) не разбирается повторно.
+    """
+    with db.getSession() as session:
+        upload_session = _get_upload_session(session, upload_id, current_user.id)
+        if upload_session.received_bytes == 0:
+            raise HTTPException(status_code=400, detail="No data received")
+        if upload_session.size_bytes is not None and upload_session.received_bytes != upload_session.size_bytes:
+            raise _offset_conflict(upload_session, "Upload is incomplete")
+
+        path = UPLOAD_DIR / upload_session.stored_name
+        sha256 = await asyncio.to_thread(_file_sha256, path)
+        sessions = UploadSessionRepository(session)
+
+        if upload_session.conflict_policy == ConflictPolicy.keep:
+            known = UploadRepository(session).get_by_sha256(sha256)
+            if known is not None:
+                _remove_upload(path)
+                sessions.complete(upload_session)
+                return _deduplicated_upload(session, known, current_user.id, upload_session.file_name)
+
+        job, body = _queue_upload_job(current_user.id, {
+            "stored_path": str(path),
+            "stored_name": upload_session.stored_name,
+            "file_name": upload_session.file_name,
+            "size_bytes": upload_session.received_bytes,
+            "sha256": sha256,
+            "conflict_policy": upload_session.conflict_policy.value,
+            "max_decompressed_bytes": MAX_RESUMABLE_UPLOAD_BYTES,
+        })
+        sessions.complete(upload_session, job.id)
+        response.status_code = status.HTTP_202_ACCEPTED
+        return body
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload_session(
+    upload_id: str,
+    current_user: User = Depends(get_current_user),
+):
+    """Отменяет незавершенную загрузку и удаляет полученные данные"""
+    with db.getSession() as session:
+        upload_session = _get_upload_session(session, upload_id, current_user.id)
+        _remove_upload(UPLOAD_DIR / upload_session.stored_name)
+        UploadSessionRepository(session).delete(upload_session)
+    return {"message": "Upload session deleted"}
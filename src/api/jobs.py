@@ -0,0 +1,40 @@
+import logging
+from logging.config import dictConfig
+
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlmodel import Session
+
+from api.auth import get_current_user
+from database.database import db
+from logging_config import LOGGING_CONFIG, ColoredFormatter
+from models import IngestJobRead, User
+from repositories.job_repository import JobRepository, _job_to_job_read
+
+# Setup logging
+dictConfig(LOGGING_CONFIG)
+logger = logging.getLogger(__name__)
+root_logger = logging.getLogger()
+for handler in root_logger.handlers:
+    if type(handler) is logging.StreamHandler:
+        handler.setFormatter(ColoredFormatter('%(levelname)s:     %(asctime)s %(name)s - %(message)s'))
+
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}", response_model=IngestJobRead)
+async def get_job(
+    job_id: int,
+    current_user: User = Depends(get_current_user),
+    session: Session = Depends(db.get_session)
+):
+    """
+    Статус фоновой задачи загрузки: обработано, пропущено и ошибочных строк,
+    скорость обработки и результат
+    """
+    job = JobRepository(session).get_for_user(job_id, current_user.id)
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Задача не найдена"
+        )
+    return _job_to_job_read(job)
@@ -1,21 +1,27 @@
 ﻿# /src/api/companies.py
 
+import asyncio
 import logging
 from datetime import datetime, timezone
 from logging.config import dictConfig
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from pydantic import BaseModel, Field
 from sqlmodel import Session, select
 
 from api.auth import get_current_user
 from database.database import db
+from jobs import JobProgress, ingest_jobs
 from logging_config import LOGGING_CONFIG, ColoredFormatter
-from models import Company, User, UserCompanyLink, ConfirmationStatus, CompanyUpdate, CompanyRead
-from repositories.company_repository import CompanyRepository
+from models import Company, User, UserCompanyLink, ConfirmationStatus, ConflictPolicy, CompanyUpdate, CompanyRead, IngestJob, IngestJobRead, JobKind
+from repositories.company_bulk_loader import CompanyBulkLoader, company_row
+from repositories.company_repository import CompanyRepository, _company_to_company_read
+from repositories.job_repository import _job_to_job_read
+from csv_reader.cache import parse_cache
 from csv_reader.reader import AsyncCSVReader
 from parser.parser import ParserEmulator
+from settings import settings
 
 # Setup logging
 dictConfig(LOGGING_CONFIG)
@@ -27,6 +33,9 @@ for handler in root_logger.handlers:
 
 router = APIRouter(prefix="/parser", tags=["parser"])
 
+INGEST_BATCH_SIZE = settings.ingest_batch_size
+DEFAULT_CONFLICT_POLICY = ConflictPolicy(settings.ingest_conflict_policy)
+
 # =========================
 # Утилиты
 # =========================
@@ -34,132 +43,51 @@ router = APIRouter(prefix="/parser", tags=["parser"])
 async def save_parsed_companies_to_db(
     parsed_companies: List[Dict[str, Any]],
     user_id: int,
-    session: Session
+    session: Session,
+    conflict_policy: ConflictPolicy = DEFAULT_CONFLICT_POLICY,
+    on_progress: Optional[Callable[[int], None]] = None,
 ) -> tuple[int, int, List[CompanyRead]]:
     """
     Сохраняет распарсенные компании в базу данных.
 
+    Компании вставляются пачками через INSERT ... ON CONFLICT (ИНН, год),
+    существующие записи обрабатываются по conflict_policy. Сохраненными
+    считаются компании, впервые привязанные к пользователю. on_progress
+    вызывается после каждой пачки с числом сохраненных строк.
+
     Returns:
         Кортеж из (количество сохраненных, количество пропущенных, список сохраненных компаний)
     """
-    saved_count = 0
     skipped_count = 0
-    saved_companies = []
 
+    # Преобразуем данные в формат для базы данных
+    rows = []
     for company_data in parsed_companies:
         try:
-            # Преобразуем данные в формат для базы данных
             company_dict = AsyncCSVReader.create_company_from_json(company_data)
-
-            # Проверяем, не существует ли уже компания с таким ИНН и годом
-            existing_company = session.exec(
-                select(Company).where(
-                    Company.inn == company_dict["inn"],
-                    Company.year == company_dict["year"]
-                )
-            ).first()
-
-            if existing_company:
-                # Проверяем, не принадлежит ли уже эта компания пользователю
-                existing_link = session.exec(
-                    select(UserCompanyLink).where(
-                        UserCompanyLink.user_id == user_id,
-                        UserCompanyLink.company_id == existing_company.id
-                    )
-                ).first()
-
-                if not existing_link:
-                    # Компания существует, но не принадлежит пользователю - добавляем связь
-                    user_company_link = UserCompanyLink(
-                        user_id=user_id,
-                        company_id=existing_company.id
-                    )
-                    session.add(user_company_link)
-                    session.flush()
-
-                    # Преобразуем в CompanyRead
-                    company_read = CompanyRead(
-                        id=existing_company.id,
-                        name=existing_company.name,
-                        full_name=existing_company.full_name,
-                        inn=existing_company.inn,
-                        year=existing_company.year,
-                        spark_status=existing_company.spark_status,
-                        main_industry=existing_company.main_industry,
-                        company_size_final=existing_company.company_size_final,
-                        organization_type=existing_company.organization_type,
-                        support_measures=existing_company.support_measures,
-                        special_status=existing_company.special_status,
-                        confirmation_status=existing_company.confirmation_status,
-                        confirmed_at=existing_company.confirmed_at,
-                        confirmer_identifier=existing_company.confirmer_identifier,
-                        json_data=existing_company.json_data,
-                        created_at=existing_company.created_at,
-                        updated_at=existing_company.updated_at
-                    )
-                    saved_companies.append(company_read)
-                    saved_count += 1
-                else:
-                    # Компания уже принадлежит пользователю
-                    skipped_count += 1
-            else:
-                # Создаем новую компанию
-                company = Company(
-                    inn=company_dict["inn"],
-                    name=company_dict["name"],
-                    full_name=company_dict["full_name"],
-                    year=company_dict["year"],
-                    spark_status=company_dict["spark_status"],
-                    main_industry=company_dict["main_industry"],
-                    company_size_final=company_dict["company_size_final"],
-                    organization_type=company_dict["organization_type"],
-                    support_measures=company_dict["support_measures"],
-                    special_status=company_dict["special_status"],
-                    confirmation_status=company_dict["confirmation_status"],
-                    confirmed_at=company_dict["confirmed_at"],
-                    confirmer_identifier=company_dict["confirmer_identifier"],
-                    json_data=company_dict["json_data"]
-                )
-
-                session.add(company)
-                session.flush()  # Получаем ID
-
-                # Создаем связь пользователя с компанией
-                user_company_link = UserCompanyLink(
-                    user_id=user_id,
-                    company_id=company.id
-                )
-                session.add(user_company_link)
-
-                # Преобразуем в CompanyRead
-                company_read = CompanyRead(
-                    id=company.id,
-                    name=company.name,
-                    full_name=company.full_name,
-                    inn=company.inn,
-                    year=company.year,
-                    spark_status=company.spark_status,
-                    main_industry=company.main_industry,
-                    company_size_final=company.company_size_final,
-                    organization_type=company.organization_type,
-                    support_measures=company.support_measures,
-                    special_status=company.special_status,
-                    confirmation_status=company.confirmation_status,
-                    confirmed_at=company.confirmed_at,
-                    confirmer_identifier=company.confirmer_identifier,
-                    json_data=company.json_data,
-                    created_at=company.created_at,
-                    updated_at=company.updated_at
-                )
-                saved_companies.append(company_read)
-                saved_count += 1
-
+            company_dict["confirmation_status"] = ConfirmationStatus[company_dict["confirmation_status"]]
+            rows.append(company_row(**company_dict))
         except Exception as e:
             logger.warning(f"Ошибка при сохранении компании: {e}")
             skipped_count += 1
-            continue
 
-    return saved_count, skipped_count, saved_companies
+    loader = CompanyBulkLoader(
+        session, user_id, batch_size=INGEST_BATCH_SIZE, on_progress=on_progress, conflict_policy=conflict_policy
+    )
+    # INSERT и коммиты пачек (on_progress) - в потоке, цикл событий обслуживает другие запросы
+    result = await asyncio.to_thread(loader.load, rows)
+
+    # Повторы (ИНН, год) и компании, уже принадлежащие пользователю, считаются пропущенными
+    saved_ids = [company_id for company_id in dict.fromkeys(result.company_ids) if company_id in result.linked_ids]
+    skipped_count += len(rows) - len(saved_ids)
+
+    companies = {}
+    for start in range(0, len(saved_ids), INGEST_BATCH_SIZE):
+        chunk = saved_ids[start:start + INGEST_BATCH_SIZE]
+        companies.update((company.id, company) for company in session.exec(select(Company).where(Company.id.in_(chunk))))
+    saved_companies = [_company_to_company_read(companies[company_id]) for company_id in saved_ids]
+
+    return len(saved_companies), skipped_count, saved_companies
 
 # =========================
 # Модели
@@ -175,24 +103,88 @@ class ParseResponse(BaseModel):
     message: str = Field(..., description="Сообщение о результате")
 
 
+class ParseCacheStats(BaseModel):
+    """Модель ответа со статистикой кэша разобранных файлов"""
+    hits: int = Field(..., description="Количество попаданий")
+    misses: int = Field(..., description="Количество промахов")
+    hit_ratio: float = Field(..., description="Доля попаданий")
+    evictions: int = Field(..., description="Количество вытесненных записей")
+    entries: int = Field(..., description="Количество записей в кэше")
+    max_entries: int = Field(..., description="Максимальное количество записей")
+    bytes: int = Field(..., description="Оценка занятой памяти, байт")
+    max_bytes: int = Field(..., description="Ограничение по памяти, байт")
+
+
+class ParseStatistics(BaseModel):
+    """Модель ответа со статистикой по данным парсера (ключи - значения колонок, значения - количество компаний)"""
+    total_companies: int = Field(..., description="Количество компаний")
+    industries: Dict[Any, int] = Field(..., description="По основной отрасли")
+    company_sizes: Dict[Any, int] = Field(..., description="По размеру компании")
+    support_measures: Dict[Any, int] = Field(..., description="По данным об оказанных мерах поддержки")
+    special_statuses: Dict[Any, int] = Field(..., description="По наличию особого статуса")
+    districts: Dict[Any, int] = Field(..., description="По округу")
+    organization_types: Dict[Any, int] = Field(..., description="По виду организации")
+    years: Dict[Any, int] = Field(..., description="По году")
+    aggregates: Optional[Dict[str, Dict[str, Any]]] = Field(None, description="Сумма, среднее и перцентили выручки, численности и налогов (aggregates=true)")
+
+
 class ParseSearchRequest(BaseModel):
     """Модель запроса для поиска при парсинге"""
     query: str = Field(..., description="Поисковый запрос")
     save_to_db: bool = Field(True, description="Сохранять найденные компании в базу данных")
+    conflict_policy: ConflictPolicy = Field(DEFAULT_CONFLICT_POLICY, description="Что делать с уже существующими компаниями (ИНН, год)")
 
 
 # =========================
 # Эндпоинты
 # =========================
 
-@router.post("/parse/bulk", response_model=ParseResponse)
+@ingest_jobs.register(JobKind.bulk_parse)
+async def run_bulk_parse_job(job: IngestJob, progress: JobProgress) -> Dict[str, Any]:
+    """Фоновый массовый парсинг: те же шаги, что и в /parse/bulk"""
+    parser = ParserEmulator()
+    all_data, key_fields = await parser.parse_companies_with_key_fields()
+
+    with db.getSession() as session:
+        def on_progress(loaded: int) -> None:
+            # Каждая пачка коммитится сразу: прогресс виден, а повтор задачи безопасен
+            session.commit()
+            progress.update(processed=loaded)
+
+        saved_count, skipped_count, saved_companies = await save_parsed_companies_to_db(
+            all_data,
+            job.user_id,
+            session,
+            ConflictPolicy(job.params["conflict_policy"]),
+            on_progress=on_progress,
+        )
+        session.commit()
+
+    progress.update(processed=len(all_data), skipped=skipped_count)
+    return {
+        "parsed_count": len(all_data),
+        "saved_count": saved_count,
+        "skipped_count": skipped_count,
+    }
+
+
+@router.post("/parse/bulk", response_model=Union[ParseResponse, IngestJobRead])
 async def bulk_parse_companies(
+    response: Response,
+    conflict_policy: ConflictPolicy = Query(DEFAULT_CONFLICT_POLICY, description="Что делать с уже существующими компаниями (ИНН, год)"),
+    background: bool = Query(False, description="Выполнить в фоновой задаче и вернуть ее ID"),
     current_user: User = Depends(get_current_user),
     session: Session = Depends(db.get_session)
 ):
     """
     Массовый парсинг всех компаний из тестового файла
     """
+    if background:
+        job = ingest_jobs.submit(current_user.id, JobKind.bulk_parse, {"conflict_policy": conflict_policy.value})
+        logger.info(f"Массовый парсинг для пользователя {current_user.username} поставлен в очередь: задача {job.id}")
+        response.status_code = status.HTTP_202_ACCEPTED
+        return _job_to_job_read(job)
+
     try:
         logger.info(f"Начинаем массовый парсинг для пользователя: {current_user.username}")
 
@@ -204,7 +196,7 @@ async def bulk_parse_companies(
 
         # Сохраняем в базу данных
         saved_count, skipped_count, saved_companies = await save_parsed_companies_to_db(
-            all_data, current_user.id, session
+            all_data, current_user.id, session, conflict_policy
         )
 
         session.commit()
@@ -261,7 +253,7 @@ async def parse_search_by_inn(
 
         if request.save_to_db:
             saved_count, skipped_count, saved_companies = await save_parsed_companies_to_db(
-                [company], current_user.id, session
+                [company], current_user.id, session, request.conflict_policy
             )
             session.commit()
 
@@ -317,7 +309,7 @@ async def parse_search_by_industry(
 
         if request.save_to_db:
             saved_count, skipped_count, saved_companies = await save_parsed_companies_to_db(
-                companies, current_user.id, session
+                companies, current_user.id, session, request.conflict_policy
             )
             session.commit()
 
@@ -373,7 +365,7 @@ async def parse_search_by_status(
 
         if request.save_to_db:
             saved_count, skipped_count, saved_companies = await save_parsed_companies_to_db(
-                companies, current_user.id, session
+                companies, current_user.id, session, request.conflict_policy
             )
             session.commit()
 
@@ -394,3 +386,36 @@ async def parse_search_by_status(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ошибка при поиске по статусу: {str(e)}"
         )
+
+
+@router.get("/statistics", response_model=ParseStatistics)
+async def get_parse_statistics(
+    year: Optional[int] = Query(default=None, description="Only companies for this year"),
+    district: Optional[str] = Query(default=None, description="Only companies from this district"),
+    aggregates: bool = Query(default=False, description="Add sum, mean and percentiles of revenue, headcount and taxes"),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Статистика по данным парсера: распределения компаний по отраслям,
+    размерам, округам и т.д., с фильтром по году и округу
+    """
+    try:
+        logger.info(f"Получение статистики для пользователя: {current_user.username}")
+        return await ParserEmulator().get_statistics(year=year, district=district, aggregates=aggregates)
+
+    except Exception as e:
+        logger.error(f"Ошибка при получении статистики: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Ошибка при получении статистики: {str(e)}"
+        )
+
+
+@router.get("/cache/stats", response_model=ParseCacheStats)
+async def get_parse_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Статистика кэша разобранных файлов: попадания, промахи и заполненность
+    """
+    return ParseCacheStats(**parse_cache.stats())
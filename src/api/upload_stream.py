@@ -0,0 +1,115 @@
+import logging
+from typing import AsyncIterator, List, Optional
+
+from fastapi import HTTPException, Request
+from python_multipart.multipart import MultipartParser, MultipartParseError, parse_options_header
+
+logger = logging.getLogger(__name__)
+
+
+class MultipartFileStream:
+    """
+    Файл из тела multipart/form-data запроса, читаемый по мере получения.
+
+    UploadFile в FastAPI появляется только после того, как Starlette сохранит
+    все тело запроса во временный файл. Здесь тело разбирается прямо из
+    request.stream(), поэтому обработка файла может идти параллельно с его
+    передачей по сети. Остальные поля формы пропускаются.
+    """
+
+    def __init__(self, request: Request, field_name: str = "file"):
+        self.request = request
+        self.field_name = field_name
+        self.filename: Optional[str] = None
+        self.content_type: Optional[str] = None
+        self._stream = request.stream()
+        self._parser: Optional[MultipartParser] = None
+        self._chunks: List[bytes] = []
+        self._in_file = False
+        self._file_done = False
+        self._body_done = False
+        self._headers: dict[bytes, bytes] = {}
+        self._header_name = b""
+        self._header_value = b""
+
+    async def open(self) -> "MultipartFileStream":
+        """Читает тело до заголовков файла: после этого известны filename и content_type"""
+        content_type, params = parse_options_header(self.request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise HTTPException(status_code=400, detail="Expected multipart/form-data body")
+
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+        while self.filename is None:
+            if not await self._read_body():
+                raise HTTPException(status_code=422, detail=f"Field '{self.field_name}' with a file is required")
+        return self
+
+    async def iter_chunks(self) -> AsyncIterator[bytes]:
+        """Отдает данные файла кусками по мере получения тела запроса"""
+        while True:
+            if self._chunks:
+                chunks, self._chunks = self._chunks, []
+                yield b"".join(chunks)
+            if self._file_done:
+                return
+            if not await self._read_body():
+                raise HTTPException(status_code=400, detail="Multipart body ended before the file")
+
+    async def _read_body(self) -> bool:
+        if self._body_done:
+            return False
+        try:
+            chunk = await self._stream.__anext__()
+        except StopAsyncIteration:
+            self._body_done = True
+            self._parser.finalize()
+            return False
+        try:
+            self._parser.write(chunk)
+        except MultipartParseError as e:
+            logger.warning(f"Invalid multipart body: {e}")
+            raise HTTPException(status_code=400, detail="Invalid multipart body")
+        return True
+
+    # Колбэки MultipartParser
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_name.lower()] = self._header_value
+        self._header_name = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        name = options.get(b"name", b"").decode("utf-8", errors="replace")
+        if self.filename is not None or name != self.field_name or b"filename" not in options:
+            return
+        self._in_file = True
+        self.filename = options[b"filename"].decode("utf-8", errors="replace")
+        self.content_type = self._headers.get(b"content-type", b"").decode("latin-1") or None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self._chunks.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_file:
+            self._in_file = False
+            self._file_done = True
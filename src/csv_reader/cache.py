@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Во сколько раз разобранные данные (списки словарей) больше исходного файла.
+# Используется для оценки занимаемой памяти без обхода объектов
+PARSED_SIZE_FACTOR = 8
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024  # 512MB
+DEFAULT_MAX_ENTRIES = 32
+
+
+class ParseCache:
+    """
+    Общий для процесса кэш разобранных файлов с вытеснением давно не
+    использованных записей (LRU) и ограничением по памяти.
+
+    Ключ записи - (путь, mtime, размер, параметры чтения), поэтому изменение
+    файла на диске автоматически дает промах, а старая запись со временем
+    вытесняется.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[Any, int]]" = OrderedDict()
+        self._loading: Dict[Hashable, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None) -> None:
+        """Меняет ограничения кэша, лишние записи сразу вытесняются"""
+        with self._lock:
+            if max_bytes is not None:
+                self.max_bytes = max_bytes
+            if max_entries is not None:
+                self.max_entries = max_entries
+            self._evict()
+
+    @staticmethod
+    def make_key(path: str, **options: Any) -> tuple:
+        """Ключ записи по пути, версии файла на диске и параметрам чтения"""
+        stat = os.stat(path)
+        return (
+            os.path.abspath(path),
+            stat.st_mtime_ns,
+            stat.st_size,
+            tuple(sorted(options.items())),
+        )
+
+    @staticmethod
+    def estimate_cost(path: str) -> int:
+        """Оценка памяти, которую займут разобранные данные файла"""
+        return os.path.getsize(path) * PARSED_SIZE_FACTOR
+
+    def fits(self, path: str) -> bool:
+        """Поместятся ли разобранные данные файла в кэш"""
+        return self.estimate_cost(path) <= self.max_bytes
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, cost: int) -> None:
+        with self._lock:
+            if cost > self.max_bytes:
+                logger.debug(f"Parsed data is too large for cache: {key[0]} ({cost} bytes)")
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.current_bytes -= previous[1]
+            self._entries[key] = (value, cost)
+            self.current_bytes += cost
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._entries and (self.current_bytes > self.max_bytes or len(self._entries) > self.max_entries):
+            key, (_, cost) = self._entries.popitem(last=False)
+            self.current_bytes -= cost
+            self.evictions += 1
+            logger.debug(f"Evicted parsed data from cache: {key[0]}")
+
+    async def get_or_load(self, path: str, loader: Callable[[], Awaitable[Any]], **options: Any) -> Any:
+        """
+        Возвращает разобранные данные файла из кэша или загружает их через loader.
+        Одновременные запросы одного и того же файла разбирают его один раз.
+        """
+        key = self.make_key(path, **options)
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        loading = self._loading.get(key)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[key] = future
+        try:
+            value = await loader()
+            self.put(key, value, self.estimate_cost(path))
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            # Исключение уже передано вызывающему коду, ожидающих может не быть
+            future.exception()
+            raise
+        finally:
+            del self._loading[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики попаданий и промахов и текущая заполненность кэша"""
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / requests if requests else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.current_bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+# Общий кэш процесса для AsyncCSVReader и ParserEmulator
+parse_cache = ParseCache()
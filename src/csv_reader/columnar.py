@@ -0,0 +1,248 @@
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from csv_reader.metrics import COMPANY_METRIC_COLUMNS, DISTRICT_COLUMN
+from csv_reader.schema import (SCHEMA_SAMPLE_SIZE, ColumnType, CSVSchema, convert_auto,
+                               convert_boolean, convert_date)
+
+logger = logging.getLogger(__name__)
+
+REVENUE_COLUMN = "Выручка предприятия, тыс. руб"
+SUPPORT_MEASURES_COLUMN = "Данные об оказанных мерах поддержки"
+SPECIAL_STATUS_COLUMN = "Наличие особого статуса"
+
+LARGE_COMPANY_REVENUE = 2000000  # 2 млрд рублей
+MEDIUM_COMPANY_REVENUE = 800000  # 800 млн рублей
+SUPPORT_MEASURES_NO = ["нет", "не получены", "не оказаны", "false", "0", ""]
+SPECIAL_STATUS_NO = ["сведения отсутствуют", "нет", "отсутствует", ""]
+
+
+def _convert_column(raw: pd.Series, column_type: ColumnType) -> pd.Series:
+    """
+    Конвертирует колонку целиком по типу из схемы: обрезка пробелов,
+    замена запятых на точки и приведение к числу выполняются векторно.
+    """
+    if pd.api.types.is_numeric_dtype(raw) and column_type in (ColumnType.numeric, ColumnType.auto):
+        # Числа уже разобраны парсером read_csv, float остается только для дробных значений
+        if pd.api.types.is_float_dtype(raw) and (raw.dropna() % 1 == 0).all():
+            return raw.astype("Int64")
+        return raw
+
+    if pd.api.types.is_numeric_dtype(raw):
+        raw = raw.astype(object).where(raw.notna(), None).map(lambda value: value if value is None else str(value))
+
+    if column_type == ColumnType.auto:
+        # Смешанная колонка - тип угадывается по каждой ячейке
+        return raw.map(convert_auto, na_action="ignore").astype(object)
+
+    stripped = raw.str.strip()
+    cleaned = stripped.str.replace(",", ".", regex=False).where(stripped != "", None)
+
+    if column_type == ColumnType.numeric:
+        numbers = pd.to_numeric(cleaned, errors="coerce")
+        if numbers.notna().sum() == cleaned.notna().sum():
+            if not cleaned.str.contains(".", regex=False).any():
+                return numbers.astype("Int64")
+            return numbers
+        # Не все значения разобрались - оставляем угадывание по ячейке
+        return raw.map(convert_auto, na_action="ignore").astype(object)
+
+    if column_type == ColumnType.boolean:
+        return cleaned.map(convert_boolean, na_action="ignore").astype(object)
+    if column_type == ColumnType.date:
+        return cleaned.map(convert_date, na_action="ignore").astype(object)
+    return cleaned
+
+
+def load_companies_frame(
+    path: str,
+    delimiter: str = ";",
+    column_types: Optional[Dict[str, ColumnType]] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """
+    Загружает CSV файл сразу в типизированные колонки.
+
+    Числовые колонки разбирает сам read_csv, остальные колонки конвертируются
+    векторно по типу, определенному по выборке строк (см. CSVSchema).
+
+    Args:
+        path: Путь к CSV файлу
+        delimiter: Разделитель колонок
+        column_types: Явно объявленные типы колонок
+        columns: Загружать только эти колонки (None - все), остальные read_csv пропускает
+    """
+    wanted = set(columns) if columns is not None else None
+    raw = pd.read_csv(
+        path,
+        sep=delimiter,
+        keep_default_na=False,
+        na_values=[""],
+        encoding="utf-8",
+        usecols=(lambda name: name in wanted) if wanted is not None else None,
+    )
+
+    sample = raw.head(SCHEMA_SAMPLE_SIZE).astype(object)
+    sample = sample.where(sample.notna(), "").astype(str).values.tolist()
+    schema = CSVSchema.infer(list(raw.columns), sample, declared_types=column_types)
+
+    frame = pd.DataFrame(
+        {name: _convert_column(raw[name], schema.column_types[name]) for name in raw.columns},
+        index=raw.index,
+    )
+    frame["number"] = np.arange(1, len(frame) + 1)
+
+    logger.debug(f"Loaded {len(frame)} rows with {len(raw.columns)} columns into DataFrame from {path}")
+    return frame
+
+
+def _column(frame: pd.DataFrame, name: str) -> pd.Series:
+    if name in frame.columns:
+        return frame[name]
+    return pd.Series(None, index=frame.index, dtype=object)
+
+
+def _as_text(column: pd.Series) -> pd.Series:
+    """Строковое представление значений, как str(value), пустые значения - пустая строка"""
+    values = column.astype(object)
+    return values.where(values.notna(), "").astype(str)
+
+
+def numeric_column(column: pd.Series) -> pd.Series:
+    """Значения колонки как float64 (допускается десятичная запятая), нечисловые и пустые - NaN"""
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype("float64")
+    text = _as_text(column).str.replace(",", ".", regex=False)
+    return pd.to_numeric(text.where(text != ""), errors="coerce")
+
+
+def company_size_column(revenue: pd.Series) -> pd.Series:
+    """Векторный аналог AsyncCSVReader._determine_company_size"""
+    values = numeric_column(revenue)
+
+    sizes = np.select(
+        [values >= LARGE_COMPANY_REVENUE, values >= MEDIUM_COMPANY_REVENUE, values.notna()],
+        ["Крупное", "Среднее", "Малое"],
+        default="Не указан",
+    )
+    return pd.Series(sizes, index=revenue.index, dtype=object)
+
+
+def support_measures_column(support_data: pd.Series) -> pd.Series:
+    """Векторный аналог AsyncCSVReader._parse_support_measures"""
+    text = _as_text(support_data).str.lower().str.strip()
+    return ~text.isin(SUPPORT_MEASURES_NO)
+
+
+def special_status_column(status_data: pd.Series) -> pd.Series:
+    """Векторный аналог AsyncCSVReader._parse_special_status"""
+    text = _as_text(status_data).str.strip()
+    return text.where(~text.str.lower().isin(SPECIAL_STATUS_NO), "Нет")
+
+
+def district_column(district: pd.Series) -> pd.Series:
+    """Векторный аналог metrics.district_value"""
+    text = _as_text(district).str.strip()
+    return text.where(text != "", None)
+
+
+def value_counts(column: pd.Series) -> Dict[Any, int]:
+    """
+    Количество строк по значениям колонки в порядке их первого появления.
+    Ключи - питоновские значения, пропуски считаются под ключом None.
+    """
+    counts = column.astype(object).value_counts(dropna=False, sort=False)
+    return {
+        None if pd.isna(value) else value: int(count)
+        for value, count in zip(counts.index.tolist(), counts.tolist())
+    }
+
+
+def numeric_summary(column: pd.Series, percentiles: Iterable[int] = (25, 50, 75, 90)) -> Dict[str, Any]:
+    """
+    Сумма, среднее, минимум, максимум и перцентили числовых значений колонки
+    (count - количество строк с числовым значением, пустые не учитываются)
+    """
+    percentiles = list(percentiles)
+    values = numeric_column(column).dropna()
+    summary: Dict[str, Any] = {"count": int(len(values)), "sum": float(values.sum())}
+    if values.empty:
+        summary.update({"mean": None, "min": None, "max": None})
+        summary.update({f"p{percentile}": None for percentile in percentiles})
+        return summary
+
+    summary.update({"mean": float(values.mean()), "min": float(values.min()), "max": float(values.max())})
+    quantiles = values.quantile([percentile / 100 for percentile in percentiles]).tolist()
+    summary.update({f"p{percentile}": float(value) for percentile, value in zip(percentiles, quantiles)})
+    return summary
+
+
+def _to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """Строки DataFrame в виде словарей с питоновскими значениями и None вместо пропусков"""
+    columns = []
+    for name in frame.columns:
+        column = frame[name]
+        if column.dtype == object and not column.isna().any():
+            columns.append(column.tolist())
+        else:
+            values = column.astype(object)
+            columns.append(values.where(values.notna(), None).tolist())
+
+    names = list(frame.columns)
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+class ColumnarCompanies:
+    """
+    Данные CSV файла в колоночном виде. Ключевые поля для базы данных
+    вычисляются векторно по колонкам, словари строк строятся только по запросу.
+    """
+
+    def __init__(self, frame: pd.DataFrame):
+        self.frame = frame
+        self._key_fields: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self.frame)
+
+    @property
+    def key_fields(self) -> pd.DataFrame:
+        """Ключевые поля для базы данных (аналог AsyncCSVReader._extract_key_fields)"""
+        if self._key_fields is None:
+            frame = self.frame
+            name = _column(frame, "Наименование организации")
+            self._key_fields = pd.DataFrame({
+                "inn": _column(frame, "ИНН"),
+                "name": name,
+                "full_name": name,
+                "spark_status": "Действующая",
+                "main_industry": _column(frame, "Основная отрасль"),
+                "company_size_final": company_size_column(_column(frame, REVENUE_COLUMN)),
+                "organization_type": _column(frame, "Вид организации"),
+                "support_measures": support_measures_column(_column(frame, SUPPORT_MEASURES_COLUMN)),
+                "special_status": special_status_column(_column(frame, SPECIAL_STATUS_COLUMN)),
+                "year": _column(frame, "Год"),
+                **{
+                    column: numeric_column(_column(frame, csv_column))
+                    for column, (csv_column, _) in COMPANY_METRIC_COLUMNS.items()
+                },
+                "district": district_column(_column(frame, DISTRICT_COLUMN)),
+            }, index=frame.index)
+        return self._key_fields
+
+    def to_records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Полные данные строк [start, stop) в виде словарей"""
+        return _to_records(self.frame.iloc[start:stop])
+
+    def key_fields_records(self, start: int = 0, stop: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Ключевые поля строк [start, stop) в виде словарей"""
+        return _to_records(self.key_fields.iloc[start:stop])
+
+    def iter_batches(self, batch_size: int) -> Iterator[tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """Отдает пачки вида (полные данные, ключевые поля)"""
+        for start in range(0, len(self.frame), batch_size):
+            stop = start + batch_size
+            yield self.to_records(start, stop), self.key_fields_records(start, stop)
@@ -0,0 +1,151 @@
+import logging
+import zlib
+from typing import AsyncIterable, AsyncIterator, Iterator, Optional
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Расширение сжатого файла -> формат сжатия
+COMPRESSION_SUFFIXES = {
+    ".gz": "gzip",
+    ".zst": "zstd",
+}
+# Ограничение распакованных данных за один вызов zlib: маленький сжатый
+# кусок может распаковаться в гигабайты, поэтому выход режется на части
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024  # 1MB
+# zstandard не умеет ограничивать выход, поэтому вход подается маленькими
+# частями: даже предельно сжатые данные (~1:32000) дают не больше ~32 МБ за раз
+ZSTD_INPUT_SLICE = 1024
+
+_GZIP_WBITS = 16 + zlib.MAX_WBITS
+_CODEC_ERRORS = (zlib.error,) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class DecompressionError(ValueError):
+    """Сжатые данные повреждены или формат сжатия не поддерживается"""
+
+
+class DecompressedSizeError(DecompressionError):
+    """Распакованные данные больше допустимого размера"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Распакованный файл больше {limit} байт")
+        self.limit = limit
+
+
+def compression_for(name: str) -> Optional[str]:
+    """Формат сжатия по имени файла: "gzip", "zstd" или None для несжатого"""
+    for suffix, compression in COMPRESSION_SUFFIXES.items():
+        if name.lower().endswith(suffix):
+            return compression
+    return None
+
+
+def compressed_suffix(compression: Optional[str]) -> str:
+    """Расширение файла для формата сжатия ("" для несжатого)"""
+    for suffix, known in COMPRESSION_SUFFIXES.items():
+        if known == compression:
+            return suffix
+    return ""
+
+
+def is_supported(compression: Optional[str]) -> bool:
+    """Можно ли распаковать формат в этом окружении (zstd требует модуль zstandard)"""
+    return compression in (None, "gzip") or (compression == "zstd" and zstandard is not None)
+
+
+class _GzipDecompressor:
+    """gzip, в том числе из нескольких склеенных потоков (как после `cat a.gz b.gz`)"""
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        while True:
+            if self._decompressor.eof:
+                # Нули после конца потока допускаются (выравнивание блоков на ленте)
+                if not data.strip(b"\0"):
+                    return
+                self._decompressor = zlib.decompressobj(_GZIP_WBITS)
+
+            output = self._decompressor.decompress(data, DECOMPRESS_CHUNK_SIZE)
+            if output:
+                yield output
+
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data
+            elif self._decompressor.unconsumed_tail or len(output) == DECOMPRESS_CHUNK_SIZE:
+                # Выход уперся в ограничение: остаток входа (и внутреннего буфера) - на следующем шаге
+                data = self._decompressor.unconsumed_tail
+            else:
+                return
+
+    def finish(self) -> None:
+        if not self._decompressor.eof:
+            raise DecompressionError("Сжатые данные gzip оборваны")
+
+
+class _ZstdDecompressor:
+    """zstd (один кадр, как у `zstd file.csv`)"""
+
+    def __init__(self):
+        self._decompressor = zstandard.ZstdDecompressor().decompressobj()
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        for start in range(0, len(data), ZSTD_INPUT_SLICE):
+            output = self._decompressor.decompress(data[start:start + ZSTD_INPUT_SLICE])
+            if output:
+                yield output
+
+    def finish(self) -> None:
+        if not getattr(self._decompressor, "eof", True):
+            raise DecompressionError("Сжатые данные zstd оборваны")
+
+
+def _make_decompressor(compression: str):
+    if compression == "gzip":
+        return _GzipDecompressor()
+    if compression == "zstd":
+        if zstandard is None:
+            raise DecompressionError("Для файлов .zst нужен модуль zstandard")
+        return _ZstdDecompressor()
+    raise DecompressionError(f"Неизвестный формат сжатия: {compression}")
+
+
+async def iter_decompressed(
+    chunks: AsyncIterable[bytes],
+    compression: str,
+    max_bytes: Optional[int] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Распаковывает поток сжатых байтов по мере получения. Распакованные
+    данные целиком нигде не хранятся: они отдаются частями сразу дальше.
+
+    Args:
+        chunks: Сжатые байты
+        compression: "gzip" или "zstd"
+        max_bytes: Ограничение распакованного размера (защита от zip-бомб)
+
+    Raises:
+        DecompressedSizeError: Распаковано больше max_bytes
+        DecompressionError: Данные повреждены или оборваны
+    """
+    decompressor = _make_decompressor(compression)
+    total = 0
+    try:
+        async for chunk in chunks:
+            for output in decompressor.feed(chunk):
+                total += len(output)
+                if max_bytes is not None and total > max_bytes:
+                    logger.warning(f"Decompressed {compression} data exceeds {max_bytes} bytes")
+                    raise DecompressedSizeError(max_bytes)
+                yield output
+        decompressor.finish()
+    except _CODEC_ERRORS as e:
+        raise DecompressionError(f"Некорректные сжатые данные {compression}: {e}") from e
+
+    logger.debug(f"Decompressed {total} bytes of {compression} data")
@@ -0,0 +1,99 @@
+import json
+import re
+from typing import Any, List
+
+# Пробельные символы между значениями JSON
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Ошибка ближе к концу куска может означать оборванное число, литерал или \uXXXX
+_TRUNCATED_TAIL = 16
+
+
+def _is_truncated(error: json.JSONDecodeError, buffer: str) -> bool:
+    """Может ли ошибка разбора исчезнуть, когда придет следующий кусок"""
+    return error.msg.startswith("Unterminated string") or error.pos >= len(buffer) - _TRUNCATED_TAIL
+
+
+class IncrementalJSONParser:
+    """
+    Инкрементальный разбор JSON с компаниями: принимает текст кусками
+    произвольного размера и возвращает элементы, как только они получены
+    целиком. В памяти остается только недоразобранный хвост.
+
+    Поддерживаются:
+    - массив верхнего уровня `[{...}, {...}]` - отдаются его элементы;
+    - объекты подряд, в том числе по одному на строке (NDJSON);
+    - один объект.
+    """
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        # start -> array (ждем элемент или "]") -> separator (ждем "," или "]") -> item -> ... -> done
+        # start -> objects (объекты подряд)
+        self._state = "start"
+
+    def feed(self, text: str) -> List[Any]:
+        """Добавляет кусок текста и возвращает все полностью полученные элементы"""
+        self._buffer += text
+        return self._parse(final=False)
+
+    def close(self) -> List[Any]:
+        """Разбирает остаток буфера. JSONDecodeError, если документ оборван или некорректен"""
+        items = self._parse(final=True)
+        if self._state in ("array", "separator", "item"):
+            raise json.JSONDecodeError("Массив JSON не закрыт", self._buffer, len(self._buffer))
+        return items
+
+    def _parse(self, final: bool) -> List[Any]:
+        items = []
+        buffer = self._buffer
+        position = 0
+        while True:
+            position = _WHITESPACE.match(buffer, position).end()
+            if position == len(buffer):
+                break
+            char = buffer[position]
+
+            if self._state == "start":
+                if char == "[":
+                    self._state = "array"
+                    position += 1
+                else:
+                    self._state = "objects"
+                continue
+
+            if self._state == "done":
+                raise json.JSONDecodeError("Лишние данные после массива JSON", buffer, position)
+
+            if self._state == "separator" or (self._state == "array" and char == "]"):
+                if char == "]":
+                    self._state = "done"
+                elif char == "," and self._state == "separator":
+                    self._state = "item"
+                else:
+                    raise json.JSONDecodeError("Ожидается ',' или ']'", buffer, position)
+                position += 1
+                continue
+
+            try:
+                value, end = self._decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError as e:
+                # Элемент получен не целиком - ждем следующий кусок. Ошибку в середине
+                # буфера следующие куски не исправят: не копим файл до конца
+                if final or not _is_truncated(e, buffer):
+                    raise
+                break
+            if end == len(buffer) and not final and not isinstance(value, (dict, list)):
+                # Число или литерал в конце куска может продолжиться в следующем
+                break
+
+            if self._state == "objects":
+                if not isinstance(value, dict):
+                    raise ValueError("JSON файл должен содержать объект или массив объектов")
+            else:
+                self._state = "separator"
+            items.append(value)
+            position = end
+
+        self._buffer = buffer[position:]
+        return items
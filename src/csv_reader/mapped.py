@@ -0,0 +1,255 @@
+import csv
+import io
+import logging
+import mmap
+import os
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+from csv_reader.schema import CONVERTERS, SCHEMA_SAMPLE_SIZE, ColumnType, CSVSchema
+
+logger = logging.getLogger(__name__)
+
+# Условие отбора строк: (название колонки, проверка сконвертированного значения)
+RowFilter = tuple[str, Callable[[Any], bool]]
+
+
+def quoted_record_end(buffer: Any, position: int, separator: Any) -> int:
+    """
+    Ищет конец записи, которая начинается в position и содержит кавычки, по тем
+    же правилам, что и csv.reader: поле в кавычках начинается только с кавычки
+    в начале поля, а кавычка в середине поля (например, ООО "НПП "ИТЭЛМА")
+    считается обычным символом. Работает с str, bytes и mmap.
+
+    Returns:
+        Позиция перевода строки, завершающего запись, или -1, если запись
+        в буфере не завершена
+    """
+    quote, newline_char = (b'"', b"\n") if isinstance(separator, bytes) else ('"', "\n")
+    quoted_field = separator + quote
+    newline = -1
+
+    # position всегда в начале поля или сразу после закрывающей кавычки
+    while True:
+        if buffer[position:position + 1] == quote:
+            # Пропускаем поле в кавычках, "" внутри - экранированная кавычка
+            position += 1
+            while True:
+                closing = buffer.find(quote, position)
+                if closing == -1:
+                    return -1
+                if buffer[closing + 1:closing + 2] != quote:
+                    break
+                position = closing + 2
+            position = closing + 1
+
+        if newline < position:
+            newline = buffer.find(newline_char, position)
+            if newline == -1:
+                return -1
+        # Следующее поле в кавычках в этой строке; разделители вне кавычек - обычные поля
+        next_quoted = buffer.find(quoted_field, position, newline)
+        if next_quoted == -1:
+            return newline
+        position = next_quoted + len(separator)
+
+
+def record_end(buffer: Any, position: int, separator: Any) -> int:
+    """
+    Конец записи, которая начинается в position: позиция завершающего ее
+    перевода строки или -1, если запись в буфере не завершена. Строка без
+    кавычек в начале полей заканчивается первым же переводом строки.
+    """
+    quote, newline_char = (b'"', b"\n") if isinstance(separator, bytes) else ('"', "\n")
+    newline = buffer.find(newline_char, position)
+    if newline == -1:
+        return -1
+    if buffer[position:position + 1] != quote and buffer.find(separator + quote, position, newline) == -1:
+        return newline
+    return quoted_record_end(buffer, position, separator)
+
+
+class MappedCSVFile:
+    """
+    CSV файл, отображенный в память (mmap). Записи разбираются прямо из
+    отображенного буфера: строка без кавычек делится по разделителю как байты,
+    и декодируются только нужные поля. Записи с кавычками (в том числе
+    многострочные) разбираются модулем csv.
+    """
+
+    def __init__(self, path: str, delimiter: str = ";"):
+        self.path = path
+        self.delimiter = delimiter
+        self._separator = delimiter.encode("utf-8")
+        self._quoted_field = self._separator + b'"'
+        self._file = None
+        self._buffer: Any = b""
+
+    def __enter__(self) -> "MappedCSVFile":
+        self._file = open(self.path, "rb")
+        if os.fstat(self._file.fileno()).st_size > 0:
+            # Пустой файл отобразить нельзя - для него остается пустой буфер
+            self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            if hasattr(self._buffer, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                self._buffer.madvise(mmap.MADV_SEQUENTIAL)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            self._buffer.close()
+        self._buffer = b""
+        self._file.close()
+
+    def release(self, position: int) -> None:
+        """
+        Отпускает уже разобранные страницы до позиции position, чтобы
+        прочитанная часть файла не оставалась в RSS процесса
+        """
+        if not isinstance(self._buffer, mmap.mmap) or not hasattr(mmap, "MADV_DONTNEED"):
+            return
+        length = position - position % mmap.PAGESIZE
+        if length > 0:
+            self._buffer.madvise(mmap.MADV_DONTNEED, 0, length)
+
+    def iter_spans(self) -> Iterator[tuple[int, int, bool]]:
+        """
+        Отдает границы записей вида (начало, конец, есть ли кавычки) без
+        перевода строки. Пустые строки пропускаются, как и в csv.reader.
+        """
+        buffer = self._buffer
+        size = len(buffer)
+        position = 0
+
+        while position < size:
+            end = buffer.find(b"\n", position)
+            if end == -1:
+                end = size
+
+            # Как и в csv.reader, поле в кавычках открывает только кавычка в начале поля
+            quoted = buffer.find(b'"', position, end) != -1 and (
+                buffer[position:position + 1] == b'"' or buffer.find(self._quoted_field, position, end) != -1
+            )
+            if quoted:
+                # Перевод строки внутри поля в кавычках не завершает запись
+                end = self._quoted_record_end(position, size)
+
+            record_end = end
+            if record_end > position and buffer[record_end - 1:record_end] == b"\r":
+                record_end -= 1
+            if record_end > position:
+                yield position, record_end, quoted
+            position = end + 1
+
+    def _quoted_record_end(self, position: int, size: int) -> int:
+        """Конец записи с кавычками (см. quoted_record_end), незавершенная запись идет до конца файла"""
+        end = quoted_record_end(self._buffer, position, self._separator)
+        return size if end == -1 else end
+
+    def decode(self, start: int, end: int, quoted: bool) -> List[str]:
+        """Декодирует все поля записи"""
+        if quoted:
+            text = self._buffer[start:end].decode("utf-8")
+            return next(csv.reader(io.StringIO(text, newline=None), delimiter=self.delimiter), [])
+        return self._buffer[start:end].decode("utf-8").split(self.delimiter)
+
+    def decode_fields(self, start: int, end: int, quoted: bool, indexes: Sequence[int]) -> List[Optional[str]]:
+        """Декодирует только поля с указанными номерами (None, если поля в записи нет)"""
+        if quoted:
+            values = self.decode(start, end, quoted)
+            return [values[index] if index < len(values) else None for index in indexes]
+
+        fields = self._buffer[start:end].split(self._separator)
+        return [fields[index].decode("utf-8") if index < len(fields) else None for index in indexes]
+
+
+def iter_mapped_batches(
+    path: str,
+    delimiter: str = ";",
+    column_types: Optional[Dict[str, ColumnType]] = None,
+    infer_types: bool = True,
+    batch_size: int = 1000,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[RowFilter] = None,
+) -> Iterator[tuple[CSVSchema, List[Dict[str, Any]]]]:
+    """
+    Читает CSV файл через mmap и отдает строки пачками.
+
+    Args:
+        path: Путь к CSV файлу
+        delimiter: Разделитель колонок
+        column_types: Явно объявленные типы колонок
+        infer_types: Определять типы остальных колонок по выборке строк
+        batch_size: Количество строк в пачке
+        columns: Декодировать только эти колонки (None - все)
+        where: Отбор строк по одной колонке - остальные поля декодируются
+               только у подошедших строк
+
+    Yields:
+        Пары (схема файла, строки пачки с номерами записей)
+    """
+    with MappedCSVFile(path, delimiter) as mapped:
+        spans = mapped.iter_spans()
+        header_span = next(spans, None)
+        if header_span is None:
+            return
+        fieldnames = mapped.decode(*header_span)
+
+        # Выборка для определения типов декодируется целиком
+        sample_spans = []
+        for span in spans:
+            sample_spans.append(span)
+            if len(sample_spans) >= SCHEMA_SAMPLE_SIZE:
+                break
+
+        if infer_types:
+            sample = [mapped.decode(*span) for span in sample_spans]
+            schema = CSVSchema.infer(fieldnames, sample, declared_types=column_types)
+        else:
+            schema = CSVSchema(fieldnames, column_types or {})
+
+        projected = None
+        if columns is not None:
+            projected = [
+                (name, fieldnames.index(name), CONVERTERS[schema.column_types[name]])
+                for name in columns if name in fieldnames
+            ]
+            projected_indexes = [index for _, index, _ in projected]
+        filter_index = None
+        if where is not None:
+            filter_name, predicate = where
+            if filter_name in fieldnames:
+                filter_index = fieldnames.index(filter_name)
+                filter_convert = CONVERTERS[schema.column_types[filter_name]]
+            elif not predicate(None):
+                # Колонки нет в файле - как и row.get(), значение у всех строк None
+                yield schema, []
+                return
+
+        def all_spans():
+            yield from sample_spans
+            yield from spans
+
+        batch = []
+        row_num = 0
+        for start, end, quoted in all_spans():
+            row_num += 1
+
+            if filter_index is not None:
+                value = mapped.decode_fields(start, end, quoted, (filter_index,))[0]
+                if not predicate(filter_convert(value)):
+                    continue
+
+            if projected is not None:
+                values = mapped.decode_fields(start, end, quoted, projected_indexes)
+                row = {name: convert(value) for (name, _, convert), value in zip(projected, values)}
+            else:
+                row = schema.convert_row(mapped.decode(start, end, quoted))
+
+            row["number"] = row_num
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield schema, batch
+                batch = []
+                mapped.release(end)
+
+        # Последняя пачка отдается всегда, чтобы вызывающий код получил схему
+        yield schema, batch
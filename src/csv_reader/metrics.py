@@ -0,0 +1,55 @@
+import math
+from typing import Any, Dict, Optional
+
+# Метрики из данных компании, которые хранятся в типизированных колонках таблицы companies:
+# колонка -> (колонка CSV, ключ CompanyJsonCreate)
+COMPANY_METRIC_COLUMNS = {
+    "revenue": ("Выручка предприятия, тыс. руб", "revenue"),
+    "headcount": ("Среднесписочная численность персонала, работающего в Москве, чел", "staff_count"),
+    "payroll_fund": ("Фонд оплаты труда  сотрудников, работающих в Москве, тыс. руб.", "payroll_fund"),
+    "moscow_taxes": ("Налоги, уплаченные в бюджет Москвы (без акцизов), тыс.руб.", "moscow_taxes"),
+    "moscow_investments": ("Инвестиции в Мск  тыс. руб.", "moscow_investments"),
+    "export_volume": ("Объем экспорта, тыс. руб.", "export_volume"),
+    "capacity_utilization": ("Уровень загрузки производственных мощностей", "capacity_utilization"),
+}
+DISTRICT_COLUMN = "Округ"
+DISTRICT_KEY = "district"
+# Все типизированные колонки: числовые метрики и округ
+COMPANY_METRIC_FIELDS = (*COMPANY_METRIC_COLUMNS, "district")
+# Ключи данных компании, из которых берется значение каждой типизированной колонки
+COMPANY_METRIC_KEYS = {**COMPANY_METRIC_COLUMNS, "district": (DISTRICT_COLUMN, DISTRICT_KEY)}
+
+
+def metric_value(value: Any) -> Optional[float]:
+    """Скалярный аналог columnar.numeric_column: число (допускается десятичная запятая) или None"""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        value = float(value)
+        return None if math.isnan(value) else value
+    try:
+        value = float(str(value).strip().replace(",", "."))
+    except ValueError:
+        return None
+    return None if math.isnan(value) else value
+
+
+def district_value(value: Any) -> Optional[str]:
+    """Округ без пробелов по краям, пустые значения - None"""
+    if value is None:
+        return None
+    text = str(value).strip()
+    return text or None
+
+
+def company_metrics(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Значения типизированных колонок метрик по данным компании: ключи CSV
+    или CompanyJsonCreate, нечисловые и пустые значения - None
+    """
+    metrics = {}
+    for column, keys in COMPANY_METRIC_COLUMNS.items():
+        values = (metric_value(data.get(key)) for key in keys)
+        metrics[column] = next((value for value in values if value is not None), None)
+    metrics["district"] = district_value(data.get(DISTRICT_COLUMN)) or district_value(data.get(DISTRICT_KEY))
+    return metrics
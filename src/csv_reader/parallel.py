@@ -0,0 +1,224 @@
+import asyncio
+import csv
+import io
+import logging
+import mmap
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from csv_reader.mapped import record_end
+from csv_reader.reader import _split_complete_records
+from csv_reader.schema import SCHEMA_SAMPLE_SIZE, ColumnType, CSVSchema
+
+logger = logging.getLogger(__name__)
+
+# Примерный размер куска файла, который разбирается одним процессом
+PARALLEL_CHUNK_BYTES = 8 * 1024 * 1024  # 8MB
+# Блок, которым файл читается при поиске границ кусков
+_SCAN_BLOCK_BYTES = 1024 * 1024  # 1MB
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_process_pool_workers: Optional[int] = None
+
+
+def get_process_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Возвращает общий для процесса пул воркеров (создается при первом обращении)"""
+    global _process_pool, _process_pool_workers
+
+    max_workers = max_workers or os.cpu_count() or 1
+    if _process_pool is None or _process_pool_workers != max_workers:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False)
+        logger.info(f"Starting CSV process pool with {max_workers} workers")
+        _process_pool = ProcessPoolExecutor(max_workers=max_workers)
+        _process_pool_workers = max_workers
+    return _process_pool
+
+
+def _read_header(path: str, delimiter: str) -> tuple[List[str], int]:
+    """Читает заголовок файла и возвращает (названия колонок, смещение начала данных)"""
+    separator = delimiter.encode("utf-8")
+    with open(path, "rb") as f:
+        data = b""
+        while True:
+            block = f.read(_SCAN_BLOCK_BYTES)
+            data += block
+            end = record_end(data, 0, separator)
+            if end != -1 or not block:
+                break
+
+    end = len(data) if end == -1 else end + 1
+    header = next(csv.reader(io.StringIO(data[:end].decode("utf-8"), newline=None), delimiter=delimiter), [])
+    return header, end
+
+
+class _QuoteScanner:
+    """
+    Ищет границы записей в файле, где поле в кавычках открывает только кавычка
+    в начале поля (см. mapped.record_end). Участки без таких кавычек
+    пропускаются поиском перевода строки, записи проходятся по одной только
+    вокруг полей в кавычках. Позиции ближайших кавычек запоминаются, поэтому
+    файл просматривается один раз.
+    """
+
+    def __init__(self, data: Any, separator: bytes):
+        self.data = data
+        self.separator = separator
+        self._quoted_field = separator + b'"'
+        # Позиции ближайших ';"' и '\n"' (-1 - до конца файла нет, -2 - еще не искали)
+        self._next_field = -2
+        self._next_line = -2
+
+    def _next_quote(self, position: int) -> int:
+        """Первая кавычка в начале поля не раньше position (position - начало записи)"""
+        data = self.data
+        if self._next_field != -1 and self._next_field < position:
+            self._next_field = data.find(self._quoted_field, position)
+        if self._next_line != -1 and self._next_line < position:
+            self._next_line = data.find(b'\n"', position)
+
+        candidates = [found + 1 for found in (self._next_field, self._next_line) if found != -1]
+        if data[position:position + 1] == b'"':
+            candidates.append(position)
+        return min(candidates, default=len(data))
+
+    def next_record_start(self, position: int, target: int) -> int:
+        """Начало первой записи не раньше target (position - начало записи)"""
+        data = self.data
+        size = len(data)
+        while position < size:
+            newline = data.find(b"\n", max(position, target))
+            if newline == -1:
+                return size
+            quote = self._next_quote(position)
+            if quote > newline:
+                return newline + 1
+
+            # До этой кавычки полей в кавычках нет, поэтому начало ее строки - начало записи
+            position = data.rfind(b"\n", position, quote) + 1 or position
+            while position <= quote:
+                end = record_end(data, position, self.separator)
+                if end == -1:
+                    return size
+                position = end + 1
+            if position >= target:
+                return position
+        return size
+
+
+def find_chunk_boundaries(
+    path: str,
+    data_start: int,
+    delimiter: str = ";",
+    chunk_bytes: int = PARALLEL_CHUNK_BYTES,
+) -> List[tuple[int, int]]:
+    """
+    Делит файл на куски примерно по chunk_bytes байт по границам записей
+    (переводам строки вне полей в кавычках).
+
+    Returns:
+        Список пар (начало, конец) в байтах
+    """
+    size = os.path.getsize(path)
+    if size <= data_start:
+        return []
+
+    boundaries = [data_start]
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        scanner = _QuoteScanner(data, delimiter.encode("utf-8"))
+        while boundaries[-1] + chunk_bytes < size:
+            start = scanner.next_record_start(boundaries[-1], boundaries[-1] + chunk_bytes)
+            if start >= size:
+                break
+            boundaries.append(start)
+
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+
+def _read_sample(path: str, data_start: int, delimiter: str, sample_size: int) -> List[List[str]]:
+    """Читает первые sample_size записей после заголовка для определения типов"""
+    with open(path, "rb") as f:
+        f.seek(data_start)
+        data = f.read(_SCAN_BLOCK_BYTES)
+        at_eof = not f.read(1)
+
+    text = data.decode("utf-8", errors="ignore")
+    # Незавершенная последняя запись попадает в выборку, только если это конец файла
+    complete = text if at_eof else _split_complete_records(text, delimiter)[0]
+    records = [record for record in csv.reader(io.StringIO(complete, newline=None), delimiter=delimiter) if record]
+    return records[:sample_size]
+
+
+def parse_chunk(path: str, start: int, end: int, delimiter: str, schema: CSVSchema) -> List[Dict[str, Any]]:
+    """
+    Разбирает кусок файла [start, end) в процессе-воркере.
+    Границы кусков проходят по переводам строк, поэтому кусок декодируется
+    независимо от соседних. Номера строк проставляет вызывающий код.
+    """
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+
+    convert_row = schema.convert_row
+    return [
+        convert_row(record)
+        for record in csv.reader(io.StringIO(text, newline=None), delimiter=delimiter)
+        if record
+    ]
+
+
+def _plan(
+    path: str,
+    delimiter: str,
+    column_types: Optional[Dict[str, ColumnType]],
+    infer_types: bool,
+) -> tuple[CSVSchema, List[tuple[int, int]]]:
+    header, data_start = _read_header(path, delimiter)
+    if infer_types:
+        sample = _read_sample(path, data_start, delimiter, SCHEMA_SAMPLE_SIZE)
+        schema = CSVSchema.infer(header, sample, declared_types=column_types)
+    else:
+        schema = CSVSchema(header, column_types or {})
+    return schema, find_chunk_boundaries(path, data_start, delimiter)
+
+
+async def iter_parallel_batches(
+    path: str,
+    delimiter: str,
+    column_types: Optional[Dict[str, ColumnType]] = None,
+    infer_types: bool = True,
+    max_workers: Optional[int] = None,
+) -> AsyncIterator[tuple[CSVSchema, List[Dict[str, Any]]]]:
+    """
+    Разбирает файл кусками в пуле процессов и отдает результаты в исходном
+    порядке строк. Одновременно в работе не больше 2 * max_workers кусков,
+    чтобы не держать в памяти весь разобранный файл.
+
+    Yields:
+        Пары (схема файла, строки очередного куска с проставленными номерами)
+    """
+    loop = asyncio.get_running_loop()
+    schema, chunks = await asyncio.to_thread(_plan, path, delimiter, column_types, infer_types)
+
+    pool = get_process_pool(max_workers)
+    window = 2 * (max_workers or os.cpu_count() or 1)
+    logger.debug(f"Parsing {path} in {len(chunks)} chunks with process pool")
+
+    pending = deque()
+    next_chunk = 0
+    row_num = 0
+    while next_chunk < len(chunks) or pending:
+        while next_chunk < len(chunks) and len(pending) < window:
+            start, end = chunks[next_chunk]
+            pending.append(loop.run_in_executor(pool, parse_chunk, path, start, end, delimiter, schema))
+            next_chunk += 1
+
+        rows = await pending.popleft()
+        for row in rows:
+            # Номер записи сквозной по всему файлу
+            row_num += 1
+            row["number"] = row_num
+        yield schema, rows
@@ -1,13 +1,25 @@
-﻿import csv
+﻿import asyncio
+import codecs
+import csv
+import io
 import json
 import logging
+import os
 from logging.config import dictConfig
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterable, AsyncIterator
 from datetime import datetime
 
 import aiofiles
 
+from csv_reader.cache import parse_cache
+from csv_reader.compression import compression_for, iter_decompressed
+from csv_reader.json_stream import IncrementalJSONParser
+from csv_reader.mapped import record_end
+from csv_reader import sidecar
+from csv_reader.metrics import COMPANY_METRIC_COLUMNS, DISTRICT_COLUMN, company_metrics
+from csv_reader.schema import SCHEMA_SAMPLE_SIZE, ColumnType, CSVSchema, convert_auto
+
 try:
     from logging_config import LOGGING_CONFIG, ColoredFormatter
 
@@ -21,28 +33,247 @@ try:
 except ImportError:
     logger = logging.getLogger(__name__)
 
+# Размер куска, который читается из файла за одно обращение (в символах)
+DEFAULT_CHUNK_SIZE = 1024 * 1024  # 1MB
+# Количество строк в одной пачке для потоковой обработки
+DEFAULT_BATCH_SIZE = 1000
+READER_ENGINES = ("python", "pandas", "mmap")
+# Колонки, из которых _extract_key_fields собирает ключевые поля
+KEY_FIELD_COLUMNS = (
+    "ИНН",
+    "Наименование организации",
+    "Основная отрасль",
+    "Вид организации",
+    "Данные об оказанных мерах поддержки",
+    "Наличие особого статуса",
+    "Год",
+    # Выручка (по ней же определяется размер предприятия) и другие метрики
+    *(csv_column for csv_column, _ in COMPANY_METRIC_COLUMNS.values()),
+    DISTRICT_COLUMN,
+)
+
+
+def _split_complete_records(buffer: str, delimiter: str) -> tuple[str, str]:
+    """
+    Делит буфер на полностью полученные записи и незавершенный хвост.
+
+    Граница записи - перевод строки вне поля в кавычках. Поле в кавычках, как
+    и в csv.reader, открывает только кавычка в начале поля (см. record_end),
+    поэтому кавычки внутри значения (ООО "НПП "ИТЭЛМА") границы не сдвигают.
+    """
+    position = 0
+    while True:
+        end = record_end(buffer, position, delimiter)
+        if end == -1:
+            return buffer[:position], buffer[position:]
+        position = end + 1
+
+
+class IncrementalCSVParser:
+    """
+    Инкрементальный разбор CSV: принимает текст кусками произвольного размера
+    и возвращает очищенные строки, как только они получены целиком.
+
+    Типы колонок определяются один раз по первым sample_size строкам
+    (см. CSVSchema), после чего каждая колонка конвертируется своим конвертером.
+    """
+
+    def __init__(
+        self,
+        delimiter: str,
+        column_types: Optional[Dict[str, ColumnType]] = None,
+        infer_types: bool = True,
+        sample_size: int = SCHEMA_SAMPLE_SIZE,
+    ):
+        self.delimiter = delimiter
+        self.column_types = column_types or {}
+        self.infer_types = infer_types
+        self.sample_size = sample_size
+        self.fieldnames: Optional[List[str]] = None
+        self.schema: Optional[CSVSchema] = None
+        self._buffer = ""
+        self._pending: List[List[str]] = []
+        self._row_num = 0
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """Добавляет кусок текста и возвращает все завершенные строки"""
+        complete, self._buffer = _split_complete_records(self._buffer + text, self.delimiter)
+        return self._parse(complete, final=False)
+
+    def close(self) -> List[Dict[str, Any]]:
+        """Разбирает остаток буфера (последняя строка без перевода строки)"""
+        rest, self._buffer = self._buffer, ""
+        return self._parse(rest, final=True)
+
+    def _build_schema(self, sample_rows: List[List[str]]) -> CSVSchema:
+        if self.infer_types:
+            return CSVSchema.infer(self.fieldnames, sample_rows, declared_types=self.column_types)
+        return CSVSchema(self.fieldnames, self.column_types)
+
+    def _parse(self, text: str, final: bool) -> List[Dict[str, Any]]:
+        records = [record for record in csv.reader(io.StringIO(text), delimiter=self.delimiter) if record]
+
+        if self.fieldnames is None:
+            if not records:
+                return []
+            self.fieldnames = records.pop(0)
+
+        if self.schema is None:
+            # Копим выборку строк, пока не хватит данных для определения типов
+            self._pending.extend(records)
+            if len(self._pending) < self.sample_size and not final:
+                return []
+            self.schema = self._build_schema(self._pending)
+            records, self._pending = self._pending, []
+
+        rows = []
+        convert_row = self.schema.convert_row
+        for record in records:
+            row = convert_row(record)
+
+            # Добавляем номер записи
+            self._row_num += 1
+            row["number"] = self._row_num
+
+            rows.append(row)
+
+        return rows
+
+
 class AsyncCSVReader:
-    def __init__(self, path: str, delimiter: str = ";"):
-        logger.debug(f"Initialized AsyncCSVReader with path: {path} and delimiter: '{delimiter}'")
+    def __init__(
+        self,
+        path: str,
+        delimiter: str = ";",
+        column_types: Optional[Dict[str, ColumnType]] = None,
+        infer_types: bool = True,
+        engine: str = "python",
+        parallel_threshold_bytes: Optional[int] = None,
+        max_workers: Optional[int] = None,
+        max_decompressed_bytes: Optional[int] = None,
+        sidecar_dir: Optional[Path] = None,
+    ):
+        """
+        Args:
+            path: Путь к CSV файлу (.csv, а также сжатый .csv.gz или .csv.zst)
+            delimiter: Разделитель колонок
+            column_types: Явно объявленные типы колонок
+            infer_types: Определять типы остальных колонок по выборке строк.
+                         Если False, тип угадывается по каждой ячейке
+            engine: "python" - потоковый разбор по строкам,
+                    "pandas" - загрузка в типизированные колонки с векторной обработкой,
+                    "mmap" - разбор прямо из отображенного в память файла с декодированием только нужных полей
+            parallel_threshold_bytes: Файлы не меньше этого размера движки "python" и "mmap"
+                                      разбирают кусками в пуле процессов (None - не использовать)
+            max_workers: Количество процессов для параллельного разбора (по умолчанию - число ядер)
+            max_decompressed_bytes: Ограничение распакованного размера сжатого файла
+                                    (DecompressedSizeError при превышении)
+            sidecar_dir: Папка колоночных копий CSV в формате Arrow (см. csv_reader.sidecar).
+                         Если задана и установлен pyarrow, повторное чтение берет
+                         типизированные колонки из копии, не разбирая текст заново
+        """
+        if engine not in READER_ENGINES:
+            raise ValueError(f"Неизвестный движок чтения CSV: {engine}")
+
+        self.compression = compression_for(str(path))
+        if self.compression is not None and engine != "python":
+            # Сжатый файл нельзя отобразить в память или резать по смещениям,
+            # а pandas распаковал бы его целиком: разбираем потоково
+            logger.debug(f"Using python engine for {self.compression} compressed file instead of {engine}")
+            engine = "python"
+
+        logger.debug(f"Initialized AsyncCSVReader with path: {path}, delimiter: '{delimiter}' and engine: {engine}")
         self.path = path
         self.delimiter = delimiter
+        self.column_types = column_types
+        self.infer_types = infer_types
+        self.engine = engine
+        self.parallel_threshold_bytes = parallel_threshold_bytes
+        self.max_workers = max_workers
+        self.max_decompressed_bytes = max_decompressed_bytes
+        # Колоночная копия повторяет разбор load_companies_frame: он не умеет
+        # угадывать тип по ячейке и распаковывать файл с ограничением размера
+        use_sidecar = sidecar_dir is not None and infer_types and self.compression is None and sidecar.is_available()
+        self.sidecar_dir = Path(sidecar_dir) if use_sidecar else None
+        self.schema: Optional[CSVSchema] = None
 
     def _clean_value(self, value: str) -> Any:
         """Очищает и конвертирует значения из CSV"""
-        if not value or value.strip() == "":
-            return None
-
-        # Заменяем запятые на точки для числовых значений
-        cleaned = value.replace(",", ".").strip()
+        return convert_auto(value)
+
+    def _make_parser(self) -> IncrementalCSVParser:
+        return IncrementalCSVParser(
+            self.delimiter,
+            column_types=self.column_types,
+            infer_types=self.infer_types,
+        )
+
+    def _use_parallel(self) -> bool:
+        """Нужно ли разбирать файл в пуле процессов"""
+        if self.parallel_threshold_bytes is None or self.compression is not None:
+            return False
+        try:
+            return os.path.getsize(self.path) >= self.parallel_threshold_bytes
+        except OSError:
+            return False
 
-        # Пытаемся конвертировать в число
+    async def _iter_parallel_batches(self) -> AsyncIterator[List[Dict[str, Any]]]:
+        from csv_reader.parallel import iter_parallel_batches
+
+        logger.debug(f"Parsing CSV file in process pool from path: {self.path}")
+        async for schema, rows in iter_parallel_batches(
+            self.path,
+            self.delimiter,
+            column_types=self.column_types,
+            infer_types=self.infer_types,
+            max_workers=self.max_workers,
+        ):
+            self.schema = schema
+            yield rows
+
+    async def _iter_mapped_batches(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        columns: Optional[List[str]] = None,
+        where=None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Разбирает отображенный в память файл в отдельном потоке, по пачке за раз"""
+        from csv_reader.mapped import iter_mapped_batches
+
+        logger.debug(f"Reading memory-mapped CSV file from path: {self.path}")
+        batches = iter_mapped_batches(
+            self.path,
+            self.delimiter,
+            column_types=self.column_types,
+            infer_types=self.infer_types,
+            batch_size=batch_size,
+            columns=columns,
+            where=where,
+        )
         try:
-            if "." in cleaned:
-                return float(cleaned)
-            else:
-                return int(cleaned)
-        except ValueError:
-            return cleaned
+            while True:
+                item = await asyncio.to_thread(next, batches, None)
+                if item is None:
+                    break
+                self.schema, rows = item
+                yield rows
+        finally:
+            batches.close()
+
+    async def _find_companies(self, column: str, predicate) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Отдает компании, у которых значение колонки column удовлетворяет predicate.
+        Движок "mmap" декодирует остальные поля только у подошедших строк.
+        """
+        if self.engine == "mmap" and not self._use_parallel():
+            async for rows in self._iter_mapped_batches(where=(column, predicate)):
+                for row in rows:
+                    yield row
+            return
+
+        async for company in self.iter_companies():
+            if predicate(company.get(column)):
+                yield company
 
     def _determine_company_size(self, row: Dict[str, Any]) -> str:
         """Определяет размер компании на основе выручки"""
@@ -109,45 +340,257 @@ class AsyncCSVReader:
             "support_measures": self._parse_support_measures(row.get("Данные об оказанных мерах поддержки")),
             "special_status": self._parse_special_status(row.get("Наличие особого статуса")),
             "year": row.get("Год"),
+            # Метрики для фильтров и сортировки по типизированным колонкам
+            **company_metrics(row),
         }
 
-    async def read_companies(self) -> List[Dict[str, Any]]:
+    def _load_frame(self, columns: Optional[List[str]] = None):
+        from csv_reader.columnar import load_companies_frame
+
+        if self.sidecar_dir is None:
+            logger.debug(f"Loading CSV file into columns from path: {self.path}")
+            frame = load_companies_frame(self.path, self.delimiter, self.column_types, columns)
+            if columns is not None:
+                frame = frame[[name for name in columns if name in frame.columns]]
+            return frame
+
+        frame = sidecar.read_sidecar(self.path, self.sidecar_dir, columns, self._sidecar_options())
+        if frame is not None:
+            return frame
+
+        # Копия сохраняется целиком, поэтому файл разбирается со всеми колонками
+        logger.debug(f"Loading CSV file into columns from path: {self.path}")
+        frame = load_companies_frame(self.path, self.delimiter, self.column_types)
+        try:
+            sidecar.write_sidecar(self.path, frame, self.sidecar_dir, self._sidecar_options())
+        except Exception as e:
+            # Копия только ускоряет следующее чтение - без нее данные все равно есть
+            logger.warning(f"Failed to write columnar sidecar for {self.path}: {e}")
+
+        if columns is not None:
+            frame = frame[[name for name in columns if name in frame.columns]]
+        return frame
+
+    def _sidecar_options(self) -> str:
+        return repr((self.delimiter, self._cache_options()["column_types"]))
+
+    def uses_sidecar(self) -> bool:
+        """Читаются ли колонки из колоночной копии файла"""
+        return self.sidecar_dir is not None
+
+    async def read_columnar(self, columns: Optional[List[str]] = None):
         """
-        Читает CSV файл с данными предприятий и возвращает список словарей с JSON данными
+        Загружает CSV файл в типизированные колонки (pandas) в отдельном потоке.
+        Если задана sidecar_dir, колонки берутся из колоночной копии файла,
+        а при ее отсутствии копия создается после разбора.
+
+        Args:
+            columns: Нужные колонки (None - все). Из колоночной копии читаются только они
+
+        Returns:
+            ColumnarCompanies с DataFrame и векторно вычисленными ключевыми полями
         """
-        companies = []
+        from csv_reader.columnar import ColumnarCompanies
+
+        frame = await asyncio.to_thread(self._load_frame, columns)
+        return ColumnarCompanies(frame)
+
+    async def iter_companies(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоково читает CSV файл кусками по chunk_size символов и отдает
+        очищенные строки по мере разбора, не загружая файл в память целиком
+        """
+        if self.engine == "pandas":
+            dataset = await self.read_columnar()
+            for start in range(0, len(dataset), DEFAULT_BATCH_SIZE):
+                for company in dataset.to_records(start, start + DEFAULT_BATCH_SIZE):
+                    yield company
+            return
+
+        if self._use_parallel():
+            async for rows in self._iter_parallel_batches():
+                for row in rows:
+                    yield row
+            return
+
+        if self.engine == "mmap":
+            async for rows in self._iter_mapped_batches():
+                for row in rows:
+                    yield row
+            return
+
+        if self.compression is not None:
+            logger.debug(f"Streaming {self.compression} compressed CSV file from path: {self.path}")
+            async for rows in self._iter_stream_rows(self._iter_file_bytes(chunk_size)):
+                for row in rows:
+                    yield row
+            return
+
+        parser = self._make_parser()
 
         async with aiofiles.open(self.path, mode="r", encoding="utf-8") as f:
-            logger.debug(f"Reading CSV file from path: {self.path}")
-            content = await f.read()
+            logger.debug(f"Streaming CSV file from path: {self.path}")
+            while True:
+                chunk = await f.read(chunk_size)
+                if not chunk:
+                    break
 
-        reader = csv.DictReader(content.splitlines(), delimiter=self.delimiter)
+                for row in parser.feed(chunk):
+                    yield row
 
-        for row_num, row in enumerate(reader, start=1):
-            # Очищаем значения
-            cleaned_row = {k: self._clean_value(v) for k, v in row.items()}
+        for row in parser.close():
+            yield row
 
-            # Добавляем номер записи
-            cleaned_row["number"] = row_num
+        self.schema = parser.schema
+
+    async def iter_company_batches(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Потоково читает CSV файл и отдает строки пачками по batch_size штук
+        """
+        batch = []
+        async for company in self.iter_companies(chunk_size=chunk_size):
+            batch.append(company)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+
+        if batch:
+            yield batch
+
+    async def iter_companies_with_key_fields(
+        self,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        chunk_size: int = DEFAULT_CHUNK_SIZE
+    ) -> AsyncIterator[tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Потоково читает CSV файл и отдает пачки вида (полные данные, ключевые поля)
+        """
+        if self.engine == "pandas":
+            dataset = await self.read_columnar()
+            for companies, key_fields in dataset.iter_batches(batch_size):
+                yield companies, key_fields
+            return
+
+        async for batch in self.iter_company_batches(batch_size=batch_size, chunk_size=chunk_size):
+            yield batch, [self._extract_key_fields(company) for company in batch]
+
+    async def iter_stream_with_key_fields(
+        self,
+        chunks: AsyncIterable[bytes],
+        batch_size: int = DEFAULT_BATCH_SIZE,
+    ) -> AsyncIterator[tuple[List[Dict[str, Any]], List[Dict[str, Any]]]]:
+        """
+        Разбирает CSV из потока байтов (например, тела запроса, пока оно еще
+        передается) и отдает пачки вида (полные данные, ключевые поля).
+
+        Куски могут резать строку или многобайтовый символ где угодно: байты
+        декодируются инкрементально, а переводы строк нормализуются так же,
+        как при чтении файла в текстовом режиме. Результат совпадает с
+        движком "python" для того же файла. Если path сжатого файла,
+        поток распаковывается на лету.
+        """
+        batch = []
 
-            companies.append(cleaned_row)
+        async for rows in self._iter_stream_rows(chunks):
+            batch.extend(rows)
+            while len(batch) >= batch_size:
+                rows, batch = batch[:batch_size], batch[batch_size:]
+                yield rows, [self._extract_key_fields(company) for company in rows]
+
+        for start in range(0, len(batch), batch_size):
+            rows = batch[start:start + batch_size]
+            yield rows, [self._extract_key_fields(company) for company in rows]
+
+    async def _iter_file_bytes(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[bytes]:
+        async with aiofiles.open(self.path, mode="rb") as f:
+            while chunk := await f.read(chunk_size):
+                yield chunk
+
+    async def _iter_stream_rows(self, chunks: AsyncIterable[bytes]) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Разбирает поток байтов CSV (сжатый, если сжат файл path) и отдает строки каждого куска"""
+        if self.compression is not None:
+            chunks = iter_decompressed(chunks, self.compression, self.max_decompressed_bytes)
+
+        parser = self._make_parser()
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder("utf-8")(), translate=True)
+        async for chunk in chunks:
+            yield parser.feed(decoder.decode(chunk))
+
+        yield parser.feed(decoder.decode(b"", final=True)) + parser.close()
+        self.schema = parser.schema
+
+    async def iter_key_fields(self, batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Потоково отдает пачки только ключевых полей для базы данных.
+        Движок "mmap" декодирует лишь колонки из KEY_FIELD_COLUMNS.
+        """
+        if self.engine == "mmap" and not self._use_parallel():
+            async for rows in self._iter_mapped_batches(batch_size=batch_size, columns=list(KEY_FIELD_COLUMNS)):
+                yield [self._extract_key_fields(row) for row in rows]
+            return
+
+        async for _, key_fields in self.iter_companies_with_key_fields(batch_size=batch_size):
+            yield key_fields
+
+    def _cache_options(self) -> Dict[str, Any]:
+        """Параметры чтения, от которых зависит результат разбора (часть ключа кэша)"""
+        column_types = tuple(sorted(
+            (name, ColumnType(column_type).value) for name, column_type in (self.column_types or {}).items()
+        ))
+        return {
+            "delimiter": self.delimiter,
+            "engine": self.engine,
+            "infer_types": self.infer_types,
+            "column_types": column_types,
+        }
+
+    async def _load_companies(self) -> List[Dict[str, Any]]:
+        if self.engine == "pandas" or self.uses_sidecar():
+            return (await self.read_columnar()).to_records()
+        return [company async for company in self.iter_companies()]
+
+    async def _load_companies_with_key_fields(self) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        if self.engine == "pandas" or self.uses_sidecar():
+            dataset = await self.read_columnar()
+            return dataset.to_records(), dataset.key_fields_records()
+
+        companies = []
+        key_fields = []
+        async for companies_batch, key_fields_batch in self.iter_companies_with_key_fields():
+            companies.extend(companies_batch)
+            key_fields.extend(key_fields_batch)
+        return companies, key_fields
+
+    async def read_companies(self) -> List[Dict[str, Any]]:
+        """
+        Читает CSV файл с данными предприятий и возвращает список словарей с JSON данными.
+        Повторное чтение неизмененного файла берется из parse_cache.
+        """
+        companies = await parse_cache.get_or_load(
+            self.path, self._load_companies, kind="companies", **self._cache_options()
+        )
 
         logger.debug(f"Read {len(companies)} companies from CSV file")
-        return companies
+        # Новый список, чтобы вызывающий код не изменил закэшированный
+        return list(companies)
 
     async def read_companies_with_key_fields(self) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         Читает CSV файл и возвращает:
         1. Полные JSON данные всех компаний
         2. Только ключевые поля для базы данных
+        Повторное чтение неизмененного файла берется из parse_cache.
         """
-        companies = await self.read_companies()
-
-        # Извлекаем ключевые поля для базы данных
-        key_fields = [self._extract_key_fields(company) for company in companies]
+        companies, key_fields = await parse_cache.get_or_load(
+            self.path, self._load_companies_with_key_fields, kind="companies_with_key_fields", **self._cache_options()
+        )
 
         logger.debug(f"Extracted {len(key_fields)} key fields for database")
-        return companies, key_fields
+        return list(companies), list(key_fields)
 
     async def write_companies(self, companies: List[Dict[str, Any]], output_path: Optional[str] = None) -> str:
         """
@@ -188,11 +631,8 @@ class AsyncCSVReader:
         """
         Находит компанию по ИНН
         """
-        companies = await self.read_companies()
-
-        for company in companies:
-            if str(company.get("ИНН")) == inn:
-                return company
+        async for company in self._find_companies("ИНН", lambda value: str(value) == inn):
+            return company
 
         return None
 
@@ -258,6 +698,7 @@ class AsyncCSVReader:
                 "confirmation_status": confirmation_status,
                 "confirmed_at": confirmed_at,
                 "confirmer_identifier": confirmer,
+                **company_metrics(json_data),
                 "json_data": json_data  # Сохраняем все исходные данные
             }
 
@@ -269,10 +710,36 @@ class AsyncCSVReader:
             logger.error(f"Error creating company from JSON: {e}")
             raise ValueError(f"Не удалось создать компанию из JSON: {e}")
 
+    @staticmethod
+    async def iter_json_file(file_path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоково читает JSON файл кусками по chunk_size символов и отдает
+        компании по мере разбора (см. IncrementalJSONParser): массив объектов,
+        NDJSON (объект на строке) или один объект.
+
+        Args:
+            file_path: Путь к JSON файлу
+            chunk_size: Размер куска чтения в символах
+        """
+        parser = IncrementalJSONParser()
+        async with aiofiles.open(file_path, 'r', encoding='utf-8-sig') as file:
+            logger.debug(f"Streaming JSON file from path: {file_path}")
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+
+                for item in parser.feed(chunk):
+                    yield item
+
+        for item in parser.close():
+            yield item
+
     @staticmethod
     async def read_json_file(file_path: str) -> List[Dict[str, Any]]:
         """
-        Читает JSON файл и возвращает список компаний.
+        Читает JSON файл (массив объектов, NDJSON или один объект) и
+        возвращает список компаний.
 
         Args:
             file_path: Путь к JSON файлу
@@ -280,19 +747,13 @@ class AsyncCSVReader:
         Returns:
             Список словарей с данными компаний
         """
+        async def load() -> List[Dict[str, Any]]:
+            return [item async for item in AsyncCSVReader.iter_json_file(file_path)]
+
         try:
-            async with aiofiles.open(file_path, 'r', encoding='utf-8') as file:
-                content = await file.read()
-                data = json.loads(content)
-
-                # Если это список компаний
-                if isinstance(data, list):
-                    return data
-                # Если это одна компания
-                elif isinstance(data, dict):
-                    return [data]
-                else:
-                    raise ValueError("JSON файл должен содержать объект или массив объектов")
+            # Повторное чтение неизмененного файла берется из parse_cache
+            data = await parse_cache.get_or_load(file_path, load, kind="json")
+            return list(data)
 
         except FileNotFoundError:
             logger.error(f"JSON файл не найден: {file_path}")
@@ -304,6 +765,34 @@ class AsyncCSVReader:
             logger.error(f"Ошибка чтения JSON файла: {e}")
             raise
 
+    @staticmethod
+    async def iter_companies_from_json_file(
+        file_path: str,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Потоково читает JSON файл и отдает каждую компанию сразу после
+        разбора и create_company_from_json. Компании с ошибками пропускаются.
+
+        Args:
+            file_path: Путь к JSON файлу
+            chunk_size: Размер куска чтения в символах
+
+        Returns:
+            Объекты компаний в формате CompanyCreate
+        """
+        created = 0
+        async for item in AsyncCSVReader.iter_json_file(file_path, chunk_size=chunk_size):
+            try:
+                company = AsyncCSVReader.create_company_from_json(item)
+            except Exception as e:
+                logger.warning(f"Пропущена компания из-за ошибки: {e}")
+                continue
+            created += 1
+            yield company
+
+        logger.info(f"Создано {created} компаний из JSON файла: {file_path}")
+
     @staticmethod
     async def create_companies_from_json_file(file_path: str) -> List[Dict[str, Any]]:
         """
@@ -316,19 +805,7 @@ class AsyncCSVReader:
             Список объектов компаний в формате CompanyCreate
         """
         try:
-            json_data = await AsyncCSVReader.read_json_file(file_path)
-            companies = []
-
-            for item in json_data:
-                try:
-                    company = AsyncCSVReader.create_company_from_json(item)
-                    companies.append(company)
-                except Exception as e:
-                    logger.warning(f"Пропущена компания из-за ошибки: {e}")
-                    continue
-
-            logger.info(f"Создано {len(companies)} компаний из JSON файла: {file_path}")
-            return companies
+            return [company async for company in AsyncCSVReader.iter_companies_from_json_file(file_path)]
 
         except Exception as e:
             logger.error(f"Ошибка создания компаний из JSON файла: {e}")
@@ -338,19 +815,13 @@ class AsyncCSVReader:
         """
         Находит компании по отрасли
         """
-        companies = await self.read_companies()
-
-        return [company for company in companies
-                if company.get("Основная отрасль") == industry]
+        return [company async for company in self._find_companies("Основная отрасль", lambda value: value == industry)]
 
     async def get_companies_by_status(self, status: str) -> List[Dict[str, Any]]:
         """
         Находит компании по статусу
         """
-        companies = await self.read_companies()
-
-        return [company for company in companies
-                if company.get("Статус ИТОГ") == status]
+        return [company async for company in self._find_companies("Статус ИТОГ", lambda value: value == status)]
 
 
 if __name__ == "__main__":
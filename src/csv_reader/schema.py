@@ -0,0 +1,194 @@
+import logging
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Сколько первых строк файла используется для определения типов колонок
+SCHEMA_SAMPLE_SIZE = 200
+
+BOOLEAN_VALUES = {"да": True, "нет": False}
+DATE_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d", "%d.%m.%Y %H:%M:%S", "%d.%m.%Y")
+
+
+class ColumnType(str, Enum):
+    numeric = "numeric"
+    boolean = "boolean"
+    date = "date"
+    text = "text"
+    auto = "auto"  # тип не определен - значение угадывается по каждой ячейке
+
+
+def convert_auto(value: Optional[str]) -> Any:
+    """Очищает и конвертирует значение, угадывая тип по самой ячейке"""
+    if not value or value.strip() == "":
+        return None
+
+    # Заменяем запятые на точки для числовых значений
+    cleaned = value.replace(",", ".").strip()
+
+    # Пытаемся конвертировать в число
+    try:
+        if "." in cleaned:
+            return float(cleaned)
+        else:
+            return int(cleaned)
+    except ValueError:
+        return cleaned
+
+
+def convert_numeric(value: Optional[str]) -> Any:
+    """Конвертирует значение числовой колонки (int или float)"""
+    if not value:
+        return None
+    cleaned = value.strip()
+    if not cleaned:
+        return None
+    if "," in cleaned:
+        cleaned = cleaned.replace(",", ".")
+
+    try:
+        if "." in cleaned:
+            return float(cleaned)
+        return int(cleaned)
+    except ValueError:
+        # Редкая ячейка, не похожая на число, остается строкой
+        return cleaned
+
+
+def convert_text(value: Optional[str]) -> Any:
+    """Конвертирует значение текстовой колонки без попыток разбора числа"""
+    if not value:
+        return None
+    cleaned = value.strip()
+    if not cleaned:
+        return None
+    # Как и при угадывании типа, запятые заменяются на точки
+    return cleaned.replace(",", ".")
+
+
+def convert_boolean(value: Optional[str]) -> Any:
+    """Конвертирует значения "Да"/"Нет" в булево значение"""
+    if not value:
+        return None
+    cleaned = value.strip()
+    if not cleaned:
+        return None
+    result = BOOLEAN_VALUES.get(cleaned.lower())
+    if result is None:
+        return convert_text(cleaned)
+    return result
+
+
+def _parse_date(value: str) -> Optional[datetime]:
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    return None
+
+
+def convert_date(value: Optional[str]) -> Any:
+    """Конвертирует дату в строку ISO 8601 (строкой, чтобы значение сериализовалось в JSON)"""
+    if not value:
+        return None
+    cleaned = value.strip()
+    if not cleaned:
+        return None
+    parsed = _parse_date(cleaned)
+    if parsed is None:
+        return convert_text(cleaned)
+    return parsed.isoformat(sep=" ")
+
+
+CONVERTERS: Dict[ColumnType, Callable[[Optional[str]], Any]] = {
+    ColumnType.numeric: convert_numeric,
+    ColumnType.boolean: convert_boolean,
+    ColumnType.date: convert_date,
+    ColumnType.text: convert_text,
+    ColumnType.auto: convert_auto,
+}
+
+
+def _infer_column_type(values: List[str], extended_types: bool) -> ColumnType:
+    """Определяет тип колонки по непустым значениям из выборки"""
+    if not values:
+        return ColumnType.auto
+
+    numeric_count = sum(1 for value in values if not isinstance(convert_auto(value), str))
+    if numeric_count == len(values):
+        return ColumnType.numeric
+    if numeric_count > 0:
+        # Смешанная колонка - оставляем угадывание по ячейке
+        return ColumnType.auto
+
+    if extended_types:
+        if all(value.lower() in BOOLEAN_VALUES for value in values):
+            return ColumnType.boolean
+        if all(_parse_date(value) is not None for value in values):
+            return ColumnType.date
+
+    return ColumnType.text
+
+
+class CSVSchema:
+    """
+    Схема CSV файла: тип каждой колонки определяется один раз на файл
+    (по заголовку и выборке строк), после чего к каждой колонке применяется
+    заранее выбранный конвертер вместо угадывания типа по каждой ячейке.
+    """
+
+    def __init__(self, fieldnames: List[str], column_types: Dict[str, ColumnType]):
+        self.fieldnames = list(fieldnames)
+        self.column_types = {name: column_types.get(name, ColumnType.auto) for name in self.fieldnames}
+        self._converters = [CONVERTERS[self.column_types[name]] for name in self.fieldnames]
+
+    @classmethod
+    def infer(
+        cls,
+        fieldnames: List[str],
+        sample_rows: List[List[str]],
+        declared_types: Optional[Dict[str, ColumnType]] = None,
+        extended_types: bool = False,
+    ) -> "CSVSchema":
+        """
+        Определяет типы колонок по выборке строк.
+
+        Args:
+            fieldnames: Заголовок файла
+            sample_rows: Выборка строк (списки сырых значений)
+            declared_types: Явно объявленные типы, имеют приоритет над выведенными
+            extended_types: Выводить также булевы и даты (по умолчанию только число/текст)
+        """
+        declared_types = declared_types or {}
+        column_types = {}
+
+        for index, name in enumerate(fieldnames):
+            if name in declared_types:
+                column_types[name] = ColumnType(declared_types[name])
+                continue
+
+            values = [
+                row[index].strip() for row in sample_rows
+                if index < len(row) and row[index] and row[index].strip()
+            ]
+            column_types[name] = _infer_column_type(values, extended_types)
+
+        logger.debug(f"Inferred CSV schema from {len(sample_rows)} rows: {column_types}")
+        return cls(fieldnames, column_types)
+
+    def convert_row(self, values: List[str]) -> Dict[str, Any]:
+        """Конвертирует сырые значения строки в словарь по схеме"""
+        if len(values) == len(self.fieldnames):
+            return {name: convert(value) for name, convert, value in zip(self.fieldnames, self._converters, values)}
+
+        # Короткие строки дополняются None, лишние значения складываются под ключ None (как в csv.DictReader)
+        row = {
+            name: convert(values[index]) if index < len(values) else None
+            for index, (name, convert) in enumerate(zip(self.fieldnames, self._converters))
+        }
+        if len(values) > len(self.fieldnames):
+            row[None] = values[len(self.fieldnames):]
+        return row
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:
+    pa = None
+
+logger = logging.getLogger(__name__)
+
+SIDECAR_SUFFIX = ".arrow"
+# Метаданные файла: версия исходного CSV и колонки, сохраненные как JSON
+SIGNATURE_KEY = b"source_signature"
+JSON_COLUMNS_KEY = b"json_columns"
+
+
+def is_available() -> bool:
+    """Можно ли писать и читать колоночные копии (нужен модуль pyarrow)"""
+    return pa is not None
+
+
+def sidecar_path(csv_path: str, directory: Path) -> Path:
+    """
+    Путь колоночной копии CSV файла в directory. Хэш полного пути различает
+    одноименные файлы из разных папок.
+    """
+    source = os.path.abspath(csv_path)
+    digest = hashlib.sha1(source.encode("utf-8")).hexdigest()[:12]
+    return Path(directory) / f"{Path(source).name}.{digest}{SIDECAR_SUFFIX}"
+
+
+def _signature(csv_path: str, options: str) -> bytes:
+    stat = os.stat(csv_path)
+    return f"{stat.st_mtime_ns}:{stat.st_size}:{options}".encode("utf-8")
+
+
+def _to_table(frame: pd.DataFrame) -> "pa.Table":
+    """
+    DataFrame в таблицу Arrow. Колонки со значениями разных типов (например,
+    числа и строки в колонке с угадыванием типа по ячейке) Arrow хранить
+    не умеет - они сохраняются как JSON строки и восстанавливаются при чтении.
+    """
+    json_columns = []
+    columns = {}
+    for name in frame.columns:
+        column = frame[name]
+        try:
+            pa.array(column, from_pandas=True)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            json_columns.append(name)
+            column = column.map(lambda value: json.dumps(value, ensure_ascii=False, default=str), na_action="ignore")
+        columns[name] = column
+
+    table = pa.Table.from_pandas(pd.DataFrame(columns, index=frame.index), preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[JSON_COLUMNS_KEY] = json.dumps(json_columns, ensure_ascii=False).encode("utf-8")
+    return table.replace_schema_metadata(metadata)
+
+
+def write_sidecar(csv_path: str, frame: pd.DataFrame, directory: Path, options: str = "") -> Optional[Path]:
+    """
+    Сохраняет типизированные колонки CSV файла в формате Arrow IPC без сжатия,
+    чтобы при чтении файл можно было отобразить в память.
+
+    Args:
+        csv_path: Путь к исходному CSV файлу
+        frame: Колонки файла (как у load_companies_frame)
+        directory: Папка колоночных копий
+        options: Параметры разбора (разделитель, типы колонок): копия с
+                 другими параметрами считается устаревшей
+
+    Returns:
+        Путь к сохраненной копии или None, если pyarrow не установлен
+    """
+    if pa is None:
+        return None
+
+    target = sidecar_path(csv_path, directory)
+    table = _to_table(frame)
+    metadata = dict(table.schema.metadata)
+    metadata[SIGNATURE_KEY] = _signature(csv_path, options)
+    table = table.replace_schema_metadata(metadata)
+
+    # Пишем во временный файл и подменяем: читатели не увидят недописанную копию.
+    # Имя уникально и для потоков одного процесса, сохраняющих копию одного файла
+    temporary = target.with_name(f"{target.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        with pa.OSFile(str(temporary), "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(temporary, target)
+    finally:
+        if temporary.exists():
+            temporary.unlink()
+
+    logger.info(f"Wrote columnar sidecar for {csv_path}: {target} ({len(frame)} rows)")
+    return target
+
+
+def read_sidecar(
+    csv_path: str,
+    directory: Path,
+    columns: Optional[List[str]] = None,
+    options: str = "",
+) -> Optional[pd.DataFrame]:
+    """
+    Загружает колонки из колоночной копии CSV файла. Файл отображается в
+    память, и с диска читаются только запрошенные колонки.
+
+    Args:
+        csv_path: Путь к исходному CSV файлу
+        directory: Папка колоночных копий
+        columns: Нужные колонки (отсутствующие в файле пропускаются), None - все
+        options: Параметры разбора, с которыми копия была записана
+
+    Returns:
+        DataFrame как у load_companies_frame или None, если копии нет,
+        она устарела (CSV изменился) или pyarrow не установлен
+    """
+    if pa is None:
+        return None
+
+    path = sidecar_path(csv_path, directory)
+    try:
+        source = pa.memory_map(str(path), "r")
+    except FileNotFoundError:
+        return None
+
+    with source:
+        reader = pa.ipc.open_file(source)
+        metadata = reader.schema.metadata or {}
+        if metadata.get(SIGNATURE_KEY) != _signature(csv_path, options):
+            logger.debug(f"Columnar sidecar is stale: {path}")
+            return None
+
+        table = reader.read_all()
+        if columns is not None:
+            table = table.select([name for name in columns if name in table.column_names])
+        frame = table.to_pandas()
+
+    for name in json.loads(metadata.get(JSON_COLUMNS_KEY, b"[]")):
+        if name in frame.columns:
+            frame[name] = frame[name].map(json.loads, na_action="ignore").astype(object)
+
+    logger.debug(f"Loaded {len(frame)} rows with {len(frame.columns)} columns from sidecar {path}")
+    return frame
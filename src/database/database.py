@@ -15,6 +15,7 @@ from typing import Generator
 from sqlmodel import Session, SQLModel, create_engine
 
 import models as models
+from database.migrations import apply_migrations
 from settings import settings
 
 from logging_config import LOGGING_CONFIG, ColoredFormatter
@@ -54,6 +55,15 @@ class DataBase:
 
         SQLModel.metadata.create_all(self.engine)
 
+    def applyMigrations(self) -> None:
+        """
+        Применяет к существующей базе изменения схемы, которые не создает
+        create_all (индексы, новые колонки).
+        """
+        logger.info(f"Applying migrations")
+
+        apply_migrations(self.engine)
+
     def dropAllTables(self) -> None:
         """
         Удаляет из базы все таблицы, описанные в SQLModel-моделях.
@@ -0,0 +1,244 @@
+"""
+Идемпотентные изменения схемы для уже существующих баз.
+
+SQLModel.metadata.create_all создает только отсутствующие таблицы, поэтому
+индексы и изменения существующих таблиц применяются здесь. Каждая миграция
+сама проверяет, нужно ли ее применять, и может запускаться при каждом старте.
+Миграции данных, которые нельзя проверить по схеме, выполняются один раз:
+выполненные записываются в таблицу applied_migrations.
+"""
+
+import logging
+from typing import Callable, List
+
+import pandas as pd
+from sqlalchemy import bindparam, exists, inspect, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection, Engine
+from sqlmodel import Session
+
+from csv_reader.columnar import SUPPORT_MEASURES_COLUMN, support_measures_column
+from csv_reader.metrics import COMPANY_METRIC_FIELDS, company_metrics
+from models import AppliedMigration, Company, UploadCompanyLink, UserCompanyLink
+from repositories.company_stats_repository import CompanyStatsRepository
+
+logger = logging.getLogger(__name__)
+
+# Количество компаний в одном UPDATE при заполнении колонок метрик
+METRIC_BACKFILL_BATCH_SIZE = 5000
+
+
+def _has_index(connection: Connection, table: str, name: str) -> bool:
+    return any(index["name"] == name for index in inspect(connection).get_indexes(table))
+
+
+def _is_applied(connection: Connection, name: str) -> bool:
+    statement = select(AppliedMigration.__table__.c.name).where(AppliedMigration.__table__.c.name == name)
+    return connection.execute(statement).first() is not None
+
+
+def _mark_applied(connection: Connection, name: str) -> None:
+    """Записывает однократную миграцию в той же транзакции, что и ее изменения"""
+    connection.execute(AppliedMigration.__table__.insert().values(AppliedMigration(name=name).model_dump()))
+
+
+def unique_company_inn_year(connection: Connection) -> None:
+    """
+    Уникальный индекс companies (inn, year). Перед созданием дубли
+    объединяются: связи пользователей переносятся на запись с минимальным id,
+    остальные записи удаляются.
+    """
+    if _has_index(connection, "companies", "ix_companies_inn_year"):
+        return
+
+    keepers = """
+        SELECT inn, year, MIN(id) AS keep_id
+        FROM companies
+        GROUP BY inn, year
+        HAVING COUNT(*) > 1
+    """
+    duplicates = f"""
+        SELECT c.id AS company_id, k.keep_id
+        FROM companies c
+        JOIN ({keepers}) k ON k.inn = c.inn AND k.year = c.year
+        WHERE c.id <> k.keep_id
+    """
+    connection.execute(text(f"""
+        INSERT INTO user_company_link (user_id, company_id)
+        SELECT DISTINCT l.user_id, d.keep_id
+        FROM user_company_link l
+        JOIN ({duplicates}) d ON d.company_id = l.company_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM user_company_link x
+            WHERE x.user_id = l.user_id AND x.company_id = d.keep_id
+        )
+    """))
+    connection.execute(text(f"""
+        DELETE FROM user_company_link
+        WHERE company_id IN (SELECT company_id FROM ({duplicates}) d)
+    """))
+    removed = connection.execute(text(f"""
+        DELETE FROM companies
+        WHERE id IN (SELECT company_id FROM ({duplicates}) d)
+    """)).rowcount
+    if removed:
+        logger.warning(f"Merged {removed} duplicate companies before creating unique (inn, year) index")
+
+    connection.execute(text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS ix_companies_inn_year ON companies (inn, year)"
+    ))
+
+
+def company_metric_columns(connection: Connection) -> None:
+    """
+    Типизированные колонки метрик companies (revenue, headcount, ..., district)
+    для баз, созданных до их появления. Колонки заполняются из json_data так
+    же, как при загрузке (csv_reader.metrics.company_metrics), пачками по id.
+    Затем счетчики статистики пересчитываются: округ теперь берется из колонки.
+    """
+    existing = {column["name"] for column in inspect(connection).get_columns("companies")}
+    missing = [name for name in COMPANY_METRIC_FIELDS if name not in existing]
+    if not missing:
+        return
+
+    table = Company.__table__
+    for name in missing:
+        column_type = table.c[name].type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE companies ADD COLUMN {name} {column_type}"))
+
+    # Имена параметров не должны совпадать с именами колонок в SET
+    update = (
+        table.update()
+        .where(table.c.id == bindparam("company_id"))
+        .values({name: bindparam(f"new_{name}") for name in COMPANY_METRIC_FIELDS})
+    )
+    filled, last_id = 0, 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.json_data)
+            .where(table.c.id > last_id)
+            .order_by(table.c.id)
+            .limit(METRIC_BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(update, [
+            {"company_id": company_id, **{f"new_{name}": value for name, value in company_metrics(json_data or {}).items()}}
+            for company_id, json_data in rows
+        ])
+        filled += len(rows)
+        last_id = rows[-1].id
+    logger.warning(f"Added company metric columns ({', '.join(missing)}) and filled them for {filled} companies")
+
+    with Session(bind=connection) as session:
+        CompanyStatsRepository(session).rebuild()
+
+
+def company_support_measures(connection: Connection) -> None:
+    """
+    support_measures компаний, загруженных из CSV: загрузка сравнивала уже
+    разобранное булево значение со строкой "Получены" и всегда записывала False.
+    Однократная миграция: для компаний из загруженных файлов (upload_company_link)
+    без мер поддержки значение пересчитывается из колонки CSV в json_data так же,
+    как при разборе файла (columnar.support_measures_column), пачками по id.
+    Компании, созданные из JSON, и последующие изменения через API не трогаются.
+    Если что-то изменилось, счетчики статистики пересчитываются.
+    """
+    if _is_applied(connection, "company_support_measures"):
+        return
+
+    table = Company.__table__
+    uploaded = exists().where(UploadCompanyLink.__table__.c.company_id == table.c.id)
+    update = table.update().where(table.c.id == bindparam("company_id")).values(support_measures=True)
+    fixed, last_id = 0, 0
+    while True:
+        rows = connection.execute(
+            select(table.c.id, table.c.json_data)
+            .where(table.c.id > last_id, table.c.support_measures.is_not(True), uploaded)
+            .order_by(table.c.id)
+            .limit(METRIC_BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        support_data = pd.Series([(json_data or {}).get(SUPPORT_MEASURES_COLUMN) for _, json_data in rows], dtype=object)
+        received = support_measures_column(support_data)
+        fixed_ids = [{"company_id": company_id} for (company_id, _), value in zip(rows, received) if value]
+        if fixed_ids:
+            connection.execute(update, fixed_ids)
+        fixed += len(fixed_ids)
+        last_id = rows[-1].id
+    _mark_applied(connection, "company_support_measures")
+    if not fixed:
+        return
+
+    logger.warning(f"Set support_measures for {fixed} companies from their CSV data")
+    with Session(bind=connection) as session:
+        CompanyStatsRepository(session).rebuild()
+
+
+def backfill_company_stats(connection: Connection) -> None:
+    """
+    Счетчики статистики компаний (user_company_stats) для привязок, созданных
+    до появления таблицы. Выполняется, только пока таблица пуста.
+    """
+    if connection.execute(text("SELECT 1 FROM user_company_stats LIMIT 1")).first() is not None:
+        return
+    if connection.execute(text("SELECT 1 FROM user_company_link LIMIT 1")).first() is None:
+        return
+
+    with Session(bind=connection) as session:
+        drift = CompanyStatsRepository(session).rebuild()
+    logger.warning(f"Backfilled {len(drift)} company stats counters")
+
+
+def company_json_data_jsonb(connection: Connection) -> None:
+    """
+    companies.json_data в PostgreSQL - JSONB вместо JSON. ALTER переписывает
+    таблицу целиком и блокирует ее на это время. GIN индекс создает
+    company_filter_indexes.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    column = next(column for column in inspect(connection).get_columns("companies") if column["name"] == "json_data")
+    if isinstance(column["type"], postgresql.JSONB):
+        return
+
+    connection.execute(text("ALTER TABLE companies ALTER COLUMN json_data TYPE JSONB USING json_data::jsonb"))
+    logger.warning("Converted companies.json_data to JSONB")
+
+
+def company_filter_indexes(connection: Connection) -> None:
+    """
+    Индексы фильтров списка компаний и обратный индекс связей
+    (company_id, user_id) из __table_args__ моделей. В PostgreSQL
+    CREATE INDEX блокирует запись в таблицу, пока индекс строится, поэтому
+    на больших базах миграцию лучше выполнить вне часов нагрузки.
+    """
+    for table in (Company.__table__, UserCompanyLink.__table__):
+        for index in table.indexes:
+            if _has_index(connection, table.name, index.name):
+                continue
+            # Индексы для другой базы (ddl_if) create пропускает
+            index.create(connection)
+            if _has_index(connection, table.name, index.name):
+                logger.warning(f"Created index {index.name} on {table.name}")
+
+
+# Миграции применяются по порядку
+MIGRATIONS: List[Callable[[Connection], None]] = [
+    unique_company_inn_year,
+    # До backfill_company_stats: статистика читает округ из колонки district
+    company_metric_columns,
+    company_support_measures,
+    backfill_company_stats,
+    company_json_data_jsonb,
+    company_filter_indexes,
+]
+
+
+def apply_migrations(engine: Engine) -> None:
+    """Применяет все миграции, каждую в своей транзакции"""
+    for migration in MIGRATIONS:
+        with engine.begin() as connection:
+            logger.info(f"Applying migration: {migration.__name__}")
+            migration(connection)
@@ -0,0 +1 @@
+from .queue import IngestJobQueue, JobProgress, ingest_jobs
@@ -0,0 +1,173 @@
+import asyncio
+import datetime
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from database.database import db
+from models import IngestJob, JobKind, JobStatus
+from repositories.job_repository import JobRepository
+from settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class JobProgress:
+    """
+    Счетчики выполняемой задачи. Каждое обновление сохраняется в базу,
+    поэтому GET /jobs/{id} видит прогресс, а обновленное время служит
+    признаком того, что задача жива.
+    """
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.processed = 0
+        self.skipped = 0
+        self.failed = 0
+        self._started = time.perf_counter()
+
+    @property
+    def rows_per_second(self) -> float:
+        elapsed = time.perf_counter() - self._started
+        return self.processed / elapsed if elapsed > 0 else 0.0
+
+    def update(self, processed: Optional[int] = None, skipped: Optional[int] = None, failed: Optional[int] = None) -> None:
+        """Устанавливает счетчики (переданные значения - итоги с начала задачи) и сохраняет их"""
+        if processed is not None:
+            self.processed = processed
+        if skipped is not None:
+            self.skipped = skipped
+        if failed is not None:
+            self.failed = failed
+        self.save()
+
+    def save(self) -> None:
+        with db.getSession() as session:
+            JobRepository(session).update_progress(
+                self.job_id, self.processed, self.skipped, self.failed, self.rows_per_second
+            )
+
+
+# Обработчик задачи: получает задачу и ее счетчики, возвращает результат для IngestJob.result
+JobHandler = Callable[[IngestJob, JobProgress], Awaitable[Dict[str, Any]]]
+
+
+class IngestJobQueue:
+    """
+    Очередь фоновых задач загрузки, хранящаяся в таблице ingest_jobs.
+
+    Воркеры - задачи asyncio в процессе приложения. Они забирают задачи из
+    таблицы условным UPDATE, поэтому несколько процессов uvicorn могут
+    работать с одной очередью. Задачи, прерванные остановкой приложения,
+    возвращаются в очередь сразу, а брошенные упавшим процессом - когда
+    перестают обновляться дольше stale_seconds, но не больше max_attempts
+    попыток. Повторный запуск безопасен: компании сохраняются через
+    INSERT ... ON CONFLICT.
+    """
+
+    def __init__(self, workers: int = 2, poll_seconds: float = 2.0, stale_seconds: int = 300, max_attempts: int = 3):
+        self.workers = workers
+        self.poll_seconds = poll_seconds
+        self.stale_after = datetime.timedelta(seconds=stale_seconds)
+        self.max_attempts = max_attempts
+        self._handlers: Dict[JobKind, JobHandler] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def register(self, kind: JobKind) -> Callable[[JobHandler], JobHandler]:
+        """Декоратор: регистрирует обработчик задач указанного типа"""
+        def decorator(handler: JobHandler) -> JobHandler:
+            self._handlers[kind] = handler
+            return handler
+        return decorator
+
+    def submit(self, user_id: int, kind: JobKind, params: Dict[str, Any]) -> IngestJob:
+        """Ставит задачу в очередь и будит свободного воркера"""
+        if kind not in self._handlers:
+            raise ValueError(f"No handler registered for job kind: {kind.value}")
+
+        with db.getSession() as session:
+            job = JobRepository(session).create(user_id, kind, params)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return job
+
+    async def start(self) -> None:
+        """Запускает воркеров (вызывается при старте приложения)"""
+        if self._tasks or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        with db.getSession() as session:
+            JobRepository(session).requeue_stale(self.stale_after, self.max_attempts)
+        self._tasks = [asyncio.create_task(self._worker(number)) for number in range(self.workers)]
+        logger.info(f"Started {self.workers} ingest job workers")
+
+    async def stop(self) -> None:
+        """Останавливает воркеров, выполняющиеся задачи возвращаются в очередь"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+        logger.info("Stopped ingest job workers")
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                with db.getSession() as session:
+                    job = JobRepository(session).claim_next()
+            except Exception as e:
+                logger.error(f"Worker {number} failed to claim a job: {e}", exc_info=True)
+                job = None
+
+            if job is not None:
+                await self._run(job)
+                continue
+
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+            except asyncio.TimeoutError:
+                # Простой - заодно подбираем задачи упавших процессов
+                try:
+                    with db.getSession() as session:
+                        JobRepository(session).requeue_stale(self.stale_after, self.max_attempts)
+                except Exception as e:
+                    logger.error(f"Worker {number} failed to requeue stale jobs: {e}", exc_info=True)
+
+    async def _heartbeat(self, progress: JobProgress) -> None:
+        # Обновляем задачу, даже если обработчик долго не сообщает о прогрессе
+        while True:
+            await asyncio.sleep(self.stale_after.total_seconds() / 3)
+            await asyncio.to_thread(progress.save)
+
+    async def _run(self, job: IngestJob) -> None:
+        logger.info(f"Running {job.kind.value} job id {job.id} (attempt {job.attempts})")
+        progress = JobProgress(job.id)
+        heartbeat = asyncio.create_task(self._heartbeat(progress))
+        try:
+            result = await self._handlers[job.kind](job, progress)
+        except asyncio.CancelledError:
+            with db.getSession() as session:
+                JobRepository(session).requeue(job.id)
+            raise
+        except Exception as e:
+            logger.error(f"Job id {job.id} failed: {e}", exc_info=True)
+            progress.save()
+            with db.getSession() as session:
+                JobRepository(session).finish(job.id, JobStatus.failed, error=str(e))
+        else:
+            progress.save()
+            with db.getSession() as session:
+                JobRepository(session).finish(job.id, JobStatus.succeeded, result=result)
+        finally:
+            heartbeat.cancel()
+
+
+# Общая очередь процесса: обработчики регистрируют модули API
+ingest_jobs = IngestJobQueue(
+    workers=settings.ingest_job_workers,
+    poll_seconds=settings.ingest_job_poll_seconds,
+    stale_seconds=settings.ingest_job_stale_seconds,
+    max_attempts=settings.ingest_job_max_attempts,
+)
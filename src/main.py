@@ -13,6 +13,7 @@ if __name__ == "__main__":
     workers = settings.workers
 
     db.createAllTables()
+    db.applyMigrations()
 
     uvicorn.run(
         app,
@@ -4,14 +4,19 @@ import os
 from typing import Any, Dict, List, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy.dialects.postgresql import JSON
-from sqlalchemy import BigInteger
+from sqlalchemy.dialects.postgresql import JSON, JSONB
+from sqlalchemy import JSON as GenericJSON, BigInteger, Index, text
 from sqlmodel import Column, Field, Relationship, SQLModel
 
 from settings import settings
 
 class UserCompanyLink(SQLModel, table=True):
     __tablename__ = "user_company_link"
+    __table_args__ = (
+        # Первичный ключ (user_id, company_id) ищет компании пользователя, этот - пользователей компании
+        # (статистика, удаление компании, пересчет счетчиков)
+        Index("ix_user_company_link_company_user", "company_id", "user_id"),
+    )
     user_id: int = Field(foreign_key="users.id", primary_key=True)
     company_id: int = Field(foreign_key="companies.id", primary_key=True)
 
@@ -120,6 +125,15 @@ class CompanyRead(SQLModel):
     support_measures: Optional[bool] = None
     special_status: Optional[str] = None
 
+    revenue: Optional[float] = None
+    headcount: Optional[float] = None
+    payroll_fund: Optional[float] = None
+    moscow_taxes: Optional[float] = None
+    moscow_investments: Optional[float] = None
+    export_volume: Optional[float] = None
+    capacity_utilization: Optional[float] = None
+    district: Optional[str] = None
+
     confirmation_status: ConfirmationStatus
     confirmed_at: Optional[datetime.datetime] = Field(description="Когда подтвердили компанию")
     confirmer_identifier: Optional[str] = Field(description="Идентификатор (логин или имя системы)")
@@ -129,6 +143,43 @@ class CompanyRead(SQLModel):
     updated_at: datetime.datetime
 
 
+class CompanySummary(SQLModel):
+    """
+    Компания в списке с выбранными полями (fields / include_json=false):
+    невыбранные колонки не читаются из базы и не попадают в ответ
+    """
+    id: int
+    name: Optional[str] = None
+    full_name: Optional[str] = None
+    inn: Optional[int] = None
+    year: Optional[int] = None
+
+    # main metrics
+    spark_status: Optional[str] = None
+    main_industry: Optional[str] = None
+    company_size_final: Optional[str] = None
+    organization_type: Optional[str] = None
+    support_measures: Optional[bool] = None
+    special_status: Optional[str] = None
+
+    revenue: Optional[float] = None
+    headcount: Optional[float] = None
+    payroll_fund: Optional[float] = None
+    moscow_taxes: Optional[float] = None
+    moscow_investments: Optional[float] = None
+    export_volume: Optional[float] = None
+    capacity_utilization: Optional[float] = None
+    district: Optional[str] = None
+
+    confirmation_status: Optional[ConfirmationStatus] = None
+    confirmed_at: Optional[datetime.datetime] = None
+    confirmer_identifier: Optional[str] = None
+    json_data: Optional[Dict[str, Any]] = None
+
+    created_at: Optional[datetime.datetime] = None
+    updated_at: Optional[datetime.datetime] = None
+
+
 class CompanyUpdate(SQLModel):
     name: Optional[str] = Field(description="Название компании")
     full_name: Optional[str] = Field(description="Полное наименование компании")
@@ -149,8 +200,65 @@ class CompanyUpdate(SQLModel):
     json_data: Optional[Dict[str, Any]] = None
 
 
+class CompanyOrder(str, Enum):
+    id = "id"      # по id
+    year = "year"  # по году, затем по id
+    # по значению метрики, затем по id; компании без значения - в конце
+    revenue = "revenue"
+    headcount = "headcount"
+    export_volume = "export_volume"
+
+
+class ConflictPolicy(str, Enum):
+    keep = "keep"  # оставить существующую запись без изменений
+    overwrite = "overwrite"  # заменить данные существующей записи новыми
+    merge = "merge"  # обновить поля, json_data объединить (новые ключи поверх старых)
+
+
+# json_data в PostgreSQL хранится как JSONB (GIN индекс для @>, объединение || при merge), в остальных базах - как JSON
+CompanyJSON = GenericJSON().with_variant(JSONB(), "postgresql")
+
+
 class Company(SQLModel, table=True):
     __tablename__ = "companies"
+    __table_args__ = (
+        # Одна запись на компанию за год - ключ для INSERT ... ON CONFLICT
+        Index("ix_companies_inn_year", "inn", "year", unique=True),
+        # Фильтры списка компаний (CompanyRepository.filter_by_metrics): равенство
+        # по метрике и, чаще всего, список годов. Год вторым столбцом, чтобы
+        # метрика с годами читала один диапазон индекса
+        Index("ix_companies_year_id", "year", "id"),
+        Index("ix_companies_main_industry_year", "main_industry", "year"),
+        Index("ix_companies_spark_status_year", "spark_status", "year"),
+        Index("ix_companies_company_size_final_year", "company_size_final", "year"),
+        Index("ix_companies_organization_type_year", "organization_type", "year"),
+        # Особый статус и меры поддержки есть у небольшой части компаний:
+        # частичные индексы хранят только их
+        Index(
+            "ix_companies_special_status_year", "special_status", "year",
+            postgresql_where=text("special_status IS NOT NULL"),
+            sqlite_where=text("special_status IS NOT NULL"),
+        ),
+        # Условие совпадает с фильтром support_measures.is_(True) в запросе буквально:
+        # с параметром вместо значения SQLite не может применить частичный индекс
+        Index(
+            "ix_companies_support_measures_year", "year",
+            postgresql_where=text("support_measures IS TRUE"),
+            sqlite_where=text("support_measures IS 1"),
+        ),
+        # Диапазоны и сортировка по метрикам (CompanyOrder): id вторым столбцом для курсора
+        Index("ix_companies_revenue_id", "revenue", "id"),
+        Index("ix_companies_headcount_id", "headcount", "id"),
+        Index("ix_companies_export_volume_id", "export_volume", "id"),
+        Index("ix_companies_district_year", "district", "year"),
+        # Равенство по ключам json_data без отдельной колонки (фильтр data: json_data @> '{"Район": "..."}'),
+        # только в PostgreSQL. Диапазоны data_min / data_max индекс не использует
+        Index(
+            "ix_companies_json_data", "json_data",
+            postgresql_using="gin",
+            postgresql_ops={"json_data": "jsonb_path_ops"},
+        ).ddl_if(dialect="postgresql"),
+    )
     id: Optional[int] = Field(
         default=None,
         primary_key=True,
@@ -170,6 +278,17 @@ class Company(SQLModel, table=True):
     support_measures: Optional[bool] = None
     special_status: Optional[str] = None
 
+    # Метрики из json_data в типизированных колонках (заполняются при загрузке,
+    # см. csv_reader.metrics): фильтры, сортировка и агрегаты по обычным индексам
+    revenue: Optional[float] = Field(default=None, description="Выручка, тыс. руб")
+    headcount: Optional[float] = Field(default=None, description="Среднесписочная численность в Москве, чел")
+    payroll_fund: Optional[float] = Field(default=None, description="Фонд оплаты труда в Москве, тыс. руб")
+    moscow_taxes: Optional[float] = Field(default=None, description="Налоги в бюджет Москвы, тыс. руб")
+    moscow_investments: Optional[float] = Field(default=None, description="Инвестиции в Москве, тыс. руб")
+    export_volume: Optional[float] = Field(default=None, description="Объем экспорта, тыс. руб")
+    capacity_utilization: Optional[float] = Field(default=None, description="Загрузка производственных мощностей, %")
+    district: Optional[str] = Field(default=None, description="Округ")
+
     confirmation_status: ConfirmationStatus = Field(default=ConfirmationStatus.not_confirmed)
     confirmed_at: Optional[datetime.datetime] = Field(description="Когда подтвердили компанию")
     confirmer_identifier: Optional[str] = Field(description="Идентификатор (логин или имя системы)")
@@ -179,7 +298,7 @@ class Company(SQLModel, table=True):
 
     json_data: Dict[str, Any] = Field(
         default_factory=dict,
-        sa_column=Column(JSON, nullable=False)
+        sa_column=Column(CompanyJSON, nullable=False)
     )
     users: List["User"] = Relationship(
         back_populates="companies",
@@ -187,6 +306,152 @@ class Company(SQLModel, table=True):
     )
 
 
+class UserCompanyStats(SQLModel, table=True):
+    """Счетчик компаний пользователя с одним значением измерения (отрасль, размер, округ, год, меры поддержки)"""
+    __tablename__ = "user_company_stats"
+    user_id: int = Field(foreign_key="users.id", primary_key=True, ondelete="CASCADE")
+    dimension: str = Field(primary_key=True, description="Измерение (см. COMPANY_STATS_DIMENSIONS)")
+    value: str = Field(primary_key=True, description="Значение измерения в JSON (null - не указано)")
+    count: int = Field(default=0, description="Количество компаний пользователя с этим значением")
+
+
+class CompanyStatsRead(SQLModel):
+    total_companies: int = Field(description="Количество компаний пользователя")
+    industries: Dict[str, int] = Field(description="По основной отрасли")
+    company_sizes: Dict[str, int] = Field(description="По размеру предприятия")
+    districts: Dict[str, int] = Field(description="По округу")
+    years: Dict[str, int] = Field(description="По году")
+    support_measures: Dict[str, int] = Field(description="По наличию мер поддержки")
+
+
+class UploadCompanyLink(SQLModel, table=True):
+    __tablename__ = "upload_company_link"
+    upload_id: int = Field(foreign_key="uploads.id", primary_key=True, ondelete="CASCADE")
+    # Удаление компании не должно упираться в ссылки из уже обработанных файлов
+    company_id: int = Field(foreign_key="companies.id", primary_key=True, ondelete="CASCADE")
+
+
+class Upload(SQLModel, table=True):
+    """Обработанный CSV файл: повторная загрузка того же содержимого не разбирается заново"""
+    __tablename__ = "uploads"
+    id: Optional[int] = Field(
+        default=None,
+        primary_key=True,
+        nullable=False,
+        index=True,
+        sa_column_kwargs={"autoincrement": True}
+    )
+    sha256: str = Field(unique=True, index=True, description="SHA-256 содержимого файла (hex)")
+    stored_name: str = Field(description="Имя файла в UPLOAD_DIR")
+    file_name: str = Field(description="Имя файла при первой загрузке")
+    size_bytes: int = Field(description="Размер файла")
+    user_id: int = Field(foreign_key="users.id", description="Кто загрузил файл первым")
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+
+
+class UploadSessionStatus(str, Enum):
+    receiving = "receiving"  # принимаются куски файла
+    completed = "completed"  # файл собран и передан на обработку
+
+
+class UploadSession(SQLModel, table=True):
+    """Возобновляемая загрузка: файл собирается из кусков, отправленных отдельными запросами"""
+    __tablename__ = "upload_sessions"
+    id: str = Field(primary_key=True, description="Идентификатор сессии (uuid4 hex)")
+    user_id: int = Field(foreign_key="users.id", index=True, description="ID пользователя")
+    file_name: str = Field(description="Имя файла")
+    stored_name: str = Field(description="Имя файла в UPLOAD_DIR")
+    size_bytes: Optional[int] = Field(default=None, description="Заявленный размер файла")
+    received_bytes: int = Field(default=0, description="Сколько байт уже получено (смещение следующего куска)")
+    conflict_policy: ConflictPolicy = Field(default=ConflictPolicy.keep, description="Политика конфликтов при обработке")
+    status: UploadSessionStatus = Field(default=UploadSessionStatus.receiving)
+    job_id: Optional[int] = Field(default=None, description="Задача обработки собранного файла")
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    updated_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    expires_at: datetime.datetime = Field(description="После этого времени незавершенная сессия удаляется")
+
+
+class UploadSessionCreate(SQLModel):
+    file_name: str = Field(description="Имя файла")
+    size_bytes: Optional[int] = Field(default=None, ge=1, description="Размер файла, если известен заранее")
+    conflict_policy: ConflictPolicy = Field(default=ConflictPolicy.keep, description="Что делать с уже существующими компаниями (ИНН, год)")
+
+
+class UploadSessionRead(SQLModel):
+    id: str
+    file_name: str
+    size_bytes: Optional[int] = None
+    received_bytes: int
+    status: UploadSessionStatus
+    job_id: Optional[int] = None
+    created_at: datetime.datetime
+    expires_at: datetime.datetime
+
+
+class JobKind(str, Enum):
+    upload = "upload"  # загрузка CSV файла (/files/upload)
+    bulk_parse = "bulk_parse"  # массовый парсинг (/parser/parse/bulk)
+
+
+class JobStatus(str, Enum):
+    queued = "queued"
+    running = "running"
+    succeeded = "succeeded"
+    failed = "failed"
+
+
+class IngestJob(SQLModel, table=True):
+    __tablename__ = "ingest_jobs"
+    id: Optional[int] = Field(
+        default=None,
+        primary_key=True,
+        nullable=False,
+        index=True,
+        sa_column_kwargs={"autoincrement": True}
+    )
+    user_id: int = Field(foreign_key="users.id", index=True, description="ID пользователя")
+    kind: JobKind = Field(description="Тип задачи")
+    status: JobStatus = Field(default=JobStatus.queued, index=True, description="Статус задачи")
+    params: Dict[str, Any] = Field(
+        default_factory=dict,
+        description="Параметры задачи (путь к файлу, политика конфликтов)",
+        sa_column=Column(JSON, nullable=False)
+    )
+    result: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Результат выполнения",
+        sa_column=Column(JSON, nullable=True)
+    )
+    error: Optional[str] = Field(default=None, description="Текст ошибки")
+    attempts: int = Field(default=0, description="Количество запусков")
+
+    rows_processed: int = Field(default=0, description="Обработано строк")
+    rows_skipped: int = Field(default=0, description="Пропущено строк (уже есть у пользователя)")
+    rows_failed: int = Field(default=0, description="Строк с ошибками")
+    rows_per_second: float = Field(default=0.0, description="Скорость обработки, строк в секунду")
+
+    created_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    updated_at: datetime.datetime = Field(default_factory=lambda: datetime.datetime.now(datetime.timezone.utc))
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+
+class IngestJobRead(SQLModel):
+    id: int
+    kind: JobKind
+    status: JobStatus
+    rows_processed: int
+    rows_skipped: int
+    rows_failed: int
+    rows_per_second: float = Field(description="Скорость обработки, строк в секунду")
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    attempts: int
+    created_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+
+
 class GraphType(str, Enum):
     treemap_prod = "treemap_prod"
     scatter_busy = "scatter_busy"
@@ -235,4 +500,12 @@ class Graph(SQLModel, table=True):
     )
     updated_at: datetime.datetime = Field(
         default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
-    )
\ No newline at end of file
+    )
+
+class AppliedMigration(SQLModel, table=True):
+    """Однократная миграция данных, которая уже выполнена (см. database.migrations)"""
+    __tablename__ = "applied_migrations"
+    name: str = Field(primary_key=True, description="Имя функции миграции")
+    applied_at: datetime.datetime = Field(
+        default_factory=lambda: datetime.datetime.now(datetime.timezone.utc)
+    )
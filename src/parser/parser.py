@@ -1,10 +1,15 @@
-﻿import logging
+﻿import asyncio
+import logging
+import os
 from logging.config import dictConfig
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List, Optional
 
-from csv_reader.reader import AsyncCSVReader
+from csv_reader.columnar import (REVENUE_COLUMN, _column, company_size_column, numeric_column, numeric_summary,
+                                 value_counts)
+from csv_reader.reader import DEFAULT_BATCH_SIZE, AsyncCSVReader
 from logging_config import LOGGING_CONFIG, ColoredFormatter
+from settings.settings import OPTIMIZED_DIR, settings
 
 dictConfig(LOGGING_CONFIG)
 logger = logging.getLogger(__name__)
@@ -13,6 +18,59 @@ for handler in root_logger.handlers:
     if type(handler) is logging.StreamHandler:
         handler.setFormatter(ColoredFormatter('%(levelname)s:     %(asctime)s %(name)s - %(message)s'))
 
+
+class CompanyIndex:
+    """
+    Хеш-индексы по данным файла: по ИНН, по основной отрасли, по статусу
+    подтверждения и по паре (ИНН, год). Строятся один раз на версию файла.
+    """
+
+    def __init__(self, companies: List[Dict[str, Any]], signature: tuple[int, int]):
+        self.companies = companies
+        # (mtime в наносекундах, размер) файла, по которому построен индекс
+        self.signature = signature
+        self.by_inn: Dict[str, Dict[str, Any]] = {}
+        self.by_industry: Dict[Any, List[Dict[str, Any]]] = {}
+        self.by_status: Dict[Any, List[Dict[str, Any]]] = {}
+        self.by_inn_year: Dict[tuple[str, str], Dict[str, Any]] = {}
+
+        for company in companies:
+            inn = str(company.get("ИНН"))
+            # Как и при последовательном поиске, по ИНН находится первая запись
+            self.by_inn.setdefault(inn, company)
+            self.by_inn_year.setdefault((inn, str(company.get("Год"))), company)
+            self.by_industry.setdefault(company.get("Основная отрасль"), []).append(company)
+            self.by_status.setdefault(company.get("Подтвержден"), []).append(company)
+
+
+# Индексы общие для всех экземпляров эмулятора (он создается на каждый запрос)
+_indexes: Dict[str, CompanyIndex] = {}
+_indexes_lock = asyncio.Lock()
+
+
+# Колонки, по которым считается статистика
+STATISTICS_COLUMNS = [
+    "Основная отрасль",
+    REVENUE_COLUMN,
+    "Данные об оказанных мерах поддержки",
+    "Наличие особого статуса",
+    "Округ",
+    "Вид организации",
+    "Год",
+]
+# Числовые колонки для агрегатов статистики
+STATISTICS_AGGREGATES = {
+    "revenue": REVENUE_COLUMN,
+    "headcount": "Среднесписочная численность персонала, работающего в Москве, чел",
+    "taxes": "Налоги, уплаченные в бюджет Москвы (без акцизов), тыс.руб.",
+}
+
+
+def _file_signature(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
 class ParserEmulator:
     """
     Эмулятор парсера, который читает заранее подготовленные данные из CSV файла.
@@ -32,10 +90,35 @@ class ParserEmulator:
             data_file_path = str(current_dir / "test_data.csv")
 
         self.data_file_path = data_file_path
-        self.csv_reader = AsyncCSVReader(data_file_path)
+        # Повторные чтения файла берут типизированные колонки из его колоночной копии
+        self.csv_reader = AsyncCSVReader(
+            data_file_path,
+            sidecar_dir=OPTIMIZED_DIR if settings.columnar_sidecars else None,
+        )
 
         logger.info(f"ParserEmulator инициализирован с файлом: {data_file_path}")
 
+    async def _get_index(self) -> CompanyIndex:
+        """
+        Возвращает индексы по файлу данных. Файл перечитывается, только если
+        изменились его время модификации или размер.
+        """
+        signature = _file_signature(self.data_file_path)
+        index = _indexes.get(self.data_file_path)
+        if index is not None and index.signature == signature:
+            return index
+
+        async with _indexes_lock:
+            # Индекс мог быть перестроен, пока ждали блокировку
+            signature = _file_signature(self.data_file_path)
+            index = _indexes.get(self.data_file_path)
+            if index is None or index.signature != signature:
+                logger.info(f"Построение индексов по файлу: {self.data_file_path}")
+                companies = await self.csv_reader.read_companies()
+                index = CompanyIndex(companies, signature)
+                _indexes[self.data_file_path] = index
+            return index
+
     async def parse_companies(self) -> List[Dict[str, Any]]:
         """
         Эмулирует парсинг компаний, читая данные из CSV файла.
@@ -57,6 +140,31 @@ class ParserEmulator:
             logger.error(f"Ошибка при эмуляции парсинга: {e}")
             raise
 
+    async def iter_companies(self, batch_size: int = DEFAULT_BATCH_SIZE) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        Эмулирует потоковый парсинг компаний: отдает данные пачками,
+        не загружая весь файл в память.
+
+        Args:
+            batch_size: Количество компаний в одной пачке
+
+        Yields:
+            Пачки словарей с данными компаний
+        """
+        try:
+            logger.info("Начинаем потоковую эмуляцию парсинга компаний")
+
+            total = 0
+            async for batch in self.csv_reader.iter_company_batches(batch_size=batch_size):
+                total += len(batch)
+                yield batch
+
+            logger.info(f"Потоковая эмуляция парсинга завершена. Получено {total} компаний")
+
+        except Exception as e:
+            logger.error(f"Ошибка при потоковой эмуляции парсинга: {e}")
+            raise
+
     async def parse_companies_with_key_fields(self) -> tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
         """
         Эмулирует парсинг компаний с извлечением ключевых полей.
@@ -91,7 +199,10 @@ class ParserEmulator:
         try:
             logger.info(f"Эмуляция поиска компании по ИНН: {inn}")
 
-            company = await self.csv_reader.get_company_by_inn(inn)
+            index = await self._get_index()
+            company = index.by_inn.get(inn)
+            # Копия, чтобы вызывающий код не изменил данные индекса
+            company = dict(company) if company else None
 
             if company:
                 logger.info(f"Компания найдена: {company.get('Наименование организации', 'Неизвестно')}")
@@ -104,6 +215,29 @@ class ParserEmulator:
             logger.error(f"Ошибка при поиске компании по ИНН: {e}")
             raise
 
+    async def get_company_by_inn_and_year(self, inn: str, year: int | str) -> Optional[Dict[str, Any]]:
+        """
+        Эмулирует поиск отчетности компании по ИНН за конкретный год.
+
+        Args:
+            inn: ИНН компании
+            year: Отчетный год
+
+        Returns:
+            Данные компании за год или None, если не найдены
+        """
+        try:
+            logger.info(f"Эмуляция поиска компании по ИНН {inn} за {year} год")
+
+            index = await self._get_index()
+            company = index.by_inn_year.get((str(inn), str(year)))
+
+            return dict(company) if company else None
+
+        except Exception as e:
+            logger.error(f"Ошибка при поиске компании по ИНН и году: {e}")
+            raise
+
     async def get_companies_by_industry(self, industry: str) -> List[Dict[str, Any]]:
         """
         Эмулирует поиск компаний по отрасли.
@@ -117,7 +251,8 @@ class ParserEmulator:
         try:
             logger.info(f"Эмуляция поиска компаний по отрасли: {industry}")
 
-            companies = await self.csv_reader.get_companies_by_industry(industry)
+            index = await self._get_index()
+            companies = [dict(company) for company in index.by_industry.get(industry, [])]
 
             logger.info(f"Найдено {len(companies)} компаний в отрасли '{industry}'")
 
@@ -129,7 +264,7 @@ class ParserEmulator:
 
     async def get_companies_by_status(self, status: str) -> List[Dict[str, Any]]:
         """
-        Эмулирует поиск компаний по статусу.
+        Эмулирует поиск компаний по статусу подтверждения (колонка "Подтвержден").
 
         Args:
             status: Статус компании
@@ -140,7 +275,8 @@ class ParserEmulator:
         try:
             logger.info(f"Эмуляция поиска компаний по статусу: {status}")
 
-            companies = await self.csv_reader.get_companies_by_status(status)
+            index = await self._get_index()
+            companies = [dict(company) for company in index.by_status.get(status, [])]
 
             logger.info(f"Найдено {len(companies)} компаний со статусом '{status}'")
 
@@ -150,68 +286,65 @@ class ParserEmulator:
             logger.error(f"Ошибка при поиске компаний по статусу: {e}")
             raise
 
-    async def get_statistics(self) -> Dict[str, Any]:
+    async def get_statistics(
+        self,
+        year: Optional[int] = None,
+        district: Optional[str] = None,
+        aggregates: bool = False,
+    ) -> Dict[str, Any]:
         """
         Эмулирует получение статистики по данным.
 
+        Статистика считается векторно по колонкам: загружаются только нужные
+        колонки (из колоночной копии файла, если она ведется), значения
+        группируются за один проход по каждой колонке.
+
+        Args:
+            year: Учитывать только компании за этот год
+            district: Учитывать только компании этого округа
+            aggregates: Добавить в ответ "aggregates" - сумму, среднее и перцентили
+                        выручки, численности персонала и налогов (см. STATISTICS_AGGREGATES)
+
         Returns:
             Словарь со статистикой
         """
         try:
             logger.info("Эмуляция получения статистики")
 
-            companies = await self.parse_companies()
-
-            # Подсчитываем статистику
-            total_companies = len(companies)
-            industries = {}
-            company_sizes = {}
-            support_measures = {}
-            special_statuses = {}
-            districts = {}
-            organization_types = {}
-            years = {}
+            columns = list(STATISTICS_COLUMNS)
+            if aggregates:
+                columns += [name for name in STATISTICS_AGGREGATES.values() if name not in columns]
+            frame = (await self.csv_reader.read_columnar(columns=columns)).frame
 
-            for company in companies:
-                # Отрасли
-                industry = company.get("Основная отрасль", "Не указана")
-                industries[industry] = industries.get(industry, 0) + 1
+            if year is not None:
+                frame = frame[numeric_column(_column(frame, "Год")) == year]
+            if district is not None:
+                frame = frame[_column(frame, "Округ") == district]
 
-                # Размеры компаний
-                company_size = self.csv_reader._determine_company_size(company)
-                company_sizes[company_size] = company_sizes.get(company_size, 0) + 1
+            total_companies = len(frame)
 
-                # Меры поддержки
-                support = company.get("Данные об оказанных мерах поддержки", "Не указано")
-                support_measures[support] = support_measures.get(support, 0) + 1
-
-                # Особые статусы
-                special_status = company.get("Наличие особого статуса", "Не указан")
-                special_statuses[special_status] = special_statuses.get(special_status, 0) + 1
-
-                # Округа
-                district = company.get("Округ", "Не указан")
-                districts[district] = districts.get(district, 0) + 1
-
-                # Типы организаций
-                org_type = company.get("Вид организации", "Не указан")
-                organization_types[org_type] = organization_types.get(org_type, 0) + 1
-
-                # Годы
-                year = company.get("Год", "Не указан")
-                years[year] = years.get(year, 0) + 1
+            def counts(name: str, default: str) -> Dict[Any, int]:
+                # Как company.get(name, default): без колонки все компании попадают в default
+                if name not in frame.columns:
+                    return {default: total_companies} if total_companies else {}
+                return value_counts(frame[name])
 
             statistics = {
                 "total_companies": total_companies,
-                "industries": industries,
-                "company_sizes": company_sizes,
-                "support_measures": support_measures,
-                "special_statuses": special_statuses,
-                "districts": districts,
-                "organization_types": organization_types,
-                "years": years
+                "industries": counts("Основная отрасль", "Не указана"),
+                "company_sizes": value_counts(company_size_column(_column(frame, REVENUE_COLUMN))),
+                "support_measures": counts("Данные об оказанных мерах поддержки", "Не указано"),
+                "special_statuses": counts("Наличие особого статуса", "Не указан"),
+                "districts": counts("Округ", "Не указан"),
+                "organization_types": counts("Вид организации", "Не указан"),
+                "years": counts("Год", "Не указан")
             }
 
+            if aggregates:
+                statistics["aggregates"] = {
+                    key: numeric_summary(_column(frame, name)) for key, name in STATISTICS_AGGREGATES.items()
+                }
+
             logger.info(f"Статистика получена: {total_companies} компаний")
 
             return statistics
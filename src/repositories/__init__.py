@@ -1,2 +1,6 @@
 ﻿from .user_repository import UserRepository
-from .company_repository import CompanyRepository
\ No newline at end of file
+from .company_repository import CompanyPage, CompanyRepository
+from .company_bulk_loader import CompanyBulkLoader
+from .company_stats_repository import CompanyStatsRepository
+from .job_repository import JobRepository
+from .upload_repository import UploadRepository, UploadSessionRepository
@@ -0,0 +1,240 @@
+import logging
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import case, exists, func, literal_column, or_, select, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+
+from csv_reader.metrics import COMPANY_METRIC_FIELDS, COMPANY_METRIC_KEYS
+from models.models import Company, ConflictPolicy, UserCompanyLink
+from repositories.company_stats_repository import CompanyStatsRepository
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BULK_BATCH_SIZE = 1000
+
+# Колонки, которые обновляются из новых данных при overwrite и merge.
+# Статус подтверждения не перезаписывается: его мог выставить пользователь
+UPSERT_COLUMNS = (
+    "name",
+    "full_name",
+    "spark_status",
+    "main_industry",
+    "company_size_final",
+    "organization_type",
+    "support_measures",
+    "special_status",
+)
+
+# json_data при merge в SQLite: ключи новых данных поверх старых только на верхнем уровне,
+# значения null сохраняются - как || для JSONB в PostgreSQL и {**old, **new} в _deduplicate.
+# json_patch не подходит: он удаляет ключи со значением null и объединяет вложенные объекты
+_SQLITE_JSON_MERGE = literal_column("""(
+    SELECT json_group_object(key, json(CASE type
+        WHEN 'object' THEN value WHEN 'array' THEN value
+        WHEN 'true' THEN 'true' WHEN 'false' THEN 'false'
+        ELSE json_quote(value) END))
+    FROM (
+        SELECT key, value, type FROM json_each(companies.json_data)
+        WHERE key NOT IN (SELECT key FROM json_each(excluded.json_data))
+        UNION ALL
+        SELECT key, value, type FROM json_each(excluded.json_data)
+    )
+)""")
+
+_DIALECT_INSERTS = {
+    "postgresql": postgresql.insert,
+    "sqlite": sqlite.insert,
+}
+
+
+def company_row(**fields: Any) -> Dict[str, Any]:
+    """
+    Строка для вставки в таблицу companies: значения по умолчанию
+    (даты создания, статус подтверждения) заполняются как у модели Company
+    """
+    return Company(**fields).model_dump(exclude={"id"})
+
+
+class BulkLoadResult(NamedTuple):
+    # ID компаний в порядке переданных строк (повторы (ИНН, год) получают один ID)
+    company_ids: List[int]
+    # ID компаний, которые этой загрузкой впервые привязаны к пользователю
+    linked_ids: set[int]
+
+
+class CompanyBulkLoader:
+    """
+    Пакетная загрузка компаний: каждая пачка вставляется одним
+    INSERT ... ON CONFLICT (inn, year) ... RETURNING, связи с пользователем -
+    одним INSERT ... ON CONFLICT DO NOTHING на пачку. Существующие компании
+    не читаются заранее, конкурентные загрузки одного файла не создают дублей.
+    """
+
+    def __init__(
+        self,
+        session: Session,
+        user_id: int,
+        batch_size: int = DEFAULT_BULK_BATCH_SIZE,
+        on_progress: Optional[Callable[[int], None]] = None,
+        conflict_policy: ConflictPolicy = ConflictPolicy.keep,
+    ):
+        """
+        Args:
+            session: Сессия базы данных (коммит остается за вызывающим кодом)
+            user_id: ID пользователя, которому привязываются компании
+            batch_size: Количество строк в одном INSERT
+            on_progress: Вызывается после каждой пачки с общим числом загруженных строк
+            conflict_policy: Что делать, если компания с таким ИНН и годом уже есть
+        """
+        self.session = session
+        self.user_id = user_id
+        self.batch_size = batch_size
+        self.on_progress = on_progress
+        self.conflict_policy = ConflictPolicy(conflict_policy)
+        self.loaded = 0
+        self.linked = 0
+        self.batches = 0
+
+        dialect = session.get_bind().dialect.name
+        if dialect not in _DIALECT_INSERTS:
+            raise NotImplementedError(f"Upsert is not supported for database dialect: {dialect}")
+        self._dialect = dialect
+        self._insert = _DIALECT_INSERTS[dialect]
+
+    def load(self, rows: List[Dict[str, Any]]) -> BulkLoadResult:
+        """
+        Вставляет или обновляет компании и привязывает их к пользователю.
+
+        Args:
+            rows: Строки таблицы companies (см. company_row)
+
+        Returns:
+            BulkLoadResult с ID компаний и ID новых привязок
+        """
+        company_ids = []
+        linked_ids = set()
+        for start in range(0, len(rows), self.batch_size):
+            batch_ids, batch_linked = self._load_batch(rows[start:start + self.batch_size])
+            company_ids.extend(batch_ids)
+            linked_ids.update(batch_linked)
+        return BulkLoadResult(company_ids, linked_ids)
+
+    def _deduplicate(self, rows: List[Dict[str, Any]]) -> Dict[tuple, Dict[str, Any]]:
+        """
+        Сводит повторы (ИНН, год) внутри пачки к одной строке по политике конфликта:
+        ON CONFLICT не может изменить одну и ту же запись дважды за один INSERT
+        """
+        unique = {}
+        for row in rows:
+            key = (row["inn"], row["year"])
+            previous = unique.get(key)
+            if previous is None:
+                unique[key] = row
+            elif self.conflict_policy == ConflictPolicy.overwrite:
+                unique[key] = row
+            elif self.conflict_policy == ConflictPolicy.merge:
+                unique[key] = {
+                    **row,
+                    **{
+                        column: previous[column]
+                        for column, keys in COMPANY_METRIC_KEYS.items()
+                        if not any(key in row["json_data"] for key in keys)
+                    },
+                    "json_data": {**previous["json_data"], **row["json_data"]},
+                }
+        return unique
+
+    def _has_any_key(self, json_data, keys):
+        """Условие: в json_data есть хотя бы один из ключей (значение может быть null)"""
+        if self._dialect == "postgresql":
+            return json_data.op("?|")(postgresql.array(keys))
+        each = func.json_each(json_data).table_valued("key")
+        # or_ вместо in_: развертываемые параметры IN не поддерживаются в executemany
+        return exists().select_from(each).where(or_(*(each.c.key == key for key in keys)))
+
+    def _upsert_statement(self):
+        table = Company.__table__
+        statement = self._insert(table)
+        excluded = statement.excluded
+
+        returning = (table.c.id, table.c.inn, table.c.year)
+        if self.conflict_policy == ConflictPolicy.keep:
+            # Существующие записи не переписываются: их ID выбираются отдельно (см. _existing_ids)
+            return statement.on_conflict_do_nothing(index_elements=[table.c.inn, table.c.year]).returning(*returning)
+
+        updates = {column: excluded[column] for column in UPSERT_COLUMNS}
+        updates["updated_at"] = excluded.updated_at
+        if self.conflict_policy == ConflictPolicy.overwrite:
+            updates.update({column: excluded[column] for column in COMPANY_METRIC_FIELDS})
+            updates["json_data"] = excluded.json_data
+        else:
+            # Метрики следуют объединенному json_data: если ключ метрики есть в новых данных
+            # (в том числе со значением null), он перекрывает старый, иначе метрика остается прежней
+            updates.update({
+                column: case(
+                    (self._has_any_key(excluded.json_data, list(keys)), excluded[column]),
+                    else_=table.c[column],
+                )
+                for column, keys in COMPANY_METRIC_KEYS.items()
+            })
+            if self._dialect == "postgresql":
+                # json_data в PostgreSQL - JSONB
+                updates["json_data"] = table.c.json_data.op("||")(excluded.json_data)
+            else:
+                updates["json_data"] = _SQLITE_JSON_MERGE
+
+        return statement.on_conflict_do_update(
+            index_elements=[table.c.inn, table.c.year],
+            set_=updates,
+        ).returning(*returning)
+
+    def _existing_ids(self, keys: List[tuple]) -> Dict[tuple, int]:
+        """ID уже существующих компаний по ключам (ИНН, год), которые не вернул INSERT ... DO NOTHING"""
+        table = Company.__table__
+        statement = select(table.c.id, table.c.inn, table.c.year).where(tuple_(table.c.inn, table.c.year).in_(keys))
+        return {(inn, year): company_id for company_id, inn, year in self.session.execute(statement)}
+
+    def _load_batch(self, rows: List[Dict[str, Any]]) -> tuple[List[int], set[int]]:
+        if not rows:
+            return [], set()
+
+        unique = self._deduplicate(rows)
+
+        # overwrite и merge меняют существующие компании: их статистика пересчитывается у всех владельцев
+        stats = CompanyStatsRepository(self.session)
+        before, owners = {}, {}
+        if self.conflict_policy != ConflictPolicy.keep:
+            before = stats.snapshot_by_keys(unique)
+            owners = stats.linked_users(before)
+
+        result = self.session.execute(self._upsert_statement(), list(unique.values()))
+        ids_by_key = {(inn, year): company_id for company_id, inn, year in result}
+        missing = [key for key in unique if key not in ids_by_key]
+        if missing:
+            ids_by_key.update(self._existing_ids(missing))
+
+        # Новые связи возвращаются RETURNING, уже существующие пропускаются
+        links = self._insert(UserCompanyLink.__table__).on_conflict_do_nothing().returning(
+            UserCompanyLink.__table__.c.company_id
+        )
+        linked_ids = set(self.session.scalars(
+            links,
+            [{"user_id": self.user_id, "company_id": company_id} for company_id in ids_by_key.values()],
+        ))
+
+        if before:
+            stats.changed(before, owners)
+        stats.linked(self.user_id, linked_ids)
+
+        self.loaded += len(rows)
+        self.linked += len(linked_ids)
+        self.batches += 1
+        logger.info(
+            f"Loaded batch {self.batches}: {len(rows)} rows, {len(ids_by_key)} companies, "
+            f"{len(linked_ids)} new links, {self.loaded} rows total"
+        )
+        if self.on_progress is not None:
+            self.on_progress(self.loaded)
+
+        return [ids_by_key[(row["inn"], row["year"])] for row in rows], linked_ids
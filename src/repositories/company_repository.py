@@ -1,12 +1,75 @@
+import base64
+import binascii
+import json
 import logging
-from typing import List
+import math
+from typing import Dict, List, NamedTuple, Optional
 
+from sqlalchemy import and_, case, exists, func, or_, tuple_, type_coerce
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import load_only
 from sqlmodel import Session, select
 
-from models.models import CompanyCreate, CompanyUpdate, CompanyRead, Company
+from csv_reader.metrics import metric_value
+from models.models import CompanyCreate, CompanyUpdate, CompanyRead, Company, CompanyOrder, CompanySummary
+from repositories.count_cache import company_count_cache
 
 logger = logging.getLogger(__name__)
 
+
+def _sort_fields(order_by: CompanyOrder) -> List[str]:
+    """Колонки ключа сортировки: (id), (год, id) или (метрика, id)"""
+    return ["id"] if order_by == CompanyOrder.id else [order_by.value, "id"]
+
+
+class CompanyCursor(NamedTuple):
+    # Ключ сортировки последней компании предыдущей страницы
+    key: tuple
+    # Количество компаний по фильтрам, посчитанное для первой страницы
+    total: int
+
+
+def encode_company_cursor(company: CompanyRead, total: int, order_by: CompanyOrder = CompanyOrder.id) -> str:
+    """
+    Непрозрачный курсор следующей страницы: ключ сортировки последней компании
+    страницы и количество компаний по фильтрам, которое страницы по курсору
+    возвращают без повторного подсчета
+    """
+    key = [getattr(company, field) for field in _sort_fields(order_by)]
+    payload = json.dumps({"o": order_by.value, "k": key, "t": total}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _valid_key(key: tuple, order_by: CompanyOrder) -> bool:
+    """id и год - целые, значение метрики - число или null"""
+    if len(key) != len(_sort_fields(order_by)) or type(key[-1]) is not int:
+        return False
+    if order_by == CompanyOrder.year:
+        return type(key[0]) is int
+    if order_by != CompanyOrder.id:
+        return key[0] is None or type(key[0]) in (int, float)
+    return True
+
+
+def decode_company_cursor(cursor: str, order_by: CompanyOrder = CompanyOrder.id) -> CompanyCursor:
+    """
+    Ключ сортировки и количество компаний из курсора.
+
+    Raises:
+        ValueError: Курсор поврежден или выдан для другой сортировки
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        order, key, total = payload["o"], tuple(payload["k"]), payload["t"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError) as e:
+        raise ValueError("Некорректный курсор") from e
+
+    if type(total) is not int or total < 0:
+        raise ValueError("Некорректный курсор")
+    if order != order_by.value or not _valid_key(key, order_by):
+        raise ValueError("Курсор выдан для другой сортировки")
+    return CompanyCursor(key, total)
+
 def _company_to_company_read(company: Company) -> CompanyRead:
     """Преобразует Company в CompanyRead"""
     return CompanyRead(
@@ -21,6 +84,14 @@ def _company_to_company_read(company: Company) -> CompanyRead:
         organization_type=company.organization_type,
         support_measures=company.support_measures,
         special_status=company.special_status,
+        revenue=company.revenue,
+        headcount=company.headcount,
+        payroll_fund=company.payroll_fund,
+        moscow_taxes=company.moscow_taxes,
+        moscow_investments=company.moscow_investments,
+        export_volume=company.export_volume,
+        capacity_utilization=company.capacity_utilization,
+        district=company.district,
         confirmation_status=company.confirmation_status,
         confirmed_at=company.confirmed_at,
         confirmer_identifier=company.confirmer_identifier,
@@ -29,6 +100,66 @@ def _company_to_company_read(company: Company) -> CompanyRead:
         updated_at=company.updated_at
     )
 
+
+def json_number(value: str) -> Optional[float]:
+    """Число из значения фильтра по json_data (допускается десятичная запятая) или None"""
+    number = metric_value(value)
+    return number if number is not None and math.isfinite(number) else None
+
+
+def _json_entries():
+    # Ключи верхнего уровня json_data в SQLite. json_each раскодирует ключи, поэтому
+    # сравнение не зависит от того, экранированы ли не-ASCII символы в хранимом JSON
+    return func.json_each(Company.json_data).table_valued("key", "value", "type")
+
+
+def _json_equals(key: str, value: str, dialect: str):
+    """
+    json_data[key] равно строке value или, если value - число, такому числу JSON.
+    В PostgreSQL - через @>, чтобы работал GIN индекс ix_companies_json_data
+    """
+    number = json_number(value)
+    if dialect == "postgresql":
+        document = type_coerce(Company.json_data, JSONB)
+        candidates = [value] if number is None else [value, number]
+        return or_(*(document.contains({key: candidate}) for candidate in candidates))
+    entry = _json_entries()
+    matches = and_(entry.c.type == "text", entry.c.value == value)
+    if number is not None:
+        matches = or_(matches, and_(entry.c.type.in_(("integer", "real")), entry.c.value == number))
+    return exists().select_from(entry).where(entry.c.key == key, matches)
+
+
+def _bounds(value, low: Optional[float], high: Optional[float]) -> list:
+    bounds = []
+    if low is not None:
+        bounds.append(value >= low)
+    if high is not None:
+        bounds.append(value <= high)
+    return bounds
+
+
+def _json_in_range(key: str, low: Optional[float], high: Optional[float], dialect: str):
+    """json_data[key] - число JSON в границах [low, high]. Строки и другие типы не приводятся"""
+    if dialect == "postgresql":
+        item = Company.json_data[key]
+        return and_(*_bounds(case((func.jsonb_typeof(item) == "number", item.as_float())), low, high))
+    entry = _json_entries()
+    return exists().select_from(entry).where(
+        entry.c.key == key, entry.c.type.in_(("integer", "real")), *_bounds(entry.c.value, low, high)
+    )
+
+
+class CompanyPage(NamedTuple):
+    companies: List[CompanyRead] | List[CompanySummary]
+    # Количество компаний по фильтрам без учета пагинации
+    total: int
+
+
+def _company_to_summary(company: Company, fields: List[str]) -> CompanySummary:
+    """Преобразует Company с загруженными полями fields в CompanySummary"""
+    return CompanySummary(**{field: getattr(company, field) for field in fields})
+
 class CompanyRepository:
     def __init__(self, session: Session):
         self.session = session
@@ -45,8 +176,15 @@ class CompanyRepository:
             return None
         return _company_to_company_read(company)
 
-    def list_all(self, skip: int = 0, limit: int = 100) -> List[CompanyRead]:
-        statement = select(Company).offset(skip).limit(limit)
+    def list_all(self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[CompanyRead]:
+        """
+        Компании по возрастанию id. after_id (id последней компании предыдущей
+        страницы) продолжает выборку по индексу, не пропуская skip строк.
+        """
+        statement = select(Company).order_by(Company.id)
+        if after_id is not None:
+            statement = statement.where(Company.id > after_id)
+        statement = statement.offset(skip).limit(limit)
         results = self.session.exec(statement).all()
         return [_company_to_company_read(company) for company in results]
 
@@ -74,20 +212,54 @@ class CompanyRepository:
         support_measures: bool = None,
         special_status: str = None,
         years: List[int] = None,
+        district: str = None,
+        ranges: Optional[Dict[str, tuple[Optional[float], Optional[float]]]] = None,
+        json_equals: Optional[List[tuple[str, str]]] = None,
+        json_ranges: Optional[Dict[str, tuple[Optional[float], Optional[float]]]] = None,
         skip: int = 0,
-        limit: int = 100
-    ) -> List[CompanyRead]:
+        limit: int = 100,
+        order_by: CompanyOrder = CompanyOrder.id,
+        after: Optional[CompanyCursor] = None,
+        fields: Optional[List[str]] = None,
+    ) -> CompanyPage:
         """
         Фильтрует компании по заданным метрикам.
+
+        Общее количество по фильтрам считается в том же запросе
+        (COUNT(*) OVER ()). Для страниц по курсору окно видит только строки
+        после курсора, поэтому количество берется из company_count_cache
+        (его заполняют запросы без курсора), а если в кэше его нет - из курсора:
+        его посчитала первая страница. Отдельный подсчет для них не выполняется.
+
+        Args:
+            district: Округ (колонка district)
+            ranges: Диапазоны метрик: колонка из COMPANY_METRIC_COLUMNS -> (минимум,
+                    максимум), границы включительно, None - без границы. Компании
+                    без значения метрики под диапазон не попадают
+            json_equals: Пары (ключ json_data, значение) для ключей без отдельной
+                         колонки, например ("Район", "Хамовники"). Значение сравнивается
+                         со строкой JSON, а если это число - и с числом JSON
+            json_ranges: Диапазоны числовых значений json_data: ключ -> (минимум,
+                         максимум), границы включительно. Подходят только числа JSON
+            order_by: Сортировка по id, по (год, id) или по (метрика, id)
+            after: Курсор предыдущей страницы (см. decode_company_cursor).
+                   Страница начинается сразу после его ключа сортировки, поэтому
+                   глубокие страницы не перебирают skip строк
+            fields: Поля CompanySummary для загрузки (None - все поля, CompanyRead).
+                    Остальные колонки, в том числе json_data, в запрос не попадают.
+                    id и ключ сортировки загружаются всегда
         """
         from models.models import UserCompanyLink, Company
 
         statement = select(Company)
+        company_id = Company.id
 
         # Фильтрация по пользователю - добавляем JOIN с таблицей связей
         if user_id is not None:
             statement = statement.join(UserCompanyLink, Company.id == UserCompanyLink.company_id)
             statement = statement.where(UserCompanyLink.user_id == user_id)
+            # Сортировка по id связи идет по первичному ключу (user_id, company_id)
+            company_id = UserCompanyLink.company_id
 
         if spark_status is not None:
             statement = statement.where(Company.spark_status == spark_status)
@@ -98,15 +270,91 @@ class CompanyRepository:
         if organization_type is not None:
             statement = statement.where(Company.organization_type == organization_type)
         if support_measures is not None:
-            statement = statement.where(Company.support_measures == support_measures)
+            # IS TRUE / IS FALSE без параметра, чтобы подошел частичный индекс ix_companies_support_measures_year
+            statement = statement.where(Company.support_measures.is_(support_measures))
         if special_status is not None:
             statement = statement.where(Company.special_status == special_status)
         if years is not None and len(years) > 0:
             statement = statement.where(Company.year.in_(years))
 
+        if district is not None:
+            statement = statement.where(Company.district == district)
+        ranges = {name: bounds for name, bounds in (ranges or {}).items() if bounds != (None, None)}
+        for name, (low, high) in ranges.items():
+            value = getattr(Company, name)
+            if low is not None:
+                statement = statement.where(value >= low)
+            if high is not None:
+                statement = statement.where(value <= high)
+
+        dialect = self.session.get_bind().dialect.name
+        json_equals = sorted(set(json_equals or []))
+        for key, value in json_equals:
+            statement = statement.where(_json_equals(key, value, dialect))
+        json_ranges = {key: bounds for key, bounds in (json_ranges or {}).items() if bounds != (None, None)}
+        for key, (low, high) in json_ranges.items():
+            statement = statement.where(_json_in_range(key, low, high, dialect))
+
+        filtered = statement
+        count_key = (
+            user_id, spark_status, main_industry, company_size_final, organization_type, support_measures,
+            special_status, tuple(sorted(set(years))) if years else None, district, tuple(sorted(ranges.items())),
+            tuple(json_equals), tuple(sorted(json_ranges.items())),
+        )
+
+        if order_by == CompanyOrder.year:
+            # Порядок (year, id) читается из индекса ix_companies_year_id
+            if after is not None:
+                statement = statement.where(tuple_(Company.year, Company.id) > tuple(after.key))
+            statement = statement.order_by(Company.year, Company.id)
+        elif order_by != CompanyOrder.id:
+            # Порядок (метрика, id) читается из индекса ix_companies_<метрика>_id.
+            # NULL в конце - как по умолчанию в индексах PostgreSQL
+            metric = getattr(Company, order_by.value)
+            if after is not None:
+                value, last_id = after.key
+                if value is None:
+                    statement = statement.where(metric.is_(None), Company.id > last_id)
+                else:
+                    statement = statement.where(or_(metric.is_(None), tuple_(metric, Company.id) > (value, last_id)))
+            statement = statement.order_by(metric.asc().nulls_last(), Company.id)
+        else:
+            if after is not None:
+                statement = statement.where(company_id > after.key[0])
+            statement = statement.order_by(company_id)
+
+        if fields is not None:
+            fields = list(dict.fromkeys([*_sort_fields(order_by), *fields]))
+            # raiseload: обращение к незагруженной колонке - ошибка, а не отдельный запрос на каждую строку
+            statement = statement.options(load_only(*(getattr(Company, field) for field in fields), raiseload=True))
+
+        if after is None:
+            statement = statement.add_columns(func.count().over().label("total"))
         statement = statement.offset(skip).limit(limit)
-        results = self.session.exec(statement).all()
-        return [_company_to_company_read(company) for company in results]
+        # execute, а не exec: с окном строка содержит компанию и количество
+        rows = self.session.execute(statement).all()
+        results = [row[0] for row in rows]
+        if after is None:
+            if rows:
+                total = rows[0].total
+            elif skip == 0:
+                total = 0
+            else:
+                # offset за последней страницей: окну не из чего вернуть количество
+                total = company_count_cache.get(count_key)
+            if total is None:
+                total = self.session.exec(select(func.count()).select_from(filtered.subquery())).one()
+                logger.debug(f"Counted {total} companies for filters {count_key}")
+            company_count_cache.put(count_key, total)
+        else:
+            # Окно видит только строки после курсора: количество из кэша или из курсора
+            total = company_count_cache.get(count_key)
+            if total is None:
+                total = after.total
+
+        if fields is not None:
+            return CompanyPage([_company_to_summary(company, fields) for company in results], total)
+        return CompanyPage([_company_to_company_read(company) for company in results], total)
 
     def update(self, db_obj: CompanyRead, obj_in: CompanyUpdate) -> CompanyRead:
         """Частично обновляет запись в БД."""
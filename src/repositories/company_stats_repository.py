@@ -0,0 +1,243 @@
+import json
+import logging
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import delete, func, select as sa_select, tuple_
+from sqlmodel import Session, select
+
+from models import Company, CompanyStatsRead, UserCompanyLink, UserCompanyStats
+
+logger = logging.getLogger(__name__)
+
+# Количество ID или ключей (ИНН, год) в одном запросе
+STATS_BATCH_SIZE = 1000
+
+# Измерения статистики
+COMPANY_STATS_DIMENSIONS = ("industry", "size", "district", "year", "support_measures")
+# Общее количество компаний хранится как измерение с единственным значением
+TOTAL_DIMENSION = "total"
+TOTAL_VALUE = "null"
+
+# Измерение -> поле CompanyStatsRead
+_READ_FIELDS = {
+    "industry": "industries",
+    "size": "company_sizes",
+    "district": "districts",
+    "year": "years",
+    "support_measures": "support_measures",
+}
+
+# Значения измерений одной компании в порядке COMPANY_STATS_DIMENSIONS
+Snapshot = tuple
+
+
+def _dimension_columns() -> List[Any]:
+    """Колонки таблицы companies в порядке COMPANY_STATS_DIMENSIONS"""
+    return [Company.main_industry, Company.company_size_final, Company.district, Company.year, Company.support_measures]
+
+
+def _encode(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def _stats_keys(snapshot: Snapshot) -> List[tuple[str, str]]:
+    keys = [(TOTAL_DIMENSION, TOTAL_VALUE)]
+    keys.extend((dimension, _encode(value)) for dimension, value in zip(COMPANY_STATS_DIMENSIONS, snapshot))
+    return keys
+
+
+def _label(value: str) -> str:
+    """Ключ в ответе: строковые значения как есть, остальные - в JSON ("2021", "true", "null")"""
+    decoded = json.loads(value)
+    return decoded if isinstance(decoded, str) else value
+
+
+def _batches(items: List[Any]) -> Iterable[List[Any]]:
+    for start in range(0, len(items), STATS_BATCH_SIZE):
+        yield items[start:start + STATS_BATCH_SIZE]
+
+
+class CompanyStatsRepository:
+    """
+    Счетчики компаний каждого пользователя по отрасли, размеру, округу, году
+    и мерам поддержки (таблица user_company_stats). Обновляются в той же
+    транзакции, что и изменение компаний или привязок, поэтому чтение
+    статистики не зависит от количества компаний. Коммит остается за
+    вызывающим кодом.
+    """
+
+    def __init__(self, session: Session):
+        # company_bulk_loader сам обновляет статистику через этот класс
+        from repositories.company_bulk_loader import _DIALECT_INSERTS
+
+        self.session = session
+        dialect = session.get_bind().dialect.name
+        self._insert = _DIALECT_INSERTS[dialect]
+        self._columns = _dimension_columns()
+
+    def snapshot(self, company_ids: Iterable[int]) -> Dict[int, Snapshot]:
+        """Значения измерений компаний по ID"""
+        snapshots = {}
+        for batch in _batches(list(company_ids)):
+            statement = sa_select(Company.id, *self._columns).where(Company.id.in_(batch))
+            snapshots.update((row[0], tuple(row[1:])) for row in self.session.execute(statement))
+        return snapshots
+
+    def snapshot_by_keys(self, keys: Iterable[tuple[int, int]]) -> Dict[int, Snapshot]:
+        """Значения измерений существующих компаний по ключам (ИНН, год)"""
+        snapshots = {}
+        for batch in _batches(list(keys)):
+            statement = (
+                sa_select(Company.id, *self._columns)
+                .where(tuple_(Company.inn, Company.year).in_(batch))
+            )
+            snapshots.update((row[0], tuple(row[1:])) for row in self.session.execute(statement))
+        return snapshots
+
+    def linked_users(self, company_ids: Iterable[int]) -> Dict[int, List[int]]:
+        """Пользователи, которым привязаны компании: ID компании -> ID пользователей"""
+        users: Dict[int, List[int]] = {}
+        for batch in _batches(list(company_ids)):
+            statement = select(UserCompanyLink.company_id, UserCompanyLink.user_id).where(
+                UserCompanyLink.company_id.in_(batch)
+            )
+            for company_id, user_id in self.session.exec(statement):
+                users.setdefault(company_id, []).append(user_id)
+        return users
+
+    def linked(self, user_id: int, company_ids: Iterable[int]) -> None:
+        """Компании впервые привязаны пользователю"""
+        deltas = Counter()
+        for snapshot in self.snapshot(company_ids).values():
+            for dimension, value in _stats_keys(snapshot):
+                deltas[(user_id, dimension, value)] += 1
+        self._apply(deltas)
+
+    def changed(self, before: Dict[int, Snapshot], users: Optional[Dict[int, List[int]]] = None) -> None:
+        """
+        Компании изменились: для всех пользователей, которым они привязаны,
+        значения из before заменяются текущими.
+
+        Args:
+            before: Значения измерений до изменения (см. snapshot)
+            users: Привязки до изменения (по умолчанию читаются текущие)
+        """
+        if users is None:
+            users = self.linked_users(before)
+        after = self.snapshot(before)
+
+        deltas = Counter()
+        for company_id, old in before.items():
+            new = after.get(company_id)
+            if new == old:
+                continue
+            for user_id in users.get(company_id, []):
+                for key in _stats_keys(old):
+                    deltas[(user_id, *key)] -= 1
+                if new is not None:
+                    for key in _stats_keys(new):
+                        deltas[(user_id, *key)] += 1
+        self._apply(deltas)
+
+    def deleting(self, company_ids: Iterable[int]) -> None:
+        """Компании будут удалены (вызывается до удаления): вычитаются у всех пользователей"""
+        company_ids = list(company_ids)
+        users = self.linked_users(company_ids)
+        deltas = Counter()
+        for company_id, snapshot in self.snapshot(company_ids).items():
+            for user_id in users.get(company_id, []):
+                for key in _stats_keys(snapshot):
+                    deltas[(user_id, *key)] -= 1
+        self._apply(deltas)
+
+    def delete_for_user(self, user_id: int) -> None:
+        """Удаляет счетчики пользователя"""
+        self.session.execute(delete(UserCompanyStats).where(UserCompanyStats.user_id == user_id))
+
+    def _apply(self, deltas: Counter) -> None:
+        rows = [
+            {"user_id": user_id, "dimension": dimension, "value": value, "count": delta}
+            for (user_id, dimension, value), delta in sorted(deltas.items())
+            if delta
+        ]
+        if not rows:
+            return
+
+        # Строки обновляются в одном порядке, чтобы параллельные транзакции не ждали друг друга по кругу
+        table = UserCompanyStats.__table__
+        statement = self._insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[table.c.user_id, table.c.dimension, table.c.value],
+            set_={"count": table.c.count + statement.excluded["count"]},
+        )
+        for batch in _batches(rows):
+            self.session.execute(statement, batch)
+
+        user_ids = sorted({row["user_id"] for row in rows})
+        self.session.execute(
+            delete(UserCompanyStats).where(UserCompanyStats.user_id.in_(user_ids), UserCompanyStats.count <= 0)
+        )
+        logger.debug(f"Applied {len(rows)} company stats changes for {len(user_ids)} users")
+
+    def get_for_user(self, user_id: int) -> CompanyStatsRead:
+        """Статистика компаний пользователя из счетчиков"""
+        statement = select(UserCompanyStats).where(UserCompanyStats.user_id == user_id)
+        result = {field: {} for field in _READ_FIELDS.values()}
+        total = 0
+        for row in self.session.exec(statement):
+            if row.dimension == TOTAL_DIMENSION:
+                total = row.count
+            elif row.dimension in _READ_FIELDS:
+                result[_READ_FIELDS[row.dimension]][_label(row.value)] = row.count
+        return CompanyStatsRead(total_companies=total, **result)
+
+    def _computed(self, user_id: Optional[int] = None) -> Counter:
+        """Счетчики, посчитанные заново по привязкам и компаниям"""
+        counts = Counter()
+        dimensions = [(TOTAL_DIMENSION, None), *zip(COMPANY_STATS_DIMENSIONS, self._columns)]
+        for dimension, column in dimensions:
+            columns = [UserCompanyLink.user_id] + ([column] if column is not None else [])
+            statement = (
+                sa_select(*columns, func.count())
+                .join(Company, Company.id == UserCompanyLink.company_id)
+                .group_by(*columns)
+            )
+            if user_id is not None:
+                statement = statement.where(UserCompanyLink.user_id == user_id)
+            for row in self.session.execute(statement):
+                value = _encode(row[1]) if column is not None else TOTAL_VALUE
+                counts[(row[0], dimension, value)] += row[-1]
+        return counts
+
+    def _stored(self, user_id: Optional[int] = None) -> Counter:
+        statement = select(UserCompanyStats)
+        if user_id is not None:
+            statement = statement.where(UserCompanyStats.user_id == user_id)
+        return Counter({
+            (row.user_id, row.dimension, row.value): row.count for row in self.session.exec(statement)
+        })
+
+    def rebuild(self, user_id: Optional[int] = None, dry_run: bool = False) -> Dict[tuple[int, str, str], tuple[int, int]]:
+        """
+        Пересчитывает счетчики с нуля и исправляет расхождения.
+
+        Args:
+            user_id: Только для этого пользователя (по умолчанию - для всех)
+            dry_run: Только найти расхождения, ничего не меняя
+
+        Returns:
+            Расхождения: (пользователь, измерение, значение) -> (сохранено, должно быть)
+        """
+        computed = self._computed(user_id)
+        stored = self._stored(user_id)
+        drift = {
+            key: (stored.get(key, 0), computed.get(key, 0))
+            for key in sorted(set(computed) | set(stored))
+            if stored.get(key, 0) != computed.get(key, 0)
+        }
+        if drift and not dry_run:
+            self._apply(Counter({key: actual - saved for key, (saved, actual) in drift.items()}))
+
+        logger.info(f"Company stats rebuild: {len(drift)} drifted counters" + (" (dry run)" if dry_run else ""))
+        return drift
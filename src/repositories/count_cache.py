@@ -0,0 +1,65 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 30.0
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class CountCache:
+    """
+    Общий для процесса кэш количеств строк по набору фильтров с коротким
+    временем жизни записей. Изменения в базе не сбрасывают кэш: количество
+    может отставать не дольше ttl_seconds. ttl_seconds = 0 отключает кэш.
+    """
+
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, tuple[int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def configure(self, ttl_seconds: Optional[float] = None, max_entries: Optional[int] = None) -> None:
+        """Меняет время жизни и количество записей, лишние записи сразу вытесняются"""
+        with self._lock:
+            if ttl_seconds is not None:
+                self.ttl_seconds = ttl_seconds
+            if max_entries is not None:
+                self.max_entries = max_entries
+            self._evict()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            count, expires_at = entry
+            if time.monotonic() >= expires_at:
+                del self._entries[key]
+                return None
+            return count
+
+    def put(self, key: Hashable, count: int) -> None:
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (count, time.monotonic() + self.ttl_seconds)
+            self._evict()
+
+    def _evict(self) -> None:
+        # Записи упорядочены по времени добавления, поэтому первыми уходят самые старые
+        while self._entries and len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Количества компаний по фильтрам списков (CompanyRepository.filter_by_metrics)
+company_count_cache = CountCache()
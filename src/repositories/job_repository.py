@@ -0,0 +1,155 @@
+import datetime
+import logging
+from typing import Any, Dict, Optional
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from models import IngestJob, IngestJobRead, JobKind, JobStatus
+
+logger = logging.getLogger(__name__)
+
+
+def _now() -> datetime.datetime:
+    return datetime.datetime.now(datetime.timezone.utc)
+
+
+def _job_to_job_read(job: IngestJob) -> IngestJobRead:
+    """Преобразует IngestJob в IngestJobRead"""
+    return IngestJobRead(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        rows_processed=job.rows_processed,
+        rows_skipped=job.rows_skipped,
+        rows_failed=job.rows_failed,
+        rows_per_second=job.rows_per_second,
+        result=job.result,
+        error=job.error,
+        attempts=job.attempts,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at
+    )
+
+
+class JobRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create(self, user_id: int, kind: JobKind, params: Dict[str, Any]) -> IngestJob:
+        """Создать задачу в очереди"""
+        logger.info(f"Creating {kind.value} job for user id {user_id}")
+
+        job = IngestJob(user_id=user_id, kind=kind, params=params)
+        self.session.add(job)
+        self.session.commit()
+        self.session.refresh(job)
+        return job
+
+    def get_for_user(self, job_id: int, user_id: int) -> Optional[IngestJob]:
+        """Получить задачу пользователя по ID"""
+        statement = select(IngestJob).where(IngestJob.id == job_id, IngestJob.user_id == user_id)
+        return self.session.exec(statement).first()
+
+    def claim_next(self) -> Optional[IngestJob]:
+        """
+        Забирает самую старую задачу из очереди. Статус меняется условным
+        UPDATE, поэтому одну задачу не заберут два воркера, в том числе
+        из разных процессов.
+        """
+        queued = select(IngestJob.id).where(IngestJob.status == JobStatus.queued).order_by(IngestJob.id)
+        for job_id in self.session.exec(queued.limit(10)).all():
+            now = _now()
+            claimed = self.session.execute(
+                update(IngestJob)
+                .where(IngestJob.id == job_id, IngestJob.status == JobStatus.queued)
+                .values(
+                    status=JobStatus.running,
+                    attempts=IngestJob.attempts + 1,
+                    error=None,
+                    started_at=now,
+                    updated_at=now,
+                )
+            ).rowcount
+            self.session.commit()
+            if claimed:
+                logger.info(f"Claimed job id {job_id}")
+                return self.session.get(IngestJob, job_id)
+        return None
+
+    def update_progress(
+        self,
+        job_id: int,
+        rows_processed: int,
+        rows_skipped: int,
+        rows_failed: int,
+        rows_per_second: float,
+    ) -> None:
+        """Сохранить счетчики выполнения (заодно отмечает, что задача жива)"""
+        self.session.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id)
+            .values(
+                rows_processed=rows_processed,
+                rows_skipped=rows_skipped,
+                rows_failed=rows_failed,
+                rows_per_second=rows_per_second,
+                updated_at=_now(),
+            )
+        )
+        self.session.commit()
+
+    def finish(self, job_id: int, status: JobStatus, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        """Завершить задачу с результатом или ошибкой"""
+        logger.info(f"Job id {job_id} finished with status {status.value}")
+
+        now = _now()
+        self.session.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id)
+            .values(status=status, result=result, error=error, finished_at=now, updated_at=now)
+        )
+        self.session.commit()
+
+    def requeue(self, job_id: int) -> None:
+        """Вернуть задачу в очередь (например, при остановке приложения)"""
+        logger.info(f"Requeueing job id {job_id}")
+
+        self.session.execute(
+            update(IngestJob)
+            .where(IngestJob.id == job_id, IngestJob.status == JobStatus.running)
+            .values(status=JobStatus.queued, updated_at=_now())
+        )
+        self.session.commit()
+
+    def requeue_stale(self, stale_after: datetime.timedelta, max_attempts: int) -> int:
+        """
+        Вернуть в очередь выполняющиеся задачи, которые давно не обновлялись:
+        процесс, который их выполнял, завершился. Задача, у которой уже
+        max_attempts попыток, завершается с ошибкой: скорее всего, процесс
+        падает на ней самой (например, на испорченном файле)
+        """
+        now = _now()
+        stale = (IngestJob.status == JobStatus.running, IngestJob.updated_at < now - stale_after)
+        failed = self.session.execute(
+            update(IngestJob)
+            .where(*stale, IngestJob.attempts >= max_attempts)
+            .values(
+                status=JobStatus.failed,
+                error=f"Job was abandoned by a crashed worker {max_attempts} times",
+                finished_at=now,
+                updated_at=now,
+            )
+        ).rowcount
+        count = self.session.execute(
+            update(IngestJob)
+            .where(*stale)
+            .values(status=JobStatus.queued, updated_at=now)
+        ).rowcount
+        self.session.commit()
+        if failed:
+            logger.error(f"Failed {failed} stale jobs after {max_attempts} attempts")
+        if count:
+            logger.warning(f"Requeued {count} stale jobs")
+        return count
@@ -0,0 +1,222 @@
+import datetime
+import logging
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import func, literal, or_, select as sa_select, update
+from sqlmodel import Session, select
+
+from models import (Company, ConflictPolicy, Upload, UploadCompanyLink, UploadSession, UploadSessionRead,
+                    UploadSessionStatus, UserCompanyLink)
+from repositories.company_bulk_loader import _DIALECT_INSERTS
+from repositories.company_stats_repository import CompanyStatsRepository
+
+logger = logging.getLogger(__name__)
+
+# Количество строк в одном INSERT связей файла с компаниями
+LINK_BATCH_SIZE = 1000
+
+
+def _upload_session_to_read(upload_session: UploadSession) -> UploadSessionRead:
+    """Преобразует UploadSession в UploadSessionRead"""
+    return UploadSessionRead(
+        id=upload_session.id,
+        file_name=upload_session.file_name,
+        size_bytes=upload_session.size_bytes,
+        received_bytes=upload_session.received_bytes,
+        status=upload_session.status,
+        job_id=upload_session.job_id,
+        created_at=upload_session.created_at,
+        expires_at=upload_session.expires_at
+    )
+
+
+class UploadRepository:
+    """
+    Загруженные файлы по SHA-256 содержимого и компании, сохраненные из
+    каждого файла. Коммит остается за вызывающим кодом.
+    """
+
+    def __init__(self, session: Session):
+        self.session = session
+        self._insert = _DIALECT_INSERTS[session.get_bind().dialect.name]
+
+    def get_by_sha256(self, sha256: str) -> Optional[Upload]:
+        """Получить обработанный файл по хэшу содержимого"""
+        statement = select(Upload).where(Upload.sha256 == sha256)
+        return self.session.exec(statement).first()
+
+    def record(
+        self,
+        sha256: str,
+        stored_name: str,
+        file_name: str,
+        size_bytes: int,
+        user_id: int,
+        company_ids: Iterable[int],
+    ) -> int:
+        """
+        Запоминает обработанный файл и компании из него. Если тот же файл
+        параллельно записал другой запрос, компании добавляются к его записи.
+
+        Returns:
+            ID записи файла
+        """
+        uploads = Upload.__table__
+        upload_id = self.session.scalar(
+            self._insert(uploads)
+            .values(
+                **Upload(
+                    sha256=sha256,
+                    stored_name=stored_name,
+                    file_name=file_name,
+                    size_bytes=size_bytes,
+                    user_id=user_id,
+                ).model_dump(exclude={"id"})
+            )
+            .on_conflict_do_nothing(index_elements=[uploads.c.sha256])
+            .returning(uploads.c.id)
+        )
+        if upload_id is None:
+            upload_id = self.get_by_sha256(sha256).id
+
+        company_ids = list(company_ids)
+        links = self._insert(UploadCompanyLink.__table__).on_conflict_do_nothing()
+        for start in range(0, len(company_ids), LINK_BATCH_SIZE):
+            self.session.execute(links, [
+                {"upload_id": upload_id, "company_id": company_id}
+                for company_id in company_ids[start:start + LINK_BATCH_SIZE]
+            ])
+
+        logger.info(f"Recorded upload {upload_id} ({sha256}) with {len(company_ids)} companies")
+        return upload_id
+
+    def link_to_user(self, upload_id: int, user_id: int) -> tuple[int, int]:
+        """
+        Привязывает пользователю все компании из ранее обработанного файла
+        одним INSERT ... SELECT.
+
+        Returns:
+            Кортеж из (количество компаний в файле, количество новых привязок)
+        """
+        # JOIN с companies: без внешних ключей (SQLite) ссылки на удаленные компании не каскадируются
+        upload_companies = (
+            sa_select(literal(user_id), UploadCompanyLink.company_id)
+            .join(Company, Company.id == UploadCompanyLink.company_id)
+            .where(UploadCompanyLink.upload_id == upload_id)
+        )
+        total = self.session.scalar(sa_select(func.count()).select_from(upload_companies.subquery()))
+
+        links = UserCompanyLink.__table__
+        linked_ids = list(self.session.scalars(
+            self._insert(links)
+            .from_select(["user_id", "company_id"], upload_companies)
+            .on_conflict_do_nothing()
+            .returning(links.c.company_id)
+        ))
+        CompanyStatsRepository(self.session).linked(user_id, linked_ids)
+        linked = len(linked_ids)
+
+        logger.info(f"Linked {linked} of {total} companies from upload {upload_id} to user id {user_id}")
+        return total, linked
+
+    def preview_companies(self, upload_id: int, limit: int = 5) -> List[Dict[str, Any]]:
+        """Первые компании из файла (как companies_saved в ответе загрузки)"""
+        statement = (
+            select(Company.id, Company.name, Company.inn)
+            .join(UploadCompanyLink, UploadCompanyLink.company_id == Company.id)
+            .where(UploadCompanyLink.upload_id == upload_id)
+            .order_by(Company.id)
+            .limit(limit)
+        )
+        return [{"id": id_, "name": name, "inn": inn} for id_, name, inn in self.session.exec(statement)]
+
+
+class UploadSessionRepository:
+    def __init__(self, session: Session):
+        self.session = session
+
+    def create(
+        self,
+        user_id: int,
+        file_name: str,
+        stored_name: str,
+        size_bytes: Optional[int],
+        conflict_policy: ConflictPolicy,
+        ttl: datetime.timedelta,
+    ) -> UploadSession:
+        """Создать сессию загрузки"""
+        upload_session = UploadSession(
+            id=uuid.uuid4().hex,
+            user_id=user_id,
+            file_name=file_name,
+            stored_name=stored_name,
+            size_bytes=size_bytes,
+            conflict_policy=conflict_policy,
+            expires_at=datetime.datetime.now(datetime.timezone.utc) + ttl,
+        )
+        logger.info(f"Creating upload session {upload_session.id} for user id {user_id}")
+
+        self.session.add(upload_session)
+        self.session.commit()
+        self.session.refresh(upload_session)
+        return upload_session
+
+    def get_for_user(self, upload_id: str, user_id: int) -> Optional[UploadSession]:
+        """Получить сессию загрузки пользователя по ID (просроченные незавершенные не возвращаются)"""
+        statement = select(UploadSession).where(
+            UploadSession.id == upload_id,
+            UploadSession.user_id == user_id,
+            or_(
+                UploadSession.status == UploadSessionStatus.completed,
+                UploadSession.expires_at >= datetime.datetime.now(datetime.timezone.utc),
+            ),
+        )
+        return self.session.exec(statement).first()
+
+    def advance(self, upload_id: str, offset: int, received_bytes: int) -> bool:
+        """
+        Сдвигает смещение после записанного куска. Условие по старому
+        смещению не дает двум запросам записать один и тот же диапазон.
+        """
+        updated = self.session.execute(
+            update(UploadSession)
+            .where(UploadSession.id == upload_id, UploadSession.received_bytes == offset)
+            .values(received_bytes=received_bytes, updated_at=datetime.datetime.now(datetime.timezone.utc))
+        ).rowcount
+        self.session.commit()
+        return bool(updated)
+
+    def complete(self, upload_session: UploadSession, job_id: Optional[int] = None) -> None:
+        """Отметить, что файл собран и передан на обработку"""
+        upload_session.status = UploadSessionStatus.completed
+        upload_session.job_id = job_id
+        upload_session.updated_at = datetime.datetime.now(datetime.timezone.utc)
+        self.session.add(upload_session)
+        self.session.commit()
+
+    def delete(self, upload_session: UploadSession) -> None:
+        """Удалить сессию загрузки"""
+        logger.info(f"Deleting upload session {upload_session.id}")
+
+        self.session.delete(upload_session)
+        self.session.commit()
+
+    def delete_expired(self) -> List[str]:
+        """
+        Удаляет просроченные незавершенные сессии.
+
+        Returns:
+            Имена их файлов в UPLOAD_DIR (файлы удаляет вызывающий код)
+        """
+        statement = select(UploadSession).where(
+            UploadSession.status == UploadSessionStatus.receiving,
+            UploadSession.expires_at < datetime.datetime.now(datetime.timezone.utc),
+        )
+        expired = self.session.exec(statement).all()
+        for upload_session in expired:
+            self.session.delete(upload_session)
+        self.session.commit()
+        if expired:
+            logger.info(f"Deleted {len(expired)} expired upload sessions")
+        return [upload_session.stored_name for upload_session in expired]
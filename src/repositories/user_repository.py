@@ -4,6 +4,7 @@ from typing import Optional, Dict, Any
 from sqlmodel import Session, select
 
 from models import User
+from repositories.company_stats_repository import CompanyStatsRepository
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +69,8 @@ class UserRepository:
         logger.info(f"Deleting user id {user.id}")
 
         try:
+            # Без внешних ключей (SQLite) счетчики не удаляются каскадом
+            CompanyStatsRepository(self.session).delete_for_user(user.id)
             self.session.delete(user)
             self.session.commit()
             return True
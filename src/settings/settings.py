@@ -31,7 +31,24 @@ class Settings(BaseSettings):
     optimized_dir: str = "optimized"
     upload_dir: str = "uploads"
     max_file_size_bytes: int = 5 * 1024 * 1024 # 5 MB
+    max_resumable_upload_bytes: int = 4 * 1024 * 1024 * 1024 # 4 GB, загрузка кусками через /files/uploads
+    max_upload_chunk_bytes: int = 64 * 1024 * 1024 # 64 MB, один PUT куска
+    upload_session_ttl_hours: int = 24
     csv_content_types: list[str] = ["text/csv", "application/vnd.ms-excel"]
+    ingest_batch_size: int = 1000
+    ingest_conflict_policy: str = "keep"  # "keep", "overwrite" или "merge" при повторе (ИНН, год)
+    csv_reader_engine: str = "mmap"  # "mmap", "python" или "pandas"
+    csv_parallel_threshold_bytes: int = 16 * 1024 * 1024 # 16 MB, файлы больше разбираются в пуле процессов
+    csv_parallel_workers: int = 0 # 0 - по числу ядер
+    parse_cache_max_bytes: int = 512 * 1024 * 1024 # 512 MB, оценка памяти разобранных файлов
+    parse_cache_max_entries: int = 32
+    company_count_cache_ttl_seconds: float = 30.0 # total в списках компаний при пагинации по курсору, 0 - не кэшировать
+    company_count_cache_max_entries: int = 10000
+    columnar_sidecars: bool = True # колоночные копии CSV в OPTIMIZED_DIR (нужен pyarrow)
+    ingest_job_workers: int = 2 # 0 - задачи только ставятся в очередь, выполняет другой процесс
+    ingest_job_poll_seconds: float = 2.0
+    ingest_job_stale_seconds: int = 300 # задача без обновлений дольше считается брошенной
+    ingest_job_max_attempts: int = 3 # брошенная столько раз задача завершается с ошибкой, а не возвращается в очередь
 
     jwt_secret: str = "dev-secret-change-me"
     jwt_algorithm: str = "HS256"
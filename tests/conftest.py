@@ -0,0 +1,90 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Настройки читаются при импорте settings: база и папки тестов - во временной папке
+_TMP_DIR = Path(tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ["postgresql_uri"] = f"sqlite:///{_TMP_DIR / 'test.db'}"
+os.environ["upload_dir"] = str(_TMP_DIR / "uploads")
+os.environ["optimized_dir"] = str(_TMP_DIR / "optimized")
+os.environ["ingest_job_workers"] = "0"
+os.environ["argon2_time_cost"] = "1"
+os.environ["argon2_memory_cost"] = "8192"
+os.environ["argon2_parallelism"] = "1"
+
+TEST_DATA = Path(__file__).resolve().parent.parent / "src" / "parser" / "test_data.csv"
+
+
+@pytest.fixture
+def database():
+    """Пустая схема базы для каждого теста"""
+    from database.database import db
+    from repositories.count_cache import company_count_cache
+
+    db.engine.echo = False
+    db.dropAllTables()
+    db.createAllTables()
+    db.applyMigrations()
+    company_count_cache.clear()
+    yield db
+    db.engine.dispose()
+
+
+@pytest.fixture
+def session(database):
+    with database.getSession() as session:
+        yield session
+
+
+@pytest.fixture
+def client(database):
+    from fastapi.testclient import TestClient
+
+    from api.app import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+def auth_headers(client, username: str = "alice") -> dict:
+    """Регистрирует пользователя и возвращает заголовок с его токеном"""
+    credentials = {"username": username, "password": "secret1"}
+    client.post("/api/v1/auth/register", json=credentials)
+    token = client.post("/api/v1/auth/login-json", json=credentials).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+def company_row(inn: int, year: int, name: str = "ООО Тест", **json_data) -> dict:
+    """Строка для CompanyBulkLoader с минимальным набором полей и метриками из json_data"""
+    from csv_reader.metrics import company_metrics
+    from repositories.company_bulk_loader import company_row as make_row
+
+    return make_row(
+        inn=inn,
+        year=year,
+        name=name,
+        full_name=name,
+        spark_status="Действующая",
+        main_industry="Машиностроение",
+        company_size_final="Среднее",
+        json_data=json_data,
+        **company_metrics(json_data),
+    )
+
+
+def run_queued_jobs() -> None:
+    """Выполняет задачи из очереди в текущем процессе (воркеры в тестах отключены)"""
+    import asyncio
+
+    from database.database import db
+    from jobs import ingest_jobs
+    from repositories.job_repository import JobRepository
+
+    while True:
+        with db.getSession() as session:
+            job = JobRepository(session).claim_next()
+        if job is None:
+            return
+        asyncio.run(ingest_jobs._run(job))
@@ -0,0 +1,132 @@
+import pytest
+from sqlmodel import select
+
+from conftest import company_row
+from csv_reader.metrics import company_metrics
+from models import Company, ConfirmationStatus, ConflictPolicy, User, UserCompanyLink
+from repositories.company_bulk_loader import CompanyBulkLoader
+
+REVENUE = "Выручка предприятия, тыс. руб"
+OLD_DATA = {REVENUE: 100, "Округ": "ЦАО", "Вложенные": {"a": 1, "b": 2}, "Только старое": "x"}
+NEW_DATA = {"Округ": "САО", "Вложенные": {"c": 3}, "Пустое": None}
+
+
+def _users(session, *usernames: str) -> list[int]:
+    users = [User(username=username, salt="salt", password_hash="hash") for username in usernames]
+    session.add_all(users)
+    session.commit()
+    return [user.id for user in users]
+
+
+def test_load_returns_ids_in_row_order_across_batches(session):
+    (alice,) = _users(session, "alice")
+    rows = [company_row(1000 + i, 2022, f"Компания {i}") for i in range(7)]
+    # Повтор (ИНН, год) в другой пачке получает тот же ID
+    rows.append(company_row(1002, 2022, "Компания 2"))
+
+    loader = CompanyBulkLoader(session, alice, batch_size=3)
+    result = loader.load(rows)
+    session.commit()
+
+    companies = {company.id: company for company in session.exec(select(Company))}
+    assert len(companies) == 7
+    assert [companies[company_id].inn for company_id in result.company_ids] == [row["inn"] for row in rows]
+    assert result.company_ids[2] == result.company_ids[7]
+    assert result.linked_ids == set(companies)
+    assert (loader.loaded, loader.linked, loader.batches) == (8, 7, 3)
+
+
+def test_progress_is_reported_after_each_batch(session):
+    (alice,) = _users(session, "alice")
+    progress = []
+
+    CompanyBulkLoader(session, alice, batch_size=2, on_progress=progress.append).load(
+        [company_row(1000 + i, 2022) for i in range(5)]
+    )
+
+    assert progress == [2, 4, 5]
+
+
+def test_existing_companies_are_linked_to_another_user_once(session):
+    alice, bob = _users(session, "alice", "bob")
+    rows = [company_row(1000 + i, 2022) for i in range(3)]
+    first = CompanyBulkLoader(session, alice).load(rows)
+    session.commit()
+
+    second = CompanyBulkLoader(session, bob).load(rows)
+    again = CompanyBulkLoader(session, bob).load(rows)
+    session.commit()
+
+    assert second.company_ids == first.company_ids
+    assert second.linked_ids == set(first.company_ids)
+    assert again.linked_ids == set()
+    assert len(session.exec(select(Company)).all()) == 3
+    assert len(session.exec(select(UserCompanyLink)).all()) == 6
+
+
+def _load(session, user_id, rows, policy, batch_size=1000):
+    result = CompanyBulkLoader(session, user_id, batch_size=batch_size, conflict_policy=policy).load(rows)
+    session.commit()
+    session.expire_all()
+    return result
+
+
+def _company(session) -> Company:
+    return session.exec(select(Company)).one()
+
+
+def test_keep_leaves_existing_company_untouched(session):
+    (alice,) = _users(session, "alice")
+    first = _load(session, alice, [company_row(1000, 2022, "Старое", **OLD_DATA)], ConflictPolicy.keep)
+    before = _company(session).model_dump()
+
+    second = _load(session, alice, [company_row(1000, 2022, "Новое", **NEW_DATA)], ConflictPolicy.keep)
+
+    assert second.company_ids == first.company_ids
+    assert _company(session).model_dump() == before
+
+
+def test_overwrite_replaces_data_but_keeps_confirmation(session):
+    (alice,) = _users(session, "alice")
+    _load(session, alice, [company_row(1000, 2022, "Старое", **OLD_DATA)], ConflictPolicy.keep)
+    company = _company(session)
+    company.confirmation_status = ConfirmationStatus.confirmed
+    session.add(company)
+    session.commit()
+
+    _load(session, alice, [company_row(1000, 2022, "Новое", **NEW_DATA)], ConflictPolicy.overwrite)
+
+    company = _company(session)
+    assert (company.name, company.json_data) == ("Новое", NEW_DATA)
+    assert (company.revenue, company.district) == (None, "САО")
+    assert company.confirmation_status == ConfirmationStatus.confirmed
+
+
+@pytest.mark.parametrize("batch_size", [1, 1000], ids=["upsert", "same-batch"])
+def test_merge_is_shallow_and_keeps_nulls(session, batch_size):
+    (alice,) = _users(session, "alice")
+    rows = [company_row(1000, 2022, "Старое", **OLD_DATA), company_row(1000, 2022, "Новое", **NEW_DATA)]
+
+    # batch_size=1 - объединение в базе (ON CONFLICT, в SQLite через json_each),
+    # 1000 - повтор в одной пачке сводится в _deduplicate
+    _load(session, alice, rows, ConflictPolicy.merge, batch_size=batch_size)
+
+    company = _company(session)
+    merged = {**OLD_DATA, **NEW_DATA}
+    assert company.name == "Новое"
+    assert company.json_data == merged
+    # Метрики следуют объединенным данным: выручки нет в новых данных, округ есть
+    assert (company.revenue, company.district) == (100, "САО")
+    assert {column: getattr(company, column) for column in company_metrics(merged)} == company_metrics(merged)
+
+
+def test_merge_null_metric_overrides_old_value(session):
+    (alice,) = _users(session, "alice")
+    _load(session, alice, [company_row(1000, 2022, **OLD_DATA)], ConflictPolicy.keep)
+
+    _load(session, alice, [company_row(1000, 2022, **{REVENUE: None})], ConflictPolicy.merge)
+
+    company = _company(session)
+    assert company.json_data[REVENUE] is None
+    assert company.revenue is None
+    assert company.district == "ЦАО"
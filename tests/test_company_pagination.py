@@ -0,0 +1,121 @@
+import pytest
+from sqlalchemy import event
+from sqlmodel import select
+
+from conftest import TEST_DATA, auth_headers, company_row
+from models import Company, User
+from repositories.company_bulk_loader import CompanyBulkLoader
+
+
+@pytest.fixture
+def headers(client):
+    headers = auth_headers(client)
+    response = client.post("/api/v1/files/upload", files={"file": ("companies.csv", TEST_DATA.read_bytes(), "text/csv")}, headers=headers)
+    assert response.status_code == 200
+    return headers
+
+
+def _pages(client, headers, path="/api/v1/companies/", **params) -> list[dict]:
+    pages = []
+    cursor = None
+    while True:
+        query = {**params, **({"cursor": cursor} if cursor else {})}
+        response = client.get(path, params=query, headers=headers)
+        assert response.status_code == 200, response.json()
+        pages.append(response.json())
+        cursor = pages[-1]["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def _ids(pages: list[dict]) -> list[int]:
+    return [company["id"] for page in pages for company in page["companies"]]
+
+
+def test_cursor_pages_cover_all_companies_once(client, session, headers):
+    pages = _pages(client, headers, limit=7, include_json=False)
+
+    assert [len(page["companies"]) for page in pages] == [7] * 11 + [3]
+    assert _ids(pages) == sorted(company.id for company in session.exec(select(Company)))
+
+
+@pytest.mark.parametrize("order_by", ["year", "revenue", "headcount"])
+def test_cursor_pages_follow_sort_order(client, session, headers, order_by):
+    pages = _pages(client, headers, "/api/v1/companies/filter", limit=9, order_by=order_by, fields="id")
+
+    companies = session.exec(select(Company)).all()
+    # Компании без значения метрики - в конце, при равных значениях - по id
+    expected = sorted(companies, key=lambda company: (getattr(company, order_by) is None, getattr(company, order_by) or 0, company.id))
+    assert _ids(pages) == [company.id for company in expected]
+
+
+def test_cursor_pages_keep_filters(client, session, headers):
+    pages = _pages(client, headers, "/api/v1/companies/filter", limit=6, years=[2022], fields="id,year")
+
+    assert {company["year"] for page in pages for company in page["companies"]} == {2022}
+    assert len(_ids(pages)) == len(session.exec(select(Company).where(Company.year == 2022)).all())
+
+
+def test_cursor_is_not_affected_by_new_companies_on_earlier_pages(client, session, headers):
+    params = {"order_by": "year", "fields": "id,year"}
+    expected = client.get("/api/v1/companies/", params={**params, "limit": 20}, headers=headers).json()
+    first = client.get("/api/v1/companies/", params={**params, "limit": 10}, headers=headers).json()
+    # Компания, которая встает в начало сортировки, не сдвигает следующую страницу (в отличие от offset)
+    user = session.exec(select(User)).one()
+    CompanyBulkLoader(session, user.id).load([company_row(1, 2000)])
+    session.commit()
+
+    second = client.get("/api/v1/companies/", params={**params, "limit": 10, "cursor": first["next_cursor"]}, headers=headers).json()
+
+    assert _ids([first, second]) == _ids([expected])
+
+
+def test_invalid_cursor_is_rejected(client, headers):
+    cursor = client.get("/api/v1/companies/", params={"limit": 5}, headers=headers).json()["next_cursor"]
+
+    other_order = client.get("/api/v1/companies/", params={"cursor": cursor, "order_by": "year"}, headers=headers)
+    with_offset = client.get("/api/v1/companies/", params={"cursor": cursor, "offset": 5}, headers=headers)
+    garbage = client.get("/api/v1/companies/", params={"cursor": "not-a-cursor"}, headers=headers)
+
+    assert [other_order.status_code, with_offset.status_code, garbage.status_code] == [400, 400, 400]
+
+
+@pytest.mark.parametrize("params, where", [
+    ({}, True),
+    ({"years": [2022, 2023]}, Company.year.in_([2022, 2023])),
+    ({"revenue_min": 1000000}, Company.revenue >= 1000000),
+    ({"data": "Округ=САО"}, Company.district == "САО"),
+])
+def test_total_counts_all_matching_companies(client, session, headers, params, where):
+    response = client.get("/api/v1/companies/filter", params={**params, "limit": 5, "fields": "id"}, headers=headers)
+
+    assert response.status_code == 200
+    assert response.json()["total"] == len(session.exec(select(Company).where(where)).all())
+
+
+def test_cursor_pages_carry_total_without_counting(client, database, headers):
+    from repositories.count_cache import company_count_cache
+
+    first = client.get("/api/v1/companies/filter", params={"years": [2022], "limit": 5}, headers=headers).json()
+    company_count_cache.clear()
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(database.engine, "before_cursor_execute", listener)
+    try:
+        second = client.get("/api/v1/companies/filter", params={"years": [2022], "limit": 5, "cursor": first["next_cursor"]}, headers=headers).json()
+    finally:
+        event.remove(database.engine, "before_cursor_execute", listener)
+
+    assert second["total"] == first["total"] == 20
+    assert statements
+    assert not [statement for statement in statements if "count(" in statement.lower()]
+
+
+def test_offset_pages_report_the_same_total(client, headers):
+    totals = {
+        client.get("/api/v1/companies/", params={"limit": 10, "offset": offset}, headers=headers).json()["total"]
+        for offset in (0, 10, 70, 200)
+    }
+
+    assert totals == {80}
@@ -0,0 +1,103 @@
+from collections import Counter
+
+from sqlmodel import select
+
+from conftest import TEST_DATA, auth_headers, company_row
+from models import Company, ConflictPolicy, User, UserCompanyStats
+from repositories.company_bulk_loader import CompanyBulkLoader
+from repositories.company_stats_repository import CompanyStatsRepository
+
+
+def _upload(client, headers):
+    response = client.post("/api/v1/files/upload", files={"file": ("companies.csv", TEST_DATA.read_bytes(), "text/csv")}, headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _stats(client, headers) -> dict:
+    response = client.get("/api/v1/companies/stats", headers=headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _assert_no_drift(session):
+    session.expire_all()
+    assert CompanyStatsRepository(session).rebuild(dry_run=True) == {}
+
+
+def test_upload_counters_match_companies(client, session):
+    headers = auth_headers(client)
+    _upload(client, headers)
+
+    stats = _stats(client, headers)
+
+    companies = session.exec(select(Company)).all()
+    assert stats["total_companies"] == 80
+    assert stats["years"] == {str(year): count for year, count in Counter(company.year for company in companies).items()}
+    assert stats["industries"] == dict(Counter(company.main_industry for company in companies))
+    assert sum(stats["support_measures"].values()) == 80
+    _assert_no_drift(session)
+
+
+def test_deduplicated_upload_counts_for_the_new_user(client, session):
+    alice, bob = auth_headers(client, "alice"), auth_headers(client, "bob")
+    _upload(client, alice)
+
+    assert _upload(client, bob)["deduplicated"] is True
+
+    assert _stats(client, bob) == _stats(client, alice)
+    _assert_no_drift(session)
+
+
+def test_changes_are_counted_for_every_owner(session):
+    users = [User(username=username, salt="salt", password_hash="hash") for username in ("alice", "bob")]
+    session.add_all(users)
+    session.commit()
+    alice, bob = (user.id for user in users)
+    rows = [company_row(1000 + i, 2022, **{"Округ": "ЦАО"}) for i in range(3)]
+    CompanyBulkLoader(session, alice).load(rows)
+    CompanyBulkLoader(session, bob).load(rows[:2])
+    session.commit()
+
+    # overwrite меняет округ у компании, привязанной обоим пользователям
+    CompanyBulkLoader(session, alice, conflict_policy=ConflictPolicy.overwrite).load(
+        [company_row(1000, 2022, **{"Округ": "САО"})]
+    )
+    session.commit()
+
+    stats = CompanyStatsRepository(session)
+    assert stats.get_for_user(alice).districts == {"ЦАО": 2, "САО": 1}
+    assert stats.get_for_user(bob).districts == {"ЦАО": 1, "САО": 1}
+    _assert_no_drift(session)
+
+
+def test_update_and_delete_through_api(client, session):
+    headers = auth_headers(client)
+    _upload(client, headers)
+    company = session.exec(select(Company).order_by(Company.id)).first()
+
+    response = client.patch(f"/api/v1/companies/{company.id}", json={"main_industry": "Новая отрасль"}, headers=headers)
+    assert response.status_code == 200
+    assert _stats(client, headers)["industries"]["Новая отрасль"] == 1
+
+    assert client.delete(f"/api/v1/companies/{company.id}", headers=headers).status_code == 200
+    stats = _stats(client, headers)
+    assert stats["total_companies"] == 79
+    assert "Новая отрасль" not in stats["industries"]
+    _assert_no_drift(session)
+
+
+def test_rebuild_fixes_drifted_counters(client, session):
+    headers = auth_headers(client)
+    _upload(client, headers)
+    counter = session.exec(select(UserCompanyStats).where(UserCompanyStats.dimension == "total")).one()
+    counter.count = 5
+    session.add(counter)
+    session.commit()
+
+    drift = CompanyStatsRepository(session).rebuild()
+    session.commit()
+
+    assert drift == {(counter.user_id, "total", "null"): (5, 80)}
+    assert _stats(client, headers)["total_companies"] == 80
+    _assert_no_drift(session)
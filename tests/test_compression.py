@@ -0,0 +1,109 @@
+import asyncio
+import gzip
+
+import pytest
+
+from conftest import TEST_DATA, auth_headers
+from csv_reader.compression import (DecompressedSizeError, DecompressionError, compression_for, is_supported,
+                                    iter_decompressed)
+
+CONTENT = TEST_DATA.read_bytes()
+
+
+def _decompress(data: bytes, compression: str, chunk_size: int = 1000, max_bytes=None) -> bytes:
+    async def chunks():
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+    async def collect():
+        return b"".join([output async for output in iter_decompressed(chunks(), compression, max_bytes)])
+
+    return asyncio.run(collect())
+
+
+def test_compression_is_detected_by_file_name():
+    assert compression_for("companies.CSV.GZ") == "gzip"
+    assert compression_for("companies.csv.zst") == "zstd"
+    assert compression_for("companies.csv") is None
+    assert is_supported(None) and is_supported("gzip")
+    assert not is_supported("bzip2")
+
+
+@pytest.mark.parametrize("chunk_size", [1, 13, 4096, 1 << 20])
+def test_gzip_is_decompressed_across_chunk_boundaries(chunk_size):
+    assert _decompress(gzip.compress(CONTENT), "gzip", chunk_size) == CONTENT
+
+
+def test_concatenated_gzip_streams_and_zero_padding():
+    data = gzip.compress(CONTENT[:1000]) + gzip.compress(CONTENT[1000:]) + b"\0" * 512
+
+    assert _decompress(data, "gzip") == CONTENT
+
+
+def test_truncated_or_corrupt_gzip_fails():
+    data = gzip.compress(CONTENT)
+
+    with pytest.raises(DecompressionError):
+        _decompress(data[:-20], "gzip")
+    with pytest.raises(DecompressionError):
+        _decompress(data[:20] + b"not gzip" + data[28:], "gzip")
+
+
+def test_decompressed_size_is_limited():
+    bomb = gzip.compress(b"0" * (8 << 20))
+
+    with pytest.raises(DecompressedSizeError) as error:
+        _decompress(bomb, "gzip", max_bytes=1 << 20)
+    assert error.value.limit == 1 << 20
+
+
+def test_zstd_is_decompressed_across_chunk_boundaries():
+    zstandard = pytest.importorskip("zstandard")
+    data = zstandard.ZstdCompressor().compress(CONTENT)
+
+    assert _decompress(data, "zstd", chunk_size=7) == CONTENT
+    with pytest.raises(DecompressionError):
+        _decompress(data[:-10], "zstd")
+
+
+def test_gzip_upload_is_stored_compressed_and_ingested(client):
+    from api.files import UPLOAD_DIR
+
+    data = gzip.compress(CONTENT)
+
+    response = client.post(
+        "/api/v1/files/upload",
+        files={"file": ("companies.csv.gz", data, "application/gzip")},
+        headers=auth_headers(client),
+    )
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["stored_name"].endswith(".csv.gz")
+    assert body["size_bytes"] == len(data)
+    assert body["companies_processed"] == 80
+    assert (UPLOAD_DIR / body["stored_name"]).read_bytes() == data
+
+
+def test_corrupt_gzip_upload_is_rejected(client):
+    response = client.post(
+        "/api/v1/files/upload",
+        files={"file": ("companies.csv.gz", b"\x1f\x8b not really gzip", "application/gzip")},
+        headers=auth_headers(client),
+    )
+
+    assert response.status_code == 400
+
+
+def test_zstd_upload_without_zstandard_is_rejected(client, monkeypatch):
+    import csv_reader.compression
+
+    monkeypatch.setattr(csv_reader.compression, "zstandard", None)
+
+    response = client.post(
+        "/api/v1/files/upload",
+        files={"file": ("companies.csv.zst", b"\x28\xb5\x2f\xfd", "application/zstd")},
+        headers=auth_headers(client),
+    )
+
+    assert response.status_code == 415
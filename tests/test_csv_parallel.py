@@ -0,0 +1,51 @@
+import csv
+import io
+
+import pytest
+
+from csv_reader.parallel import _read_header, _read_sample, find_chunk_boundaries
+
+
+def _write_csv(tmp_path, rows: int):
+    lines = ["ИНН;Наименование организации;Округ"]
+    for i in range(rows):
+        if i % 3 == 0:
+            # Кавычки внутри значения без кавычек не открывают поле в кавычках
+            lines.append(f'{i};ООО "НПП "ИТЭЛМА {i}";САО')
+        elif i % 3 == 1:
+            lines.append(f'{i};"многострочное\nназвание; {i}";ЮАО')
+        else:
+            lines.append(f'"{i}";"с ""кавычками"" {i}";ЦАО')
+    text = "\n".join(lines) + "\n"
+    path = tmp_path / "companies.csv"
+    path.write_bytes(text.encode("utf-8"))
+    return path, text
+
+
+def _records(text: str):
+    return [record for record in csv.reader(io.StringIO(text, newline=None), delimiter=";") if record]
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 17, 64, 333, 10_000])
+def test_chunk_boundaries_do_not_split_records(tmp_path, chunk_bytes):
+    path, text = _write_csv(tmp_path, 60)
+    header, data_start = _read_header(str(path), ";")
+    data = path.read_bytes()
+
+    chunks = find_chunk_boundaries(str(path), data_start, ";", chunk_bytes)
+    records = [
+        record
+        for start, end in chunks
+        for record in _records(data[start:end].decode("utf-8"))
+    ]
+
+    assert header == ["ИНН", "Наименование организации", "Округ"]
+    assert chunks[0][0] == data_start and chunks[-1][1] == len(data)
+    assert records == _records(text)[1:]
+
+
+def test_sample_reads_complete_records(tmp_path):
+    path, text = _write_csv(tmp_path, 30)
+    _, data_start = _read_header(str(path), ";")
+
+    assert _read_sample(str(path), data_start, ";", 10) == _records(text)[1:11]
@@ -0,0 +1,60 @@
+import csv
+import io
+from pathlib import Path
+
+import pytest
+
+from csv_reader.reader import IncrementalCSVParser, _split_complete_records
+
+TEST_DATA = Path(__file__).resolve().parent.parent / "src" / "parser" / "test_data.csv"
+
+# Кавычки внутри значения без кавычек, затем поле в кавычках с переводом строки
+BARE_QUOTES_THEN_MULTILINE = (
+    "ИНН;Наименование организации;Округ\n"
+    '1;ООО "НПП "ИТЭЛМА";САО\n'
+    '2;"многострочное\nназвание";ЮАО\n'
+    '3;"с ""кавычками""";ЦАО\n'
+)
+
+
+def _feed(text: str, chunk_size: int) -> list[dict]:
+    parser = IncrementalCSVParser(delimiter=";", infer_types=False)
+    rows = []
+    for start in range(0, len(text), chunk_size):
+        rows.extend(parser.feed(text[start:start + chunk_size]))
+    rows.extend(parser.close())
+    return rows
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 7, 1024])
+def test_bare_quotes_do_not_open_quoted_field(chunk_size):
+    rows = _feed(BARE_QUOTES_THEN_MULTILINE, chunk_size)
+
+    assert [row["Наименование организации"] for row in rows] == [
+        'ООО "НПП "ИТЭЛМА"',
+        "многострочное\nназвание",
+        'с "кавычками"',
+    ]
+    assert [row["Округ"] for row in rows] == ["САО", "ЮАО", "ЦАО"]
+
+
+def test_split_keeps_incomplete_quoted_record():
+    complete, rest = _split_complete_records('1;ООО "А";x\n2;"начало\nпродолжение', ";")
+
+    assert complete == '1;ООО "А";x\n'
+    assert rest == '2;"начало\nпродолжение'
+
+
+@pytest.mark.parametrize("chunk_size", [97, 4096])
+def test_test_data_matches_csv_reader(chunk_size):
+    text = TEST_DATA.read_text(encoding="utf-8-sig")
+    # Реальный файл с кавычками внутри значений и дописанное многострочное поле
+    text = text.rstrip("\n") + "\n" + ";".join(["999", "1234567890", '"многострочное\nполе"'] + [""] * 30) + "\n"
+    expected = list(csv.DictReader(io.StringIO(text), delimiter=";"))
+
+    rows = _feed(text, chunk_size)
+
+    assert len(rows) == len(expected)
+    assert [row["Наименование организации"] for row in rows] == [
+        row["Наименование организации"] for row in expected
+    ]
@@ -0,0 +1,114 @@
+import hashlib
+
+import pytest
+from sqlmodel import select
+
+from conftest import TEST_DATA, auth_headers
+from models import Company, Upload, UserCompanyLink
+
+
+def _upload(client, headers, content: bytes, name: str = "companies.csv", **params):
+    return client.post(
+        "/api/v1/files/upload",
+        params=params,
+        files={"file": (name, content, "text/csv")},
+        headers=headers,
+    )
+
+
+@pytest.fixture
+def small_batches(monkeypatch):
+    import api.files
+
+    monkeypatch.setattr(api.files, "INGEST_BATCH_SIZE", 25)
+
+
+def test_upload_saves_companies_in_batches(client, session, small_batches):
+    headers = auth_headers(client)
+
+    response = _upload(client, headers, TEST_DATA.read_bytes())
+
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["companies_processed"], body["companies_skipped"], body["companies_failed"]) == (80, 0, 0)
+    assert len(body["companies_saved"]) == 5
+    companies = session.exec(select(Company)).all()
+    assert len(companies) == 80
+    assert all(company.json_data["ИНН"] == company.inn for company in companies)
+
+
+def test_upload_overwrite_updates_existing_companies(client, session, small_batches):
+    headers = auth_headers(client)
+    content = TEST_DATA.read_bytes()
+    _upload(client, headers, content)
+    name = session.exec(select(Company.name).order_by(Company.id)).first()
+
+    changed = content.decode("utf-8-sig").replace(name, "ООО Переименованная", 1).encode("utf-8")
+    response = _upload(client, headers, changed, conflict_policy="overwrite")
+
+    assert response.status_code == 200
+    assert response.json()["companies_skipped"] == 80
+    assert session.exec(select(Company.name).order_by(Company.id)).first() == "ООО Переименованная"
+    assert len(session.exec(select(Company)).all()) == 80
+
+
+@pytest.fixture
+def no_parsing(monkeypatch):
+    """Разбор и сохранение компаний запрещены: повторный файл должен только привязываться"""
+    from repositories.company_bulk_loader import CompanyBulkLoader
+
+    def load(self, rows):
+        raise AssertionError("known file was parsed again")
+
+    monkeypatch.setattr(CompanyBulkLoader, "load", load)
+
+
+def _stored_files() -> list:
+    from api.files import UPLOAD_DIR
+
+    return sorted(UPLOAD_DIR.iterdir())
+
+
+def test_known_content_is_linked_without_parsing(client, session, request):
+    alice, bob = auth_headers(client, "alice"), auth_headers(client, "bob")
+    content = TEST_DATA.read_bytes()
+    first = _upload(client, alice, content).json()
+    files = _stored_files()
+
+    request.getfixturevalue("no_parsing")
+    response = _upload(client, bob, content, name="copy.csv")
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["deduplicated"] is True
+    assert body["stored_name"] == first["stored_name"]
+    assert (body["companies_processed"], body["companies_skipped"]) == (80, 0)
+    assert _stored_files() == files
+    assert len(session.exec(select(UserCompanyLink)).all()) == 160
+    assert session.exec(select(Upload.sha256)).one() == hashlib.sha256(content).hexdigest()
+
+
+def test_content_hash_header_is_verified(client, request):
+    headers = auth_headers(client)
+    content = TEST_DATA.read_bytes()
+    _upload(client, headers, content)
+    request.getfixturevalue("no_parsing")
+    sha256 = hashlib.sha256(content).hexdigest()
+
+    hit = _upload(client, {**headers, "X-Content-SHA256": sha256.upper()}, content)
+    mismatch = _upload(client, {**headers, "X-Content-SHA256": sha256}, content + b"\n")
+
+    assert hit.status_code == 200 and hit.json()["deduplicated"] is True
+    assert mismatch.status_code == 400
+
+
+def test_overwrite_processes_known_content_again(client):
+    headers = auth_headers(client)
+    content = TEST_DATA.read_bytes()
+    _upload(client, headers, content)
+
+    response = _upload(client, headers, content, conflict_policy="overwrite")
+
+    assert response.status_code == 200
+    assert response.json()["deduplicated"] is False
+    assert response.json()["companies_processed"] == 80
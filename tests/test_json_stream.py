@@ -0,0 +1,74 @@
+import asyncio
+import json
+
+import pytest
+
+from csv_reader.json_stream import IncrementalJSONParser
+from csv_reader.reader import AsyncCSVReader
+
+ITEMS = [
+    {"ИНН": "7700000001", "Наименование организации": "ООО \"Первая\"", "Год": 2022, "Выручка": 1.5e3},
+    {"ИНН": "7700000002", "Наименование организации": "ООО Вторая 😀", "Год": 2023, "Данные": [True, None, {"a": -12}]},
+]
+
+
+def _feed(text: str, chunk_size: int) -> list:
+    parser = IncrementalJSONParser()
+    items = []
+    for start in range(0, len(text), chunk_size):
+        items.extend(parser.feed(text[start:start + chunk_size]))
+    items.extend(parser.close())
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 64, 1 << 20])
+@pytest.mark.parametrize("text", [
+    json.dumps(ITEMS, ensure_ascii=False),
+    json.dumps(ITEMS),
+    "\n".join(json.dumps(item, ensure_ascii=False) for item in ITEMS) + "\n",
+], ids=["array", "array-ascii", "ndjson"])
+def test_items_are_parsed_across_chunk_boundaries(text, chunk_size):
+    assert _feed(text, chunk_size) == ITEMS
+
+
+def test_single_object_and_empty_array():
+    assert _feed(json.dumps(ITEMS[0]), 3) == [ITEMS[0]]
+    assert _feed(" [ ] ", 1) == []
+
+
+def test_items_are_returned_as_soon_as_they_are_complete():
+    parser = IncrementalJSONParser()
+    text = json.dumps(ITEMS)
+    first_end = text.index("}, {") + 1
+
+    assert parser.feed(text[:first_end - 1]) == []
+    assert parser.feed(text[first_end - 1:first_end + 2]) == [ITEMS[0]]
+
+
+@pytest.mark.parametrize("text", ['[{"a": 1}', '[{"a": 1},]', '[{"a": 1}] [', '{"a": 1} 5'])
+def test_truncated_or_malformed_documents_fail(text):
+    with pytest.raises(ValueError):
+        _feed(text, 4)
+
+
+def test_invalid_json_fails_without_buffering_the_rest_of_the_file():
+    parser = IncrementalJSONParser()
+    parser.feed('[{"a": 1}, {"a": 1 "b": 2}, ')
+
+    with pytest.raises(json.JSONDecodeError):
+        parser.feed('{"a": 1}, ' * 10)
+
+
+def test_companies_are_streamed_from_json_file(tmp_path):
+    path = tmp_path / "companies.json"
+    path.write_text(json.dumps(ITEMS, ensure_ascii=False), encoding="utf-8")
+
+    async def read():
+        streamed = [company async for company in AsyncCSVReader.iter_companies_from_json_file(str(path), chunk_size=7)]
+        return streamed, await AsyncCSVReader.create_companies_from_json_file(str(path))
+
+    streamed, created = asyncio.run(read())
+
+    assert [company["inn"] for company in streamed] == [7700000001, 7700000002]
+    assert [company["year"] for company in streamed] == [2022, 2023]
+    assert [company["inn"] for company in created] == [company["inn"] for company in streamed]
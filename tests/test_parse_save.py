@@ -0,0 +1,77 @@
+import asyncio
+
+from sqlalchemy import event
+from sqlmodel import select
+
+from models import Company, User, UserCompanyLink
+
+
+def _parsed(count: int, year: int = 2022) -> list[dict]:
+    return [
+        {"ИНН": str(7700000000 + i), "Наименование организации": f"ООО Компания {i}", "Год": str(year)}
+        for i in range(count)
+    ]
+
+
+def _user(session, username: str) -> int:
+    user = User(username=username, salt="salt", password_hash="hash")
+    session.add(user)
+    session.commit()
+    return user.id
+
+
+def _save(session, companies, user_id):
+    from api.parse import save_parsed_companies_to_db
+
+    result = asyncio.run(save_parsed_companies_to_db(companies, user_id, session))
+    session.commit()
+    return result
+
+
+def test_saves_new_companies_and_skips_known_ones(session):
+    alice = _user(session, "alice")
+    bob = _user(session, "bob")
+
+    saved, skipped, companies = _save(session, _parsed(5), alice)
+    assert (saved, skipped) == (5, 0)
+    assert [company.inn for company in companies] == [7700000000 + i for i in range(5)]
+
+    # Повтор у того же пользователя ничего не сохраняет, новые компании из пачки сохраняются
+    saved, skipped, companies = _save(session, _parsed(7), alice)
+    assert (saved, skipped) == (2, 5)
+    assert [company.inn for company in companies] == [7700000005, 7700000006]
+
+    # Существующие компании привязываются другому пользователю без дублей
+    saved, skipped, _ = _save(session, _parsed(3), bob)
+    assert (saved, skipped) == (3, 0)
+    assert len(session.exec(select(Company)).all()) == 7
+    assert len(session.exec(select(UserCompanyLink).where(UserCompanyLink.user_id == bob)).all()) == 3
+
+
+def test_invalid_and_repeated_rows_are_skipped(session):
+    alice = _user(session, "alice")
+    companies = _parsed(3) + [{"ИНН": "не число", "Год": "2022"}] + _parsed(1)
+
+    saved, skipped, _ = _save(session, companies, alice)
+
+    assert (saved, skipped) == (3, 2)
+
+
+def test_existence_is_checked_per_batch_not_per_company(session, monkeypatch):
+    import api.parse
+
+    monkeypatch.setattr(api.parse, "INGEST_BATCH_SIZE", 100)
+    alice = _user(session, "alice")
+    _save(session, _parsed(250), alice)
+
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(session.get_bind(), "before_cursor_execute", listener)
+    try:
+        saved, skipped, _ = _save(session, _parsed(500), alice)
+    finally:
+        event.remove(session.get_bind(), "before_cursor_execute", listener)
+
+    assert (saved, skipped) == (250, 250)
+    # Несколько запросов на пачку из 100 строк, а не по запросу на каждую компанию
+    assert len(statements) <= 5 * 6
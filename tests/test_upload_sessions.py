@@ -0,0 +1,93 @@
+from sqlmodel import select
+
+from conftest import TEST_DATA, auth_headers, run_queued_jobs
+from models import Company
+
+CONTENT = TEST_DATA.read_bytes()
+
+
+def _create(client, headers, size_bytes=len(CONTENT)) -> str:
+    response = client.post("/api/v1/files/uploads", json={"file_name": "companies.csv", "size_bytes": size_bytes}, headers=headers)
+    assert response.status_code == 201
+    return response.json()["id"]
+
+
+def _put(client, headers, upload_id: str, start: int, body: bytes, total=len(CONTENT)):
+    end = start + len(body) - 1
+    return client.put(
+        f"/api/v1/files/uploads/{upload_id}",
+        content=body,
+        headers={**headers, "Content-Range": f"bytes {start}-{end}/{total}"},
+    )
+
+
+def test_chunks_are_assembled_and_processed_by_a_job(client, session):
+    headers = auth_headers(client)
+    upload_id = _create(client, headers)
+    half = len(CONTENT) // 2
+
+    assert _put(client, headers, upload_id, 0, CONTENT[:half]).json()["received_bytes"] == half
+    # Клиент после обрыва узнает смещение и продолжает с него
+    assert client.get(f"/api/v1/files/uploads/{upload_id}", headers=headers).json()["received_bytes"] == half
+    assert _put(client, headers, upload_id, half, CONTENT[half:]).status_code == 200
+
+    response = client.post(f"/api/v1/files/uploads/{upload_id}/complete", headers=headers)
+    assert response.status_code == 202
+    job_id = response.json()["job"]["id"]
+
+    run_queued_jobs()
+
+    job = client.get(f"/api/v1/jobs/{job_id}", headers=headers).json()
+    assert job["status"] == "succeeded"
+    assert job["result"]["companies_processed"] == 80
+    assert len(session.exec(select(Company)).all()) == 80
+    assert client.post(f"/api/v1/files/uploads/{upload_id}/complete", headers=headers).status_code == 409
+
+
+def test_chunk_at_wrong_offset_is_rejected(client):
+    headers = auth_headers(client)
+    upload_id = _create(client, headers)
+    _put(client, headers, upload_id, 0, CONTENT[:100])
+
+    repeated = _put(client, headers, upload_id, 0, CONTENT[:100])
+    gap = _put(client, headers, upload_id, 200, CONTENT[200:300])
+
+    assert repeated.status_code == 409
+    assert gap.status_code == 409
+    assert gap.headers["Upload-Offset"] == "100"
+
+
+def test_chunk_shorter_than_content_range_is_not_recorded(client):
+    headers = auth_headers(client)
+    upload_id = _create(client, headers)
+
+    response = client.put(
+        f"/api/v1/files/uploads/{upload_id}",
+        content=CONTENT[:10],
+        headers={**headers, "Content-Range": f"bytes 0-99/{len(CONTENT)}"},
+    )
+
+    assert response.status_code == 400
+    assert client.get(f"/api/v1/files/uploads/{upload_id}", headers=headers).json()["received_bytes"] == 0
+
+
+def test_upload_with_unknown_size_and_known_content_is_deduplicated(client):
+    alice, bob = auth_headers(client, "alice"), auth_headers(client, "bob")
+    client.post("/api/v1/files/upload", files={"file": ("companies.csv", CONTENT, "text/csv")}, headers=alice)
+    upload_id = _create(client, bob, size_bytes=None)
+
+    for start in range(0, len(CONTENT), 7000):
+        assert _put(client, bob, upload_id, start, CONTENT[start:start + 7000], total="*").status_code == 200
+    response = client.post(f"/api/v1/files/uploads/{upload_id}/complete", headers=bob)
+
+    assert response.status_code == 200
+    assert response.json()["deduplicated"] is True
+    assert response.json()["companies_processed"] == 80
+
+
+def test_other_user_cannot_see_upload_session(client):
+    upload_id = _create(client, auth_headers(client, "alice"))
+
+    response = client.get(f"/api/v1/files/uploads/{upload_id}", headers=auth_headers(client, "bob"))
+
+    assert response.status_code == 404